@@ -13,56 +13,147 @@
 # limitations under the License.
 
 # mypy: disable-error-code="arg-type"
+import functools
 import os
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
 
-import google
-import vertexai
 from google.adk.agents import Agent
 from jinja2 import Template
-from langchain_google_vertexai import VertexAIEmbeddings
-from app.retrievers import get_compressor, get_retriever
-from app.tools.search import (
+
+from app.tools.rerank import search_reranker_from_env, set_search_reranker
+from app.tools.search_async import (
+    search_all_sources,
     search_bike_histories,
     search_erp_software_system,
     search_slack_messages,
     search_technical_docs,
     search_yeplypedia,
 )
+from app.tools.semantic_cache import semantic_cache_from_env, set_semantic_cache
+from app.utils.usage import (
+    account_invocation,
+    account_model_request,
+    account_model_response,
+    account_tool_output,
+)
+
+if TYPE_CHECKING:
+    from google.auth.credentials import Credentials
+    from langchain_google_community import VertexAISearchRetriever
+    from langchain_google_community.vertex_rank import VertexAIRank
+    from langchain_google_vertexai import VertexAIEmbeddings
+
+    from app.retrievers import LocalVectorRetriever
 
 EMBEDDING_MODEL = "gemini-embedding-001"
 LLM_LOCATION = "global"
 LOCATION = "europe-west1"
 LLM = "gemini-2.5-flash"
 
-credentials, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
+# The Gemini client resolves the project from ADC itself when
+# GOOGLE_CLOUD_PROJECT is unset, so no credentials are needed at import time.
 os.environ.setdefault("GOOGLE_CLOUD_LOCATION", LLM_LOCATION)
 os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
-vertexai.init(project=project_id, location=LOCATION)
-embedding = VertexAIEmbeddings(
-    project=project_id, location=LOCATION, model_name=EMBEDDING_MODEL
-)
-
-
 EMBEDDING_COLUMN = "embedding"
 TOP_K = 5
 
 data_store_region = os.getenv("DATA_STORE_REGION", "eu")
 data_store_id = os.getenv("DATA_STORE_ID", "agent-123-datastore")
+vector_index_path = os.getenv("VECTOR_INDEX_PATH")
 
-retriever = get_retriever(
-    project_id=project_id,
-    data_store_id=data_store_id,
-    data_store_region=data_store_region,
-    embedding=embedding,
-    embedding_column=EMBEDDING_COLUMN,
-    max_documents=TOP_K,
-)
 
-compressor = get_compressor(
-    project_id=project_id,
-)
+# Credentials, clients and their heavy imports are created on first use and
+# memoized, so importing this module (cold start, tests, `adk web` reloads,
+# deployment) does not hit the network.
+@functools.cache
+def get_credentials() -> tuple["Credentials", str]:
+    """Application default credentials and their project."""
+    import google.auth
+    from google.auth.exceptions import DefaultCredentialsError
+
+    credentials, project_id = google.auth.default()
+    project_id = project_id or os.environ.get("GOOGLE_CLOUD_PROJECT")
+    if not project_id:
+        raise DefaultCredentialsError(
+            "No project in the application default credentials; "
+            "set GOOGLE_CLOUD_PROJECT"
+        )
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
+    return credentials, project_id
+
+
+def get_project_id() -> str:
+    return get_credentials()[1]
+
+
+@functools.cache
+def init_vertexai() -> None:
+    import vertexai
+
+    vertexai.init(project=get_project_id(), location=LOCATION)
+
+
+@functools.cache
+def get_embedding() -> "VertexAIEmbeddings":
+    from langchain_google_vertexai import VertexAIEmbeddings
+
+    init_vertexai()
+    return VertexAIEmbeddings(
+        project=get_project_id(), location=LOCATION, model_name=EMBEDDING_MODEL
+    )
+
+
+@functools.cache
+def get_agent_retriever() -> "VertexAISearchRetriever | LocalVectorRetriever":
+    from app.retrievers import get_local_retriever, get_retriever
+
+    # A local index built from the pipeline export avoids the network hop
+    if vector_index_path:
+        return get_local_retriever(
+            vector_index_path, embedding=get_embedding(), max_documents=TOP_K
+        )
+    return get_retriever(
+        project_id=get_project_id(),
+        data_store_id=data_store_id,
+        data_store_region=data_store_region,
+        embedding=get_embedding(),
+        embedding_column=EMBEDDING_COLUMN,
+        max_documents=TOP_K,
+    )
+
+
+@functools.cache
+def get_agent_compressor(top_n: int = TOP_K) -> "VertexAIRank":
+    from app.retrievers import get_compressor
+
+    return get_compressor(project_id=get_project_id(), top_n=top_n)
+
+
+_LAZY_ATTRIBUTES: dict[str, Callable[[], Any]] = {
+    "credentials": lambda: get_credentials()[0],
+    "project_id": get_project_id,
+    "embedding": get_embedding,
+    "retriever": get_agent_retriever,
+    "compressor": get_agent_compressor,
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Keep ``app.agent.embedding`` etc. working, built on first access."""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def set_up_search_extensions() -> None:
+    """Install the semantic cache and re-ranker the environment enables."""
+    # The embedding model is only built once the semantic cache embeds a query
+    set_semantic_cache(semantic_cache_from_env(get_embedding))
+    # Likewise the ranking client once a multi-source search is re-ranked
+    set_search_reranker(search_reranker_from_env(get_agent_compressor))
+
 
 # Load the system instruction from the instructions folder
 instruction_path = os.path.join(
@@ -78,10 +169,16 @@ root_agent = Agent(
     model=LLM,
     instruction=instruction,
     tools=[
+        search_all_sources,
         search_technical_docs,
         search_bike_histories,
         search_slack_messages,
         search_yeplypedia,
         search_erp_software_system,
     ],
+    # Token and payload accounting, see app.utils.usage
+    before_model_callback=account_model_request,
+    after_model_callback=account_model_response,
+    after_tool_callback=account_tool_output,
+    after_agent_callback=account_invocation,
 )
@@ -18,7 +18,9 @@ import datetime
 import json
 import logging
 import os
-from collections.abc import Mapping, Sequence
+import threading
+from collections.abc import AsyncIterable, Iterable
+from dataclasses import asdict
 from typing import Any
 
 import google.auth
@@ -29,15 +31,35 @@ from opentelemetry.sdk.trace import TracerProvider, export
 from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
-from app.agent import root_agent
+from app.agent import root_agent, set_up_search_extensions
+from app.tools.identifier_index import load_identifier_indexes
+from app.tools.lexical_index import load_lexical_indexes
+from app.utils.concurrency import WorkerConcurrency, get_query_limiter
 from app.utils.gcs import create_bucket_if_not_exists
+from app.utils.metrics import metric_reader_from_env, set_up_meter_provider
+from app.utils.sampling import (
+    TailSamplingSpanProcessor,
+    tail_sampling_processor_from_env,
+)
 from app.utils.tracing import CloudTraceLoggingSpanExporter
 from app.utils.typing import Feedback
+from app.utils.usage import get_usage_accountant
+
+# AdkApp.stream_query sets the app up lazily, so concurrent first queries of a
+# worker would otherwise each install a TracerProvider
+_set_up_lock = threading.Lock()
 
 
 class AgentEngineApp(AdkApp):
     def set_up(self) -> None:
-        """Set up logging and tracing for the agent engine app."""
+        """Set up logging and tracing for the agent engine app, once per process."""
+        with _set_up_lock:
+            if getattr(self, "_set_up_pid", None) == os.getpid():
+                return
+            self._set_up()
+            self._set_up_pid = os.getpid()
+
+    def _set_up(self) -> None:
         super().set_up()
         logging_client = google_cloud_logging.Client()
         self.logger = logging_client.logger(__name__)
@@ -47,29 +69,83 @@ class AgentEngineApp(AdkApp):
                 project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
             )
         )
-        provider.add_span_processor(processor)
+        self.tail_sampler = tail_sampling_processor_from_env(processor)
+        provider.add_span_processor(self.tail_sampler)
         trace.set_tracer_provider(provider)
+        self.metric_reader = metric_reader_from_env()
+        self.meter_provider = set_up_meter_provider(self.metric_reader)
+        set_up_search_extensions()
+        # Build the local search indexes before the first query waits on them
+        load_identifier_indexes()
+        load_lexical_indexes()
+
+    # The signatures repeat AdkApp's: Agent Engine derives the API schema
+    # of each operation from them
+    def stream_query(
+        self,
+        *,
+        message: str | dict[str, Any],
+        user_id: str,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> Iterable[dict[str, Any]]:
+        """``AdkApp.stream_query`` within this worker's concurrent query limit."""
+        with get_query_limiter().slot():
+            yield from super().stream_query(
+                message=message, user_id=user_id, session_id=session_id, **kwargs
+            )
+
+    async def async_stream_query(
+        self,
+        *,
+        message: str | dict[str, Any],
+        user_id: str,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterable[dict[str, Any]]:
+        """``AdkApp.async_stream_query`` within the concurrent query limit."""
+        async with get_query_limiter().aslot():
+            async for event in super().async_stream_query(
+                message=message, user_id=user_id, session_id=session_id, **kwargs
+            ):
+                yield event
+
+    def streaming_agent_run_with_events(self, request_json: str) -> Iterable[Any]:
+        """``AdkApp.streaming_agent_run_with_events`` within the query limit."""
+        with get_query_limiter().slot():
+            yield from super().streaming_agent_run_with_events(request_json)
 
     def register_feedback(self, feedback: dict[str, Any]) -> None:
         """Collect and log feedback."""
         feedback_obj = Feedback.model_validate(feedback)
         self.logger.log_struct(feedback_obj.model_dump(), severity="INFO")
+        # Keep the trace of a negatively rated turn even if it was sampled out
+        tail_sampler = getattr(self, "tail_sampler", None)
+        if isinstance(tail_sampler, TailSamplingSpanProcessor):
+            tail_sampler.record_feedback(feedback_obj.invocation_id, feedback_obj.score)
 
-    def register_operations(self) -> Mapping[str, Sequence]:
+    def get_session_usage(self, session_id: str) -> dict[str, Any] | None:
+        """Token and payload totals of a session, as seen by this worker."""
+        accountant = get_usage_accountant()
+        usage = accountant.session_usage(session_id) if accountant else None
+        return asdict(usage) if usage is not None else None
+
+    def register_operations(self) -> dict[str, list[str]]:
         """Registers the operations of the Agent.
 
-        Extends the base operations to include feedback registration functionality.
+        Extends the base operations to include feedback registration and
+        session usage functionality.
         """
         operations = super().register_operations()
-        operations[""] = operations[""] + ["register_feedback"]
+        operations[""] = operations[""] + ["register_feedback", "get_session_usage"]
         return operations
 
     def clone(self) -> "AgentEngineApp":
         """Returns a clone of the ADK application."""
         template_attributes = self._tmpl_attrs
         return self.__class__(
-            agent=copy.deepcopy(template_attributes.get("agent")),
-            enable_tracing=template_attributes.get("enable_tracing"),
+            agent=copy.deepcopy(template_attributes["agent"]),
+            enable_tracing=template_attributes.get("enable_tracing", False),
             session_service_builder=template_attributes.get("session_service_builder"),
             artifact_service_builder=template_attributes.get(
                 "artifact_service_builder"
@@ -83,11 +159,18 @@ def deploy_agent_engine_app(
     location: str,
     agent_name: str | None = None,
     requirements_file: str = ".requirements.txt",
-    extra_packages: list[str] = ["./app"],
-    env_vars: dict[str, str] = {},
+    extra_packages: list[str] | None = None,
+    env_vars: dict[str, str] | None = None,
+    concurrency: WorkerConcurrency | None = None,
 ) -> agent_engines.AgentEngine:
-    """Deploy the agent engine app to Vertex AI."""
+    """Deploy the agent engine app to Vertex AI.
+
+    ``concurrency`` sets the worker processes per replica and the queries each
+    serves at once; by default one worker without a query limit.
+    """
 
+    if extra_packages is None:
+        extra_packages = ["./app"]
     staging_bucket = f"gs://{project}-agent-engine"
 
     create_bucket_if_not_exists(
@@ -101,11 +184,12 @@ def deploy_agent_engine_app(
 
     agent_engine = AgentEngineApp(agent=root_agent)
 
-    # Set worker parallelism to 1
-    env_vars["NUM_WORKERS"] = "1"
+    concurrency = concurrency or WorkerConcurrency()
+    concurrency.validate()
+    env_vars = {**(env_vars or {}), **concurrency.env_vars()}
 
     # Common configuration for both create and update operations
-    agent_config = {
+    agent_config: dict[str, Any] = {
         "agent_engine": agent_engine,
         "display_name": agent_name,
         "description": "ADK RAG agent for document retrieval and Q&A. Includes a data pipeline for ingesting and indexing documents into Vertex AI Search or Vector Search.",
@@ -174,6 +258,22 @@ if __name__ == "__main__":
         "--set-env-vars",
         help="Comma-separated list of environment variables in KEY=VALUE format",
     )
+    concurrency_defaults = WorkerConcurrency.from_env()
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=concurrency_defaults.num_workers,
+        help="Worker processes per replica (defaults to $NUM_WORKERS or 1)",
+    )
+    parser.add_argument(
+        "--max-concurrent-queries",
+        type=int,
+        default=concurrency_defaults.max_concurrent_queries,
+        help=(
+            "Queries each worker serves at once, 0 for no limit (defaults to "
+            "$AGENT_MAX_CONCURRENT_QUERIES or 0)"
+        ),
+    )
     args = parser.parse_args()
 
     # Parse environment variables if provided
@@ -201,4 +301,8 @@ if __name__ == "__main__":
         requirements_file=args.requirements_file,
         extra_packages=args.extra_packages,
         env_vars=env_vars,
+        concurrency=WorkerConcurrency(
+            num_workers=args.num_workers,
+            max_concurrent_queries=args.max_concurrent_queries,
+        ),
     )
@@ -14,13 +14,23 @@
 # ruff: noqa
 # mypy: disable-error-code="no-untyped-def"
 
+import asyncio
 import os
 
 from unittest.mock import MagicMock
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
 from langchain_google_community.vertex_rank import VertexAIRank
 from langchain_google_vertexai import VertexAIEmbeddings
 from langchain_google_community import VertexAISearchRetriever
 
+from app.tools.vector_index import VectorHit, VectorIndex
+
 
 def get_retriever(
     project_id: str,
@@ -65,6 +75,69 @@ def get_retriever(
         return retriever
 
 
+class LocalVectorRetriever(BaseRetriever):
+    """
+    Retriever over a memory-mapped VectorIndex built from the ingestion export,
+    answering in-process instead of calling Vertex AI Search.
+    """
+
+    index: VectorIndex
+    embedding: Embeddings
+    k: int = 10
+    nprobe: int | None = None
+    content_field: str = "content"
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        hits = self.index.search(
+            self.embedding.embed_query(query), k=self.k, nprobe=self.nprobe
+        )
+        return [self._to_document(hit) for hit in hits]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        embedded = await self.embedding.aembed_query(query)
+        # The probe scans are numpy work; keep them off the event loop
+        hits = await asyncio.to_thread(
+            self.index.search, embedded, k=self.k, nprobe=self.nprobe
+        )
+        return [self._to_document(hit) for hit in hits]
+
+    def _to_document(self, hit: VectorHit) -> Document:
+        metadata = {k: v for k, v in hit.document.items() if k != self.content_field}
+        return Document(
+            id=hit.id,
+            page_content=str(hit.document.get(self.content_field, "")),
+            metadata={**metadata, "score": hit.score},
+        )
+
+
+def get_local_retriever(
+    index_path: str,
+    embedding: Embeddings,
+    max_documents: int = 10,
+    nprobe: int = 16,
+) -> LocalVectorRetriever:
+    """
+    Creates a retriever over the local vector index at ``index_path``, built with
+    ``python -m app.tools.vector_index`` from the pipeline's JSONL export.
+
+    Raises ValueError if ``embedding`` embeds queries with another dimension
+    than the index vectors, e.g. when they come from different models.
+    """
+    index = VectorIndex.load(index_path, nprobe=nprobe)
+    dimension = len(embedding.embed_query("dimension check"))
+    if dimension != index.dimension:
+        raise ValueError(
+            f"The vector index at {index_path} holds {index.dimension}-dimensional "
+            f"vectors, but the query embedding model returns {dimension} "
+            "dimensions; rebuild the index with the agent's embedding model"
+        )
+    return LocalVectorRetriever(index=index, embedding=embedding, k=max_documents)
+
+
 def get_compressor(project_id: str, top_n: int = 5) -> VertexAIRank:
     """
     Creates and returns an instance of the compressor service.
@@ -79,5 +152,5 @@ def get_compressor(project_id: str, top_n: int = 5) -> VertexAIRank:
         )
     except Exception:
         compressor = MagicMock()
-        compressor.compress_documents = lambda x: []
+        compressor.compress_documents = lambda *args, **kwargs: []
         return compressor
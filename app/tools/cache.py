@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Protocol
+
+from app.tools.config import env_mapping
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(search_query: str) -> str:
+    """Case- and whitespace-insensitive form of a query used as cache key."""
+    return " ".join(search_query.casefold().split())
+
+
+class SharedCacheBackend(Protocol):
+    """Out-of-process store that lets several workers share cached results."""
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None: ...
+
+
+class RedisCacheBackend:
+    """
+    SharedCacheBackend on Redis / Memorystore.
+
+    Requires the optional ``redis`` package (``uv sync --extra cache``).
+    """
+
+    def __init__(self, url: str, prefix: str = "agent-123:search:") -> None:
+        import redis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2)
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self.client.set(self.prefix + key, value, px=int(ttl_seconds * 1000))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    shared_errors: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.shared_hits + self.misses
+        return (self.hits + self.shared_hits) / lookups if lookups else 0.0
+
+
+class SearchResultCache:
+    """
+    Thread-safe TTL + LRU cache of formatted search results per data store.
+
+    Entries are keyed by data store ID and normalized query. When a shared
+    backend is configured, local misses are looked up there and every put is
+    written through, so Agent Engine workers share their hits. Backend failures
+    only count as misses.
+
+    :param max_entries: Local capacity; the least recently used entry is evicted
+    :param ttl_seconds: Default time to live of an entry
+    :param ttl_overrides: TTL per data store, keyed by data store ID or its
+        short key (e.g. ``bike-histories``)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        ttl_overrides: dict[str, float] | None = None,
+        backend: SharedCacheBackend | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.ttl_overrides = ttl_overrides or {}
+        self.backend = backend
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str], tuple[float, list[str]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def ttl_for(self, data_store_id: str) -> float:
+        short_key = data_store_id.rsplit("_", 1)[0]
+        return self.ttl_overrides.get(
+            data_store_id, self.ttl_overrides.get(short_key, self.ttl_seconds)
+        )
+
+    def get(self, data_store_id: str, search_query: str) -> list[str] | None:
+        key = (data_store_id, normalize_query(search_query))
+        results = self._get_local(key)
+        if results is None and self.backend is not None:
+            results = self._get_shared(key)
+        return results
+
+    def put(self, data_store_id: str, search_query: str, results: list[str]) -> None:
+        key = (data_store_id, normalize_query(search_query))
+        self._put_local(key, results)
+        if self.backend is not None:
+            self._put_shared(key, results)
+
+    async def aget(self, data_store_id: str, search_query: str) -> list[str] | None:
+        """Like get, but runs the shared backend lookup off the event loop."""
+        key = (data_store_id, normalize_query(search_query))
+        results = self._get_local(key)
+        if results is None and self.backend is not None:
+            results = await asyncio.to_thread(self._get_shared, key)
+        return results
+
+    async def aput(
+        self, data_store_id: str, search_query: str, results: list[str]
+    ) -> None:
+        """Like put, but writes to the shared backend off the event loop."""
+        key = (data_store_id, normalize_query(search_query))
+        self._put_local(key, results)
+        if self.backend is not None:
+            await asyncio.to_thread(self._put_shared, key, results)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _get_local(self, key: tuple[str, str]) -> list[str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, results = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return list(results)
+                del self._entries[key]
+                self.stats.expirations += 1
+            if self.backend is None:
+                self.stats.misses += 1
+            return None
+
+    def _put_local(self, key: tuple[str, str], results: list[str]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_for(key[0]), list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _get_shared(self, key: tuple[str, str]) -> list[str] | None:
+        assert self.backend is not None
+        try:
+            payload = self.backend.get(_shared_key(key))
+        except Exception as e:
+            logger.warning(f"Shared search cache lookup failed: {e!r}")
+            payload = None
+            with self._lock:
+                self.stats.shared_errors += 1
+        if payload is None:
+            with self._lock:
+                self.stats.misses += 1
+            return None
+        results = json.loads(payload)
+        self._put_local(key, results)
+        with self._lock:
+            self.stats.shared_hits += 1
+        return results
+
+    def _put_shared(self, key: tuple[str, str], results: list[str]) -> None:
+        assert self.backend is not None
+        try:
+            self.backend.set(
+                _shared_key(key), json.dumps(results).encode(), self.ttl_for(key[0])
+            )
+        except Exception as e:
+            logger.warning(f"Shared search cache write failed: {e!r}")
+            with self._lock:
+                self.stats.shared_errors += 1
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "hit_rate": self.stats.hit_rate,
+                "size": len(self._entries),
+            }
+
+
+def _shared_key(key: tuple[str, str]) -> str:
+    data_store_id, query = key
+    return f"{data_store_id}:{hashlib.sha256(query.encode()).hexdigest()}"
+
+
+def search_cache_from_env() -> SearchResultCache | None:
+    """
+    Build the search cache from SEARCH_CACHE_* environment variables, or return
+    None when SEARCH_CACHE_MAX_ENTRIES is 0.
+    """
+    max_entries = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+    if max_entries <= 0:
+        return None
+    redis_url = os.environ.get("SEARCH_CACHE_REDIS_URL")
+    return SearchResultCache(
+        max_entries=max_entries,
+        ttl_seconds=float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "300")),
+        ttl_overrides=env_mapping("SEARCH_CACHE_TTL_OVERRIDES", float),
+        backend=RedisCacheBackend(redis_url) if redis_url else None,
+    )
+
+
+_cache: SearchResultCache | None = None
+_cache_initialized = False
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchResultCache | None:
+    """Return the process-wide search cache, or None if caching is disabled."""
+    global _cache, _cache_initialized
+    if not _cache_initialized:
+        with _cache_lock:
+            if not _cache_initialized:
+                _cache = search_cache_from_env()
+                _cache_initialized = True
+    return _cache
+
+
+def set_search_cache(cache: SearchResultCache | None) -> None:
+    """Replace the process-wide search cache; None disables caching."""
+    global _cache, _cache_initialized
+    with _cache_lock:
+        _cache = cache
+        _cache_initialized = True
@@ -0,0 +1,302 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import grpc
+from google.cloud.discoveryengine_v1.services.search_service import (
+    SearchServiceAsyncClient,
+    SearchServiceClient,
+)
+from google.cloud.discoveryengine_v1.services.search_service.transports import (
+    SearchServiceGrpcAsyncIOTransport,
+    SearchServiceGrpcTransport,
+)
+
+logger = logging.getLogger(__name__)
+
+ChannelFactory = Callable[[str, list[tuple[str, Any]], grpc.Compression | None], Any]
+
+_COMPRESSION = {
+    "none": None,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+@dataclass(frozen=True)
+class ChannelOptions:
+    """Tuning knobs for the gRPC channels held by a SearchClientPool."""
+
+    keepalive_time_ms: int = 30_000
+    keepalive_timeout_ms: int = 10_000
+    keepalive_permit_without_calls: bool = True
+    # Number of in-flight calls a channel takes before the pool opens another one
+    max_concurrent_streams: int = 100
+    max_channels_per_endpoint: int = 4
+    compression: grpc.Compression | None = None
+
+    @classmethod
+    def from_env(cls) -> "ChannelOptions":
+        """Build channel options from SEARCH_GRPC_* environment variables."""
+        defaults = cls()
+        compression = os.environ.get("SEARCH_GRPC_COMPRESSION", "none").lower()
+        if compression not in _COMPRESSION:
+            raise ValueError(f"Unsupported SEARCH_GRPC_COMPRESSION: {compression}")
+        return cls(
+            keepalive_time_ms=int(
+                os.environ.get(
+                    "SEARCH_GRPC_KEEPALIVE_TIME_MS", defaults.keepalive_time_ms
+                )
+            ),
+            keepalive_timeout_ms=int(
+                os.environ.get(
+                    "SEARCH_GRPC_KEEPALIVE_TIMEOUT_MS", defaults.keepalive_timeout_ms
+                )
+            ),
+            max_concurrent_streams=int(
+                os.environ.get(
+                    "SEARCH_GRPC_MAX_CONCURRENT_STREAMS",
+                    defaults.max_concurrent_streams,
+                )
+            ),
+            max_channels_per_endpoint=int(
+                os.environ.get(
+                    "SEARCH_GRPC_MAX_CHANNELS", defaults.max_channels_per_endpoint
+                )
+            ),
+            compression=_COMPRESSION[compression],
+        )
+
+    def grpc_options(self) -> list[tuple[str, Any]]:
+        """Channel arguments passed to grpc when a channel is created."""
+        return [
+            ("grpc.keepalive_time_ms", self.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            (
+                "grpc.keepalive_permit_without_calls",
+                int(self.keepalive_permit_without_calls),
+            ),
+            # Keep the pooled channels apart instead of letting grpc share one
+            # subchannel between them.
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+
+
+def default_channel_factory(
+    api_endpoint: str,
+    options: list[tuple[str, Any]],
+    compression: grpc.Compression | None,
+) -> grpc.Channel:
+    """Create an authenticated channel to a Discovery Engine endpoint."""
+    return SearchServiceGrpcTransport.create_channel(
+        api_endpoint, options=options, compression=compression
+    )
+
+
+def default_async_channel_factory(
+    api_endpoint: str,
+    options: list[tuple[str, Any]],
+    compression: grpc.Compression | None,
+) -> grpc.aio.Channel:
+    """Create an authenticated asyncio channel to a Discovery Engine endpoint."""
+    return SearchServiceGrpcAsyncIOTransport.create_channel(
+        api_endpoint, options=options, compression=compression
+    )
+
+
+@dataclass
+class _PooledClient:
+    client: SearchServiceClient | SearchServiceAsyncClient
+    in_flight: int = 0
+
+
+class SearchClientPool:
+    """
+    Thread-safe pool of Discovery Engine search clients keyed by API endpoint.
+
+    Channels are created lazily on first use and shared by every caller. A new
+    channel is only opened when all channels of an endpoint carry
+    ``max_concurrent_streams`` calls, up to ``max_channels_per_endpoint``.
+
+    asyncio channels are bound to the event loop that created them, so async
+    clients are additionally keyed by the running loop and dropped once that
+    loop is closed.
+    """
+
+    def __init__(
+        self,
+        channel_options: ChannelOptions | None = None,
+        channel_factory: ChannelFactory = default_channel_factory,
+        async_channel_factory: ChannelFactory = default_async_channel_factory,
+    ) -> None:
+        self.channel_options = channel_options or ChannelOptions.from_env()
+        self._channel_factory = channel_factory
+        self._async_channel_factory = async_channel_factory
+        self._clients: dict[str, list[_PooledClient]] = {}
+        self._async_clients: dict[
+            tuple[asyncio.AbstractEventLoop, str], list[_PooledClient]
+        ] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def client(self, api_endpoint: str) -> Iterator[SearchServiceClient]:
+        """Lease a client for ``api_endpoint`` for the duration of a call."""
+        with self._lock:
+            pooled = self._acquire(
+                self._clients.setdefault(api_endpoint, []),
+                lambda: self._create_client(api_endpoint),
+            )
+        try:
+            yield pooled.client
+        finally:
+            with self._lock:
+                pooled.in_flight -= 1
+
+    @asynccontextmanager
+    async def async_client(
+        self, api_endpoint: str
+    ) -> AsyncIterator[SearchServiceAsyncClient]:
+        """Lease an asyncio client for ``api_endpoint`` on the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for key in [k for k in self._async_clients if k[0].is_closed()]:
+                del self._async_clients[key]
+            pooled = self._acquire(
+                self._async_clients.setdefault((loop, api_endpoint), []),
+                lambda: self._create_async_client(api_endpoint),
+            )
+        try:
+            yield pooled.client
+        finally:
+            with self._lock:
+                pooled.in_flight -= 1
+
+    def _acquire(
+        self,
+        pooled_clients: list[_PooledClient],
+        create: Callable[[], SearchServiceClient | SearchServiceAsyncClient],
+    ) -> _PooledClient:
+        # Must be called with self._lock held
+        if self._closed:
+            raise RuntimeError("SearchClientPool is closed")
+        pooled = min(pooled_clients, key=lambda p: p.in_flight, default=None)
+        if pooled is None or (
+            pooled.in_flight >= self.channel_options.max_concurrent_streams
+            and len(pooled_clients) < self.channel_options.max_channels_per_endpoint
+        ):
+            pooled = _PooledClient(client=create())
+            pooled_clients.append(pooled)
+        pooled.in_flight += 1
+        return pooled
+
+    def _create_client(self, api_endpoint: str) -> SearchServiceClient:
+        logger.info(f"Opening Discovery Engine channel to {api_endpoint}")
+        channel = self._channel_factory(
+            api_endpoint,
+            self.channel_options.grpc_options(),
+            self.channel_options.compression,
+        )
+        return SearchServiceClient(
+            transport=SearchServiceGrpcTransport(host=api_endpoint, channel=channel)
+        )
+
+    def _create_async_client(self, api_endpoint: str) -> SearchServiceAsyncClient:
+        logger.info(f"Opening asyncio Discovery Engine channel to {api_endpoint}")
+        channel = self._async_channel_factory(
+            api_endpoint,
+            self.channel_options.grpc_options(),
+            self.channel_options.compression,
+        )
+        return SearchServiceAsyncClient(
+            transport=SearchServiceGrpcAsyncIOTransport(
+                host=api_endpoint, channel=channel
+            )
+        )
+
+    def channel_count(self, api_endpoint: str | None = None) -> int:
+        """Number of open channels, for one endpoint or in total."""
+        with self._lock:
+            groups = [
+                *self._clients.items(),
+                *((endpoint, p) for (_, endpoint), p in self._async_clients.items()),
+            ]
+        return sum(
+            len(pooled)
+            for endpoint, pooled in groups
+            if api_endpoint is None or endpoint == api_endpoint
+        )
+
+    def close(self) -> None:
+        """
+        Close every channel. Leasing a client afterwards raises.
+
+        asyncio channels can only be closed on their own loop; those on a loop
+        that is still running are closed there, the rest are released.
+        """
+        with self._lock:
+            self._closed = True
+            clients = [p for pooled in self._clients.values() for p in pooled]
+            async_clients = [
+                (loop, p)
+                for (loop, _), pooled in self._async_clients.items()
+                for p in pooled
+            ]
+            self._clients.clear()
+            self._async_clients.clear()
+        for pooled in clients:
+            pooled.client.transport.close()
+        for loop, pooled in async_clients:
+            if loop.is_running() and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(pooled.client.transport.close(), loop)
+
+
+_pool: SearchClientPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_search_client_pool() -> SearchClientPool:
+    """Return the process-wide client pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SearchClientPool()
+    return _pool
+
+
+def configure_search_client_pool(**kwargs: Any) -> SearchClientPool:
+    """Replace the process-wide pool, closing the previous one."""
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, SearchClientPool(**kwargs)
+    if previous is not None:
+        previous.close()
+    return _pool
+
+
+def shutdown_search_client_pool() -> None:
+    """Close the process-wide pool. A later call to get it opens a new one."""
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, None
+    if previous is not None:
+        previous.close()
+
+
+def _forget_search_client_pool() -> None:
+    # gRPC channels do not survive fork; a forked worker opens its own on
+    # first use instead of closing the parent's
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+atexit.register(shutdown_search_client_pool)
+os.register_at_fork(after_in_child=_forget_search_client_pool)
@@ -0,0 +1,39 @@
+"""
+Per-data-store settings from environment variables.
+
+Several settings are given per data store (or rate limit bucket) as one
+variable of comma-separated ``key=value`` items, e.g.
+``SEARCH_DEADLINE_OVERRIDES=bike-histories=4,slack-messages=2.5``.
+``env_mapping`` parses all of them the same way.
+"""
+
+import os
+from collections.abc import Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+def parse_mapping(name: str, value: str, convert: Callable[[str], T]) -> dict[str, T]:
+    """
+    Parse ``key=value,key=value`` into a dict, converting every value with
+    ``convert``. Whitespace around keys and values and empty items are ignored.
+
+    :param name: The environment variable, for error messages
+    :raises ValueError: If an item has no key or value, or ``convert`` rejects it
+    """
+    mapping = {}
+    for item in filter(None, (i.strip() for i in value.split(","))):
+        key, separator, raw = (part.strip() for part in item.partition("="))
+        if not separator or not key or not raw:
+            raise ValueError(f"{name}: expected key=value, got {item!r}")
+        try:
+            mapping[key] = convert(raw)
+        except ValueError as e:
+            raise ValueError(f"{name}: invalid value for {key!r}: {e}") from e
+    return mapping
+
+
+def env_mapping(name: str, convert: Callable[[str], T]) -> dict[str, T]:
+    """The ``key=value,...`` environment variable ``name`` as a dict, empty if unset."""
+    return parse_mapping(name, os.environ.get(name, ""), convert)
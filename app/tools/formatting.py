@@ -0,0 +1,153 @@
+import math
+import os
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+CHARS_PER_TOKEN = 4
+# Values this long that only hold numbers are embedding vectors, not content
+_VECTOR_MIN_LENGTH = 32
+_SHORT_FIELD_CHARS = 200
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_NEWLINES = re.compile(r" ?\n[\s]*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for Gemini on English)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class SearchResultFormatter(Protocol):
+    """Turns the decoded documents of one search call into LLM-ready text."""
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        """Fields the formatter reads; the decoder skips all others."""
+        ...
+
+    def format_results(self, documents: Sequence[Mapping[str, Any]]) -> list[str]: ...
+
+
+def _default_max_tokens() -> int:
+    return int(os.environ.get("SEARCH_RESULT_MAX_TOKENS", "1500"))
+
+
+@dataclass(frozen=True)
+class ResultFormatter:
+    """
+    Compact ``field: value`` formatter with field projection and a token budget.
+
+    :param fields: Fields to keep, in output order. When a document has none of
+        them, all fields except embedding vectors are kept instead, so a schema
+        change degrades to more tokens rather than empty results.
+    :param max_tokens: Budget for all results of one tool call. Results get an
+        equal share; what a short result leaves over goes to the next ones.
+        Defaults to SEARCH_RESULT_MAX_TOKENS.
+    """
+
+    fields: tuple[str, ...] = ()
+    max_tokens: int | None = None
+
+    def format_results(self, documents: Sequence[Mapping[str, Any]]) -> list[str]:
+        max_tokens = self.max_tokens or _default_max_tokens()
+        remaining = max_tokens * CHARS_PER_TOKEN
+        formatted = []
+        for i, document in enumerate(documents):
+            share = remaining // (len(documents) - i)
+            text = self.format_document(document, share)
+            if text:
+                formatted.append(text)
+                remaining -= len(text)
+        return formatted
+
+    def format_document(
+        self, document: Mapping[str, Any], max_chars: int | None = None
+    ) -> str:
+        items = [
+            (name, _compact(document[name]))
+            for name in self.fields
+            if name in document and not _is_empty(document[name])
+        ]
+        if not items:
+            items = [
+                (name, _compact(value))
+                for name, value in document.items()
+                if not _is_empty(value) and not _is_vector(value)
+            ]
+        if max_chars is not None:
+            items = _fit(items, max_chars)
+        return "\n".join(f"{name}: {value}" for name, value in items)
+
+
+def _fit(items: list[tuple[str, str]], max_chars: int) -> list[tuple[str, str]]:
+    """
+    Shorten the long values so the formatted lines fit into ``max_chars``.
+
+    Short values (titles, links, dates) are kept whole; the budget left after
+    them is split across the long values in order, cutting at word boundaries.
+    """
+    total = sum(len(name) + len(value) + 3 for name, value in items)
+    if total <= max_chars:
+        return items
+    long_fields = [i for i, (_, v) in enumerate(items) if len(v) > _SHORT_FIELD_CHARS]
+    fixed = sum(
+        len(name) + len(value) + 3
+        for i, (name, value) in enumerate(items)
+        if i not in long_fields
+    )
+    available = max_chars - fixed - sum(len(items[i][0]) + 3 for i in long_fields)
+    fitted = list(items)
+    for n, i in enumerate(long_fields):
+        share = max(0, available // (len(long_fields) - n))
+        value = _truncate(items[i][1], share)
+        available -= len(value)
+        fitted[i] = (items[i][0], value)
+    return [(name, value) for name, value in fitted if value]
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    if max_chars < 20:
+        return ""
+    cut = text[: max_chars - 1]
+    if " " in cut[max_chars // 2 :]:
+        cut = cut[: cut.rindex(" ")]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def _compact(value: Any) -> str:
+    if isinstance(value, str):
+        # Keep line breaks (steps, lists) but drop indentation and blank lines
+        return _NEWLINES.sub("\n", _SPACES.sub(" ", value)).strip()
+    if isinstance(value, Mapping):
+        return "; ".join(
+            f"{k}: {_compact(v)}" for k, v in value.items() if not _is_empty(v)
+        )
+    if isinstance(value, Sequence):
+        return ", ".join(_compact(v) for v in value if not _is_empty(v))
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _is_empty(value: Any) -> bool:
+    return (
+        value is None
+        or value == ""
+        or (
+            isinstance(value, Sequence | Mapping)
+            and not isinstance(value, str)
+            and not value
+        )
+    )
+
+
+def _is_vector(value: Any) -> bool:
+    return (
+        isinstance(value, Sequence)
+        and not isinstance(value, str)
+        and len(value) >= _VECTOR_MIN_LENGTH
+        and all(isinstance(v, int | float) for v in value[:_VECTOR_MIN_LENGTH])
+    )
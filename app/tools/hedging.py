@@ -0,0 +1,229 @@
+"""
+Hedged Discovery Engine requests.
+
+A search that has not answered after the data store's observed p95 attempt
+latency is usually stuck behind a slow backend, not doing more work. Sending
+the identical request again and taking whichever answer comes first cuts that
+tail at the cost of a few extra requests, which a budget caps at
+``max_extra_load`` of all calls.
+
+Until a data store has ``min_samples`` attempts recorded, ``initial_delay_seconds``
+stands in for its p95.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent import futures
+from dataclasses import dataclass
+from typing import TypeVar
+
+from app.tools.search_metrics import SearchLatencyRecorder, get_latency_recorder
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    :param quantile: Attempt latency quantile after which the hedge is sent
+    :param min_samples: Attempts needed before the quantile is trusted
+    :param initial_delay_seconds: Hedge delay until then
+    :param min_delay_seconds: Lower bound of the hedge delay
+    :param max_extra_load: Hedges per call at most, e.g. 0.1 for 10%
+    :param burst: Hedges that may be sent back to back
+    """
+
+    quantile: float = 0.95
+    min_samples: int = 20
+    initial_delay_seconds: float = 1.0
+    min_delay_seconds: float = 0.02
+    max_extra_load: float = 0.1
+    burst: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        """Build the policy from SEARCH_HEDGE_* environment variables."""
+        defaults = cls()
+        return cls(
+            quantile=float(os.environ.get("SEARCH_HEDGE_QUANTILE", defaults.quantile)),
+            min_samples=int(
+                os.environ.get("SEARCH_HEDGE_MIN_SAMPLES", defaults.min_samples)
+            ),
+            initial_delay_seconds=float(
+                os.environ.get(
+                    "SEARCH_HEDGE_INITIAL_DELAY_SECONDS", defaults.initial_delay_seconds
+                )
+            ),
+            max_extra_load=float(
+                os.environ.get("SEARCH_HEDGE_MAX_EXTRA_LOAD", defaults.max_extra_load)
+            ),
+        )
+
+
+class HedgeBudget:
+    """
+    Every call earns ``max_extra_load`` tokens up to ``burst``; a hedge spends
+    one, so hedges stay below that share of calls even when a backend is slow
+    for everyone.
+    """
+
+    def __init__(self, max_extra_load: float, burst: float) -> None:
+        self.max_extra_load = max_extra_load
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def on_call(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.max_extra_load)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Hedger:
+    """Runs search attempts, sending a second one when the first is slow."""
+
+    def __init__(
+        self,
+        policy: HedgePolicy | None = None,
+        recorder: SearchLatencyRecorder | None = None,
+        max_workers: int = 32,
+    ) -> None:
+        self.policy = policy or HedgePolicy()
+        self.recorder = recorder or get_latency_recorder()
+        self.budget = HedgeBudget(self.policy.max_extra_load, self.policy.burst)
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="search-hedge"
+        )
+
+    def delay_for(self, data_store_id: str) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        observed = self.recorder.attempt_quantile(
+            data_store_id, self.policy.quantile, self.policy.min_samples
+        )
+        delay = self.policy.initial_delay_seconds if observed is None else observed
+        return max(self.policy.min_delay_seconds, delay)
+
+    def call(self, data_store_id: str, attempt: Callable[[], T]) -> T:
+        """
+        Run ``attempt`` and, if it is still running after the hedge delay and
+        the budget allows, a second one; return the first successful result.
+        The slower attempt is left to finish (or hit its deadline) unobserved.
+
+        The first attempt gets its own thread so that it starts right away and
+        the hedge delay counts only its own latency; the pool, which may be
+        busy with other hedges, only runs the hedge.
+        """
+        self.budget.on_call()
+        primary = _start_thread(attempt)
+        try:
+            return primary.result(timeout=self.delay_for(data_store_id))
+        except futures.TimeoutError:
+            pass
+        if not self.budget.try_spend():
+            return primary.result()
+        hedge = self._executor.submit(attempt)
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._record(data_store_id, won=future is hedge)
+                    return future.result()
+                error = future.exception()
+        self._record(data_store_id, won=False)
+        assert error is not None
+        raise error
+
+    async def acall(self, data_store_id: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """``call`` for coroutines; the slower attempt is cancelled."""
+        self.budget.on_call()
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay_for(data_store_id))
+            if done or not self.budget.try_spend():
+                return await tasks[0]
+            tasks.append(asyncio.ensure_future(attempt()))
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self._record(data_store_id, won=task is tasks[1])
+                        return task.result()
+                    error = task.exception()
+            self._record(data_store_id, won=False)
+            assert error is not None
+            raise error
+        finally:
+            # Also when the caller is cancelled, e.g. by the fan-out deadline
+            for task in tasks:
+                task.cancel()
+
+    def _record(self, data_store_id: str, won: bool) -> None:
+        self.recorder.record_hedge(data_store_id, won)
+        logger.debug(f"Hedged search in {data_store_id}, hedge won: {won}")
+
+
+def _start_thread(fn: Callable[[], T]) -> "futures.Future[T]":
+    """Run ``fn`` on a new daemon thread and return its future."""
+    future: futures.Future[T] = futures.Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="search-attempt", daemon=True).start()
+    return future
+
+
+def hedger_from_env() -> Hedger | None:
+    """
+    Build the hedger from SEARCH_HEDGE_* environment variables. It is opt-in
+    (SEARCH_HEDGE=true) because hedges add load on Discovery Engine.
+    """
+    if os.environ.get("SEARCH_HEDGE", "false").lower() != "true":
+        return None
+    return Hedger(HedgePolicy.from_env())
+
+
+_hedger: Hedger | None = None
+_hedger_initialized = False
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger | None:
+    """Return the process-wide hedger, or None if hedging is disabled."""
+    global _hedger, _hedger_initialized
+    if not _hedger_initialized:
+        with _hedger_lock:
+            if not _hedger_initialized:
+                _hedger = hedger_from_env()
+                _hedger_initialized = True
+    return _hedger
+
+
+def set_hedger(hedger: Hedger | None) -> None:
+    """Replace the process-wide hedger; None disables hedging."""
+    global _hedger, _hedger_initialized
+    with _hedger_lock:
+        _hedger = hedger
+        _hedger_initialized = True
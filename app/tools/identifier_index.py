@@ -0,0 +1,291 @@
+"""
+Exact-key lookup of bike history chunks by frame number, customer bike ID or
+work order number.
+
+Questions about one bike or one work order name the key, and for those a hash
+lookup is both faster and more precise than semantic search over the whole
+history data store. Identifiers are taken from the identifier fields of a chunk
+when it has them, and otherwise found in its text by ``IDENTIFIER_PATTERNS``;
+the pipeline export only has the chunk text in ``content``. The
+``extract_identifiers`` step of the ingestion pipeline runs this module (its
+source is passed to the step, so both sides share this implementation) and
+writes the index as one JSON file::
+
+    {"version": 1, "fields": [...], "chunks": [<document>, ...],
+     "identifiers": {"<normalized id>": [<chunk number>, ...], ...}}
+
+Identifiers are normalized by case-folding and dropping separators, so
+"WO-2024/0815", "wo 2024/0815" and "WO20240815" are the same key.
+
+This module only imports the standard library at load time, so that the
+pipeline step can load it on its own. Build an index from an export with::
+
+    python -m app.tools.identifier_index "export/*.jsonl" identifiers.json
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import logging
+import re
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+IDENTIFIER_FIELDS = ("frame_number", "customer_bike_id", "work_order_number")
+IDENTIFIER_TEXT_FIELDS = ("content",)
+IDENTIFIER_PATTERNS = (
+    # Frame numbers: brand prefix and serial, e.g. "WAV-12345", "WBK123456"
+    r"\b[a-z]{2,4}-?\d{5,}\b",
+    # Customer bike IDs, e.g. "CB-0042"
+    r"\bcb[- ]?\d{3,}\b",
+    # Work order numbers, e.g. "WO-2024/0815", "WO 2025-1000"
+    r"\bwo[- ]?\d{4}[-/ ]?\d{3,}\b",
+)
+# Shorter keys ("12", "a1") collide with ordinary numbers in questions
+MIN_IDENTIFIER_LENGTH = 4
+
+_SEPARATORS = re.compile(r"[\W_]+")
+_CANDIDATE = re.compile(r"\w+(?:[-./]\w+)*")
+_IDENTIFIER_IN_TEXT = re.compile("|".join(IDENTIFIER_PATTERNS), re.IGNORECASE)
+
+
+def normalize_identifier(value: Any) -> str:
+    """Case-folded identifier without separators; matches the pipeline step."""
+    return _SEPARATORS.sub("", str(value).casefold())
+
+
+def _is_identifier(key: str) -> bool:
+    return len(key) >= MIN_IDENTIFIER_LENGTH and any(c.isdigit() for c in key)
+
+
+def extract_identifiers(
+    document: dict[str, Any],
+    fields: tuple[str, ...] = IDENTIFIER_FIELDS,
+    text_fields: tuple[str, ...] = IDENTIFIER_TEXT_FIELDS,
+) -> set[str]:
+    """
+    Normalized identifiers of a chunk: the values of its identifier ``fields``
+    and the identifiers in its ``text_fields`` matching ``IDENTIFIER_PATTERNS``.
+    """
+    values = [document[f] for f in fields if document.get(f) not in (None, "")]
+    for field in text_fields:
+        text = document.get(field)
+        if isinstance(text, str):
+            values.extend(m.group(0) for m in _IDENTIFIER_IN_TEXT.finditer(text))
+    return {k for k in map(normalize_identifier, values) if _is_identifier(k)}
+
+
+def query_identifier_candidates(query: str) -> list[str]:
+    """
+    Normalized keys the query may name: every token with a digit, and every
+    token joined to a following number, so "WO 20240815" also tries
+    "wo20240815".
+    """
+    tokens = [normalize_identifier(t) for t in _CANDIDATE.findall(query)]
+    pairs = [
+        a + b
+        for a, b in itertools.pairwise(tokens)
+        if len(b) >= 3 and any(c.isdigit() for c in b)
+    ]
+    return list(dict.fromkeys(k for k in tokens + pairs if _is_identifier(k)))
+
+
+@dataclass(frozen=True)
+class IdentifierHit:
+    # Normalized identifiers of the query found in this chunk
+    identifiers: tuple[str, ...]
+    document: dict[str, Any]
+
+
+class IdentifierIndex:
+    """Immutable map from normalized identifiers to the chunks containing them."""
+
+    def __init__(
+        self,
+        chunks: list[dict[str, Any]],
+        identifiers: dict[str, tuple[int, ...]],
+        fields: tuple[str, ...] = IDENTIFIER_FIELDS,
+    ) -> None:
+        self.chunks = chunks
+        self.fields = fields
+        self._identifiers = identifiers
+
+    def __len__(self) -> int:
+        return len(self._identifiers)
+
+    def __contains__(self, identifier: str) -> bool:
+        return normalize_identifier(identifier) in self._identifiers
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: Iterable[dict[str, Any]],
+        fields: tuple[str, ...] = IDENTIFIER_FIELDS,
+        text_fields: tuple[str, ...] = IDENTIFIER_TEXT_FIELDS,
+    ) -> "IdentifierIndex":
+        """Index the identifiers (see ``extract_identifiers``) of the given chunks."""
+        chunks: list[dict[str, Any]] = []
+        identifiers: dict[str, list[int]] = {}
+        for document in documents:
+            keys = extract_identifiers(document, fields, text_fields)
+            if not keys:
+                continue
+            for key in keys:
+                identifiers.setdefault(key, []).append(len(chunks))
+            chunks.append(document)
+        return cls(chunks, {k: tuple(v) for k, v in identifiers.items()}, tuple(fields))
+
+    @classmethod
+    def from_jsonl(
+        cls, pattern: str, embedding_column: str = "embedding", **kwargs: Any
+    ) -> "IdentifierIndex":
+        """
+        Index the chunks of the pipeline's JSONL export matching ``pattern``,
+        storing them without their embeddings.
+        """
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise FileNotFoundError(f"No JSONL files match {pattern}")
+        index = cls.from_documents(_read_jsonl(paths, embedding_column), **kwargs)
+        logger.info(
+            f"Indexed {len(index)} identifiers in {len(index.chunks)} chunks "
+            f"of {len(paths)} file(s)"
+        )
+        return index
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IdentifierIndex":
+        """Read the index file written by the pipeline (or ``save``)."""
+        with open(path) as f:
+            data = json.load(f)
+        if data["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported identifier index version {data['version']}")
+        return cls(
+            data["chunks"],
+            {k: tuple(v) for k, v in data["identifiers"].items()},
+            tuple(data["fields"]),
+        )
+
+    def save(self, path: str | Path) -> None:
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "version": FORMAT_VERSION,
+                    "fields": list(self.fields),
+                    "chunks": self.chunks,
+                    "identifiers": {k: list(v) for k, v in self._identifiers.items()},
+                },
+                f,
+            )
+
+    def lookup(self, query: str, k: int = 5) -> list[IdentifierHit]:
+        """
+        Up to ``k`` chunks containing identifiers named in the query, those
+        matching the most identifiers first, newest ``date`` next. Empty when
+        the query names no known identifier.
+        """
+        matches: dict[int, list[str]] = {}
+        for key in query_identifier_candidates(query):
+            for chunk in self._identifiers.get(key, ()):
+                matches.setdefault(chunk, []).append(key)
+        if not matches:
+            return []
+        ranked = sorted(
+            matches,
+            key=lambda c: (len(matches[c]), str(self.chunks[c].get("date") or "")),
+            reverse=True,
+        )
+        return [IdentifierHit(tuple(matches[c]), self.chunks[c]) for c in ranked[:k]]
+
+
+def _read_jsonl(paths: list[str], embedding_column: str) -> Iterator[dict[str, Any]]:
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                document = json.loads(row["json_data"]) if "json_data" in row else row
+                document.pop(embedding_column, None)
+                yield document
+
+
+def _index_paths() -> dict[str, str]:
+    """SEARCH_IDENTIFIER_INDEX, e.g. ``bike-histories=/data/identifiers.json``."""
+    # Imported here, so that the pipeline step can still load this module alone
+    from app.tools.config import env_mapping
+
+    return env_mapping("SEARCH_IDENTIFIER_INDEX", str)
+
+
+_indexes: dict[str, IdentifierIndex | None] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_identifier_index(data_store_key: str) -> IdentifierIndex | None:
+    """
+    Return the identifier index of a data store (keyed like ``bike-histories``),
+    loading it on first use from the file configured in SEARCH_IDENTIFIER_INDEX,
+    or None when the data store has none.
+    """
+    if data_store_key in _indexes:
+        return _indexes[data_store_key]
+    with _indexes_lock:
+        if data_store_key not in _indexes:
+            path = _index_paths().get(data_store_key)
+            index = None
+            if path:
+                try:
+                    index = IdentifierIndex.load(path)
+                    logger.info(
+                        f"Loaded {len(index)} identifiers of {data_store_key} "
+                        f"from {path}"
+                    )
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(
+                        f"Identifier index for {data_store_key} failed: {e!r}"
+                    )
+            _indexes[data_store_key] = index
+        return _indexes[data_store_key]
+
+
+def identifier_index_loaded(data_store_key: str) -> bool:
+    """Whether ``get_identifier_index`` returns without reading a file."""
+    return data_store_key in _indexes
+
+
+def load_identifier_indexes() -> None:
+    """Load the index of every data store in SEARCH_IDENTIFIER_INDEX now."""
+    for data_store_key in _index_paths():
+        get_identifier_index(data_store_key)
+
+
+def set_identifier_index(data_store_key: str, index: IdentifierIndex | None) -> None:
+    """Install the identifier index of a data store; None disables it."""
+    with _indexes_lock:
+        _indexes[data_store_key] = index
+
+
+def reset_identifier_indexes() -> None:
+    """Forget all indexes so the next lookup reads SEARCH_IDENTIFIER_INDEX again."""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Build an identifier index from the pipeline's JSONL export"
+    )
+    parser.add_argument("export", help="Glob of the exported JSONL files")
+    parser.add_argument("output", help="Index file to write")
+    parser.add_argument("--embedding-column", default="embedding")
+    args = parser.parse_args()
+    IdentifierIndex.from_jsonl(args.export, args.embedding_column).save(args.output)
@@ -0,0 +1,362 @@
+"""
+In-process BM25 index over the chunks exported by the ingestion pipeline.
+
+Part numbers, error codes and model names ("SM-BB72", "E-10") are where the
+remote semantic search is slowest and least precise, and where exact term
+matching is most reliable. The index is built from the JSONL export of the
+``process_data`` step and answers a query locally when every identifier in it
+matches and is rare enough to single out documents; everything else still
+goes to Discovery Engine.
+
+Postings are stored in flat numpy arrays (document ids and term frequencies of
+all terms back to back, plus one offset per term), so the index costs a few
+bytes per posting and a query is a handful of vectorized slices.
+"""
+
+import glob
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from app.tools.config import env_mapping
+
+logger = logging.getLogger(__name__)
+
+# Words and identifiers such as "sm-bb72", "e-10" or "6.5"
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lower-cased tokens; identifiers are kept whole and also split into parts,
+    so "SM-BB72" matches "sm-bb72" as well as "BB72".
+    """
+    tokens = _TOKEN.findall(text.casefold())
+    for token in tokens[:]:
+        # Only compound tokens ("sm-bb72", "6.5") have parts worth indexing
+        if not token.isalnum():
+            tokens.extend(_PART.findall(token))
+    return tokens
+
+
+def query_identifiers(query: str) -> set[str]:
+    """
+    Whole query tokens with both letters and digits, e.g. part numbers and error
+    codes ("sm-bb72", "e-10", "mt200"). Plain numbers ("2", "105", "2024",
+    "6.5") are quantities and years far more often than identifiers.
+    """
+    return {
+        t
+        for t in _TOKEN.findall(query.casefold())
+        if any(c.isdigit() for c in t) and any(c.isalpha() for c in t)
+    }
+
+
+@dataclass(frozen=True)
+class LexicalHit:
+    id: str
+    score: float
+    document: dict[str, Any]
+
+
+class LexicalIndex:
+    """
+    Immutable BM25 index; build it with ``from_documents`` or ``from_jsonl``.
+
+    :param k1: BM25 term frequency saturation
+    :param b: BM25 document length normalization
+    :param min_identifier_idf: IDF an identifier needs for ``confident_search``
+        to answer from it; the default 1.0 admits identifiers in up to about a
+        third of the documents
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        payloads: list[str],
+        vocabulary: dict[str, int],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+        min_identifier_idf: float = 1.0,
+    ) -> None:
+        self.ids = ids
+        # Documents stay serialized until they are returned
+        self._payloads = payloads
+        self._vocabulary = vocabulary
+        self._offsets = offsets
+        self._postings = postings
+        self._frequencies = frequencies
+        self._lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.min_identifier_idf = min_identifier_idf
+        self._average_length = float(lengths.mean()) if len(lengths) else 0.0
+        document_frequency = np.diff(offsets).astype(np.float32)
+        self._idf = np.log1p(
+            (len(ids) - document_frequency + 0.5) / (document_frequency + 0.5)
+        ).astype(np.float32)
+        # Documents without any terms have no length to normalize by
+        self._length_norm = (
+            k1 * (1 - b + b * lengths / self._average_length)
+            if self._average_length > 0
+            else np.full_like(lengths, k1)
+        ).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the array-backed parts of the index."""
+        return sum(
+            a.nbytes
+            for a in (
+                self._offsets,
+                self._postings,
+                self._frequencies,
+                self._lengths,
+                self._idf,
+                self._length_norm,
+            )
+        )
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: Iterable[tuple[str, dict[str, Any]]],
+        text_fields: tuple[str, ...] = ("title", "content"),
+        **kwargs: Any,
+    ) -> "LexicalIndex":
+        """Index ``(id, document)`` pairs on the given text fields."""
+        ids: list[str] = []
+        payloads: list[str] = []
+        lengths: list[int] = []
+        term_postings: dict[str, list[int]] = {}
+        term_frequencies: dict[str, list[int]] = {}
+        for doc_id, document in documents:
+            text = " ".join(
+                str(document[f]) for f in text_fields if document.get(f) is not None
+            )
+            counts = Counter(tokenize(text))
+            number = len(ids)
+            for term, count in counts.items():
+                term_postings.setdefault(term, []).append(number)
+                term_frequencies.setdefault(term, []).append(count)
+            ids.append(doc_id)
+            payloads.append(json.dumps(_without_vectors(document)))
+            lengths.append(sum(counts.values()))
+
+        vocabulary = {term: i for i, term in enumerate(term_postings)}
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in term_postings.values()])
+        postings = np.fromiter(
+            (d for p in term_postings.values() for d in p),
+            dtype=np.int32,
+            count=int(offsets[-1]),
+        )
+        frequencies = np.fromiter(
+            (min(f, 65535) for fs in term_frequencies.values() for f in fs),
+            dtype=np.uint16,
+            count=int(offsets[-1]),
+        )
+        return cls(
+            ids,
+            payloads,
+            vocabulary,
+            offsets,
+            postings,
+            frequencies,
+            np.asarray(lengths, dtype=np.float32),
+            **kwargs,
+        )
+
+    @classmethod
+    def from_jsonl(cls, pattern: str, **kwargs: Any) -> "LexicalIndex":
+        """
+        Index the JSONL files matching ``pattern``: either the pipeline export
+        (``{"id": ..., "json_data": "<json>"}`` per line) or one flat JSON
+        document with an ``id`` per line.
+        """
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise FileNotFoundError(f"No JSONL files match {pattern}")
+        start = time.perf_counter()
+        index = cls.from_documents(_read_jsonl(paths), **kwargs)
+        logger.info(
+            f"Built lexical index of {len(index)} chunks from {len(paths)} file(s) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return index
+
+    def search(self, query: str, k: int = 5) -> list[LexicalHit]:
+        """Top ``k`` documents by BM25 score; documents without a match are left out."""
+        scores = self._scores(query)
+        return self._top(scores, np.flatnonzero(scores), k)
+
+    def confident_search(self, query: str, k: int = 5) -> list[LexicalHit]:
+        """
+        Top ``k`` documents containing every identifier of the query, or an empty
+        list when the query has none, names one no document contains, or one
+        too common (IDF below ``min_identifier_idf``) to trust lexical ranking.
+        """
+        identifiers = query_identifiers(query)
+        if not identifiers or any(i not in self._vocabulary for i in identifiers):
+            return []
+        term_ids = [self._vocabulary[i] for i in identifiers]
+        if any(self._idf[t] < self.min_identifier_idf for t in term_ids):
+            return []
+        candidates: np.ndarray | None = None
+        for term_id in term_ids:
+            documents = self._postings_of(term_id)
+            candidates = (
+                documents
+                if candidates is None
+                else np.intersect1d(candidates, documents, assume_unique=True)
+            )
+        assert candidates is not None
+        scores = self._candidate_scores(query, candidates)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [self._hit(int(candidates[i]), float(scores[i])) for i in order]
+
+    def _postings_of(self, term_id: int) -> np.ndarray:
+        return self._postings[self._offsets[term_id] : self._offsets[term_id + 1]]
+
+    def _scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            documents = self._postings[start:end]
+            frequencies = self._frequencies[start:end].astype(np.float32)
+            # Postings of one term are unique, so fancy-index += is safe
+            scores[documents] += (
+                self._idf[term_id]
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + self._length_norm[documents])
+            )
+        return scores
+
+    def _candidate_scores(self, query: str, candidates: np.ndarray) -> np.ndarray:
+        """BM25 scores of a few documents, found by binary search in the postings."""
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        length_norm = self._length_norm[candidates]
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            documents = self._postings[start:end]
+            # Postings are in ascending document order
+            positions = np.minimum(
+                np.searchsorted(documents, candidates), end - start - 1
+            )
+            frequencies = np.where(
+                documents[positions] == candidates,
+                self._frequencies[start:end][positions],
+                0,
+            ).astype(np.float32)
+            scores += (
+                self._idf[term_id]
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + length_norm)
+            )
+        return scores
+
+    def _hit(self, number: int, score: float) -> LexicalHit:
+        return LexicalHit(
+            id=self.ids[number],
+            score=score,
+            document=json.loads(self._payloads[number]),
+        )
+
+    def _top(
+        self, scores: np.ndarray, candidates: np.ndarray, k: int
+    ) -> list[LexicalHit]:
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [self._hit(int(i), float(scores[i])) for i in ranked]
+
+
+def _without_vectors(document: dict[str, Any]) -> dict[str, Any]:
+    return {
+        k: v
+        for k, v in document.items()
+        if not (isinstance(v, list) and v and isinstance(v[0], int | float))
+    }
+
+
+def _read_jsonl(paths: list[str]) -> Iterator[tuple[str, dict[str, Any]]]:
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                document = json.loads(row["json_data"]) if "json_data" in row else row
+                yield str(row.get("id") or document.get("id")), document
+
+
+_indexes: dict[str, LexicalIndex | None] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(data_store_key: str) -> LexicalIndex | None:
+    """
+    Return the index of a data store (keyed like ``technical-docs``), building
+    it on first use from the files configured in SEARCH_LEXICAL_INDEX, or None
+    when the data store has none.
+    """
+    if data_store_key in _indexes:
+        return _indexes[data_store_key]
+    with _indexes_lock:
+        if data_store_key not in _indexes:
+            pattern = env_mapping("SEARCH_LEXICAL_INDEX", str).get(data_store_key)
+            index = None
+            if pattern:
+                try:
+                    index = LexicalIndex.from_jsonl(pattern)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Lexical index for {data_store_key} failed: {e!r}")
+            _indexes[data_store_key] = index
+        return _indexes[data_store_key]
+
+
+def lexical_index_loaded(data_store_key: str) -> bool:
+    """Whether ``get_lexical_index`` returns without building an index."""
+    return data_store_key in _indexes
+
+
+def load_lexical_indexes() -> None:
+    """Build the index of every data store in SEARCH_LEXICAL_INDEX now."""
+    for data_store_key in env_mapping("SEARCH_LEXICAL_INDEX", str):
+        get_lexical_index(data_store_key)
+
+
+def set_lexical_index(data_store_key: str, index: LexicalIndex | None) -> None:
+    """Install the index of a data store; None disables it."""
+    with _indexes_lock:
+        _indexes[data_store_key] = index
+
+
+def reset_lexical_indexes() -> None:
+    """Forget all indexes so the next lookup reads SEARCH_LEXICAL_INDEX again."""
+    with _indexes_lock:
+        _indexes.clear()
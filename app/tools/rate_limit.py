@@ -0,0 +1,470 @@
+"""
+Client-side protection of the Discovery Engine quota.
+
+* ``TokenBucket``: Search RPCs per second a worker may send, shared by all
+  threads and event loops. Data stores use the ``default`` bucket (the project
+  quota) unless they have their own.
+* Retries with decorrelated jitter for codes that mean "try again later", so
+  overloaded backends see spread-out retries instead of synchronized bursts.
+* ``CircuitBreaker``: after repeated overload errors a data store fails fast
+  for a while instead of adding load, then lets one probe through.
+
+Errors raised here subclass the matching ``google.api_core`` exceptions, so
+callers handle them like the service's own. Limiter and circuit state are
+exported as OpenTelemetry metrics by ``app.tools.search_metrics``.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from typing import TypeVar
+
+from google.api_core import exceptions
+
+from app.tools.config import env_mapping
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_BUCKET = "default"
+
+
+class RateLimited(exceptions.ResourceExhausted):
+    """The local rate limiter had no token within the allowed wait."""
+
+
+class CircuitOpen(exceptions.ServiceUnavailable):
+    """The data store's circuit is open after repeated overload errors."""
+
+
+@dataclass
+class BucketStats:
+    acquired: int = 0
+    rejected: int = 0
+    waited_seconds: float = 0.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket handing out reservations: a caller learns how
+    long to wait for its token and sleeps outside the lock, in a thread or on
+    an event loop.
+
+    :param rate: Tokens added per second
+    :param burst: Bucket capacity
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0 or burst <= 0:
+            raise ValueError(
+                f"Token bucket rate and burst must be positive, got {rate}:{burst}"
+            )
+        self.rate = rate
+        self.burst = burst
+        self.stats = BucketStats()
+        self._clock = clock
+        self._tokens = burst
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> float | None:
+        """
+        Take a token and return the seconds to wait before using it, or None
+        (taking nothing) if that would be longer than ``max_wait``.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            # Tokens go negative while reservations are waiting
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                self.stats.rejected += 1
+                return None
+            self._tokens -= 1
+            self.stats.acquired += 1
+            self.stats.waited_seconds += wait
+            return wait
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            elapsed = self._clock() - self._updated_at
+            return min(self.burst, self._tokens + elapsed * self.rate)
+
+    def metrics(self) -> dict[str, float]:
+        tokens = self.tokens
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": tokens,
+                **asdict(self.stats),
+            }
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    :param max_attempts: Attempts per call including the first
+    :param base_delay_seconds: Smallest backoff
+    :param max_delay_seconds: Largest backoff
+    :param max_elapsed_seconds: No retry starts later than this into the call
+    """
+
+    max_attempts: int = 3
+    base_delay_seconds: float = 0.1
+    max_delay_seconds: float = 2.0
+    max_elapsed_seconds: float = 15.0
+    retryable: tuple[type[Exception], ...] = (
+        exceptions.ResourceExhausted,
+        exceptions.ServiceUnavailable,
+        exceptions.Aborted,
+    )
+
+    def is_retryable(self, error: Exception) -> bool:
+        # Local rejections already waited as long as allowed
+        if isinstance(error, RateLimited | CircuitOpen):
+            return False
+        return isinstance(error, self.retryable)
+
+    def next_delay(self, previous: float, rng: random.Random) -> float:
+        """Decorrelated jitter: uniform between the base and 3x the last delay."""
+        return min(
+            self.max_delay_seconds,
+            rng.uniform(
+                self.base_delay_seconds, max(previous, self.base_delay_seconds) * 3
+            ),
+        )
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive overload errors and rejects
+    calls for ``reset_seconds``; then one probe call decides whether it closes
+    again or stays open for another period.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.opens = 0
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # Must be called with self._lock held
+        if (
+            self._state == self.OPEN
+            and self._clock() - self._opened_at >= self.reset_seconds
+        ):
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out; in half-open state only the probe does."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return state == self.CLOSED
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.CLOSED and self._failures < self.failure_threshold:
+                return
+            if self._state == self.CLOSED:
+                self.opens += 1
+                logger.warning(
+                    f"Search circuit opened after {self._failures} overload errors"
+                )
+            # A failed probe opens the circuit for another period
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """End a probe whose outcome says nothing about overload."""
+        with self._lock:
+            self._probing = False
+
+
+@dataclass
+class GuardStats:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    short_circuited: int = 0
+
+
+@dataclass
+class _DataStoreGuard:
+    bucket: TokenBucket | None
+    breaker: CircuitBreaker
+    stats: GuardStats = field(default_factory=GuardStats)
+
+
+# Errors showing the backend is saturated; they count towards opening the circuit
+OVERLOAD_ERRORS: tuple[type[Exception], ...] = (
+    exceptions.ResourceExhausted,
+    exceptions.ServiceUnavailable,
+    exceptions.DeadlineExceeded,
+)
+
+
+class SearchGuard:
+    """
+    Rate limiting, retries and circuit breaking for the searches of each data
+    store, keyed like ``bike-histories``.
+
+    :param buckets: Token buckets by data store key; ``default`` is shared by
+        the data stores without their own. No bucket means no rate limit.
+    :param max_wait_seconds: Longest wait for a token before ``RateLimited``
+    """
+
+    def __init__(
+        self,
+        buckets: dict[str, TokenBucket] | None = None,
+        retry: RetryPolicy | None = None,
+        failure_threshold: int = 5,
+        reset_seconds: float = 10.0,
+        max_wait_seconds: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+        seed: int | None = None,
+    ) -> None:
+        self.buckets = buckets or {}
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._rng = random.Random(seed)
+        self._guards: dict[str, _DataStoreGuard] = {}
+        self._lock = threading.Lock()
+
+    def _guard(self, key: str) -> _DataStoreGuard:
+        with self._lock:
+            if key not in self._guards:
+                self._guards[key] = _DataStoreGuard(
+                    bucket=self.buckets.get(key, self.buckets.get(DEFAULT_BUCKET)),
+                    breaker=CircuitBreaker(
+                        self.failure_threshold, self.reset_seconds, self._clock
+                    ),
+                )
+            return self._guards[key]
+
+    def reserve(self, key: str) -> float:
+        """Seconds to wait for the data store's next RPC; raises RateLimited."""
+        bucket = self._guard(key).bucket
+        if bucket is None:
+            return 0.0
+        wait = bucket.reserve(self.max_wait_seconds)
+        if wait is None:
+            raise RateLimited(f"Client-side rate limit of {key} searches reached")
+        return wait
+
+    def acquire(self, key: str) -> None:
+        """Block until the data store may send its next RPC."""
+        wait = self.reserve(key)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, key: str) -> None:
+        wait = self.reserve(key)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def call(self, key: str, fn: Callable[[], T]) -> T:
+        """Run ``fn`` behind the data store's circuit, retrying overload errors."""
+        guard = self._guard(key)
+        start = self._clock()
+        delay = 0.0
+        for attempt in range(1, self.retry.max_attempts + 1):
+            self._enter(key, guard, attempt)
+            try:
+                result = fn()
+            except exceptions.GoogleAPICallError as e:
+                delay = self._after_failure(guard, e, attempt, start, delay)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                guard.breaker.release()
+                raise
+            guard.breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def acall(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """``call`` for coroutines."""
+        guard = self._guard(key)
+        start = self._clock()
+        delay = 0.0
+        for attempt in range(1, self.retry.max_attempts + 1):
+            self._enter(key, guard, attempt)
+            try:
+                result = await fn()
+            except exceptions.GoogleAPICallError as e:
+                delay = self._after_failure(guard, e, attempt, start, delay)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                guard.breaker.release()
+                raise
+            guard.breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    def _enter(self, key: str, guard: _DataStoreGuard, attempt: int) -> None:
+        with self._lock:
+            if attempt == 1:
+                guard.stats.calls += 1
+            else:
+                guard.stats.retries += 1
+        if not guard.breaker.allow():
+            with self._lock:
+                guard.stats.short_circuited += 1
+            raise CircuitOpen(f"Searches in {key} are failing fast while overloaded")
+
+    def _after_failure(
+        self,
+        guard: _DataStoreGuard,
+        error: exceptions.GoogleAPICallError,
+        attempt: int,
+        start: float,
+        previous_delay: float,
+    ) -> float:
+        """Backoff before the next attempt; re-raises when there is none."""
+        if isinstance(error, OVERLOAD_ERRORS) and not isinstance(
+            error, RateLimited | CircuitOpen
+        ):
+            guard.breaker.record_failure()
+        else:
+            guard.breaker.release()
+        with self._lock:
+            delay = self.retry.next_delay(previous_delay, self._rng)
+        if (
+            not self.retry.is_retryable(error)
+            or attempt >= self.retry.max_attempts
+            or self._clock() - start + delay > self.retry.max_elapsed_seconds
+        ):
+            with self._lock:
+                guard.stats.failures += 1
+            raise error
+        logger.info(f"Retrying search in {delay:.2f}s after {error!r}")
+        return delay
+
+    def metrics(self) -> dict[str, dict[str, float | str]]:
+        with self._lock:
+            guards = dict(self._guards)
+        return {
+            key: {
+                "circuit": guard.breaker.state,
+                "circuit_opens": guard.breaker.opens,
+                **asdict(guard.stats),
+                **(
+                    {f"bucket_{k}": v for k, v in guard.bucket.metrics().items()}
+                    if guard.bucket is not None
+                    else {}
+                ),
+            }
+            for key, guard in guards.items()
+        }
+
+
+def _parse_rate_limit(value: str) -> tuple[float, float]:
+    """Parse ``5:10`` (rate[:burst]) into rate and burst."""
+    rate, _, burst = value.partition(":")
+    return float(rate), float(burst or rate)
+
+
+def search_guard_from_env() -> SearchGuard:
+    """
+    Build the guard from SEARCH_RATE_LIMITS, SEARCH_RETRY_* and SEARCH_CIRCUIT_*
+    environment variables. Without SEARCH_RATE_LIMITS nothing is rate limited.
+    """
+    return SearchGuard(
+        buckets={
+            key: TokenBucket(rate, burst)
+            # E.g. default=10,bike-histories=5:10
+            for key, (rate, burst) in env_mapping(
+                "SEARCH_RATE_LIMITS", _parse_rate_limit
+            ).items()
+        },
+        retry=RetryPolicy(
+            max_attempts=int(os.environ.get("SEARCH_RETRY_MAX_ATTEMPTS", "3")),
+            base_delay_seconds=float(
+                os.environ.get("SEARCH_RETRY_BASE_DELAY_SECONDS", "0.1")
+            ),
+            max_delay_seconds=float(
+                os.environ.get("SEARCH_RETRY_MAX_DELAY_SECONDS", "2")
+            ),
+        ),
+        failure_threshold=int(os.environ.get("SEARCH_CIRCUIT_FAILURES", "5")),
+        reset_seconds=float(os.environ.get("SEARCH_CIRCUIT_RESET_SECONDS", "10")),
+        max_wait_seconds=float(
+            os.environ.get("SEARCH_RATE_LIMIT_MAX_WAIT_SECONDS", "2")
+        ),
+    )
+
+
+_guard: SearchGuard | None = None
+_guard_initialized = False
+_guard_lock = threading.Lock()
+
+
+def get_search_guard() -> SearchGuard | None:
+    """Return the process-wide search guard, or None if it is disabled."""
+    global _guard, _guard_initialized
+    if not _guard_initialized:
+        with _guard_lock:
+            if not _guard_initialized:
+                _guard = search_guard_from_env()
+                _guard_initialized = True
+    return _guard
+
+
+def set_search_guard(guard: SearchGuard | None) -> None:
+    """Replace the process-wide search guard; None disables it."""
+    global _guard, _guard_initialized
+    with _guard_lock:
+        _guard = guard
+        _guard_initialized = True
@@ -0,0 +1,158 @@
+"""
+Cross-source re-ranking of search results before they reach the model.
+
+Each data store ranks its own hits, so a fan-out over several stores hands the
+model every store's top results in an order that says nothing about which are
+best overall. ``SearchReranker`` sends the candidates of all stores to one
+ranking call (``VertexAIRank`` from ``app.retrievers.get_compressor`` in
+production) and keeps only the ``top_n`` best, which cuts prompt tokens and
+time to first token. Only ``search_all_sources`` is re-ranked; a single-source
+tool already returns just its store's top ``max_results``, so a ranking call
+there would add a round trip to reorder a handful of results.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass
+from typing import Generic, TypeVar
+
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class RerankStats:
+    calls: int = 0
+    candidates: int = 0
+    kept: int = 0
+    failures: int = 0
+
+
+@dataclass(frozen=True)
+class RankedResult(Generic[T]):
+    source: T
+    text: str
+    score: float | None = None
+
+
+class SearchReranker:
+    """
+    Re-ranks formatted search results of one or more data stores in a single
+    compressor call and truncates them to ``top_n``.
+
+    The compressor has to return documents carrying the ``id`` metadata of the
+    candidates it keeps, best first, as ``VertexAIRank`` does. ``compressor``
+    may also be a zero-argument factory, called on first use so the ranking
+    client is not built at import time.
+    """
+
+    def __init__(
+        self,
+        compressor: BaseDocumentCompressor | Callable[[], BaseDocumentCompressor],
+        top_n: int = 8,
+    ) -> None:
+        self._compressor = (
+            compressor if isinstance(compressor, BaseDocumentCompressor) else None
+        )
+        self._factory = None if self._compressor is not None else compressor
+        self.top_n = top_n
+        self.stats = RerankStats()
+        self._lock = threading.Lock()
+
+    @property
+    def compressor(self) -> BaseDocumentCompressor:
+        if self._compressor is None:
+            with self._lock:
+                if self._compressor is None:
+                    assert callable(self._factory)
+                    self._compressor = self._factory()
+        return self._compressor
+
+    def rerank(
+        self, search_query: str, candidates: Sequence[tuple[T, str]]
+    ) -> list[RankedResult[T]]:
+        """
+        The ``top_n`` best ``(source, text)`` candidates for the query. Without
+        a usable ranking the candidates are kept in their given order.
+        """
+        if len(candidates) <= 1:
+            return [RankedResult(source, text) for source, text in candidates]
+        documents = [
+            Document(page_content=text, metadata={"id": str(i)})
+            for i, (_, text) in enumerate(candidates)
+        ]
+        try:
+            ranked = self.compressor.compress_documents(documents, search_query)
+        except Exception as e:
+            # Ranking only reorders results; keep the given order instead
+            logger.warning(f"Re-ranking {len(candidates)} results failed: {e!r}")
+            ranked = []
+        return self._select(candidates, ranked)
+
+    async def arerank(
+        self, search_query: str, candidates: Sequence[tuple[T, str]]
+    ) -> list[RankedResult[T]]:
+        """``rerank`` on a worker thread, as the ranking clients are blocking."""
+        return await asyncio.to_thread(self.rerank, search_query, candidates)
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return asdict(self.stats)
+
+    def _select(
+        self, candidates: Sequence[tuple[T, str]], ranked: Sequence[Document]
+    ) -> list[RankedResult[T]]:
+        results: list[RankedResult[T]] = []
+        seen: set[int] = set()
+        for document in ranked:
+            number = int(document.metadata.get("id", -1))
+            if 0 <= number < len(candidates) and number not in seen:
+                seen.add(number)
+                source, text = candidates[number]
+                score = document.metadata.get("relevance_score")
+                results.append(RankedResult(source, text, score))
+        failed = not results
+        if failed:
+            results = [RankedResult(source, text) for source, text in candidates]
+        results = results[: self.top_n]
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.candidates += len(candidates)
+            self.stats.kept += len(results)
+            self.stats.failures += failed
+        return results
+
+
+def search_reranker_from_env(
+    compressor: Callable[[int], BaseDocumentCompressor],
+) -> SearchReranker | None:
+    """
+    Build the re-ranker from SEARCH_RERANK_* environment variables.
+
+    It is opt-in (SEARCH_RERANK=true) because it adds one ranking call per
+    multi-source search. ``compressor`` builds the ranking client for a top N.
+    """
+    if os.environ.get("SEARCH_RERANK", "false").lower() != "true":
+        return None
+    top_n = int(os.environ.get("SEARCH_RERANK_TOP_N", "8"))
+    return SearchReranker(lambda: compressor(top_n), top_n=top_n)
+
+
+_search_reranker: SearchReranker | None = None
+
+
+def get_search_reranker() -> SearchReranker | None:
+    """Return the process-wide search re-ranker, or None if it is not enabled."""
+    return _search_reranker
+
+
+def set_search_reranker(reranker: SearchReranker | None) -> None:
+    """Install the process-wide search re-ranker; None disables it."""
+    global _search_reranker
+    _search_reranker = reranker
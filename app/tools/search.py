@@ -1,14 +1,34 @@
+import functools
 import logging
 import os
-from dataclasses import dataclass
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
 
 from google.api_core import exceptions
-from google.api_core.client_options import ClientOptions
 from google.cloud import discoveryengine_v1 as discoveryengine
 from google.cloud.discoveryengine_v1.services.search_service import SearchServiceClient
-from google.protobuf import struct_pb2
-from google.protobuf.json_format import MessageToDict
-from proto.marshal.collections.maps import MapComposite
+
+from app.tools.cache import get_search_cache, normalize_query
+from app.tools.client_pool import get_search_client_pool
+from app.tools.config import env_mapping
+from app.tools.formatting import ResultFormatter, SearchResultFormatter
+from app.tools.hedging import get_hedger
+from app.tools.identifier_index import get_identifier_index
+from app.tools.lexical_index import get_lexical_index
+from app.tools.rate_limit import CircuitOpen, get_search_guard
+from app.tools.search_metrics import (
+    RESULTS_ATTRIBUTE,
+    SOURCE_ATTRIBUTE,
+    get_latency_recorder,
+    get_response_size_recorder,
+    get_search_instruments,
+    search_span,
+)
+from app.tools.semantic_cache import get_semantic_cache
+from app.tools.single_flight import get_single_flight
+from app.tools.struct_decoding import decode_struct_data, result_struct_data
 
 logger = logging.getLogger(__name__)
 
@@ -27,33 +47,119 @@ engine_id = os.environ.get(
     "GOOGLE_VERTEX_ENGINE_ID", "yeply-master-search-intern_1747655638365"
 )
 
+API_ENDPOINT = (
+    f"{location}-discoveryengine.googleapis.com"
+    if location != "global"
+    else SearchServiceClient.DEFAULT_ENDPOINT
+)
+
+
+# E.g. bike-histories=4,slack-messages=2.5
+DEADLINE_OVERRIDES = env_mapping("SEARCH_DEADLINE_OVERRIDES", float)
+SERVING_CONFIG = f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_config"
+
+
+@dataclass(frozen=True)
+class SearchProfile:
+    """
+    What a search call asks Discovery Engine to send back for one data store.
+
+    The defaults request exactly the results that get formatted and nothing the
+    formatter ignores. Snippets and extractive segments land in
+    ``derived_struct_data``, which only unstructured data stores fill.
+
+    Discovery Engine v1 has no per-request field mask for ``struct_data``; to
+    keep fields such as embeddings off the wire, mark them non-retrievable in
+    the data store schema. The formatter's ``fields`` projection is applied
+    while decoding.
+
+    :param page_size: Results per response page
+    :param max_results: Results that are formatted; further ones are dropped
+    :param max_snippet_count: Snippets per result, 0 to not request snippets
+    :param max_extractive_segment_count: Extractive segments per result
+    :param max_extractive_answer_count: Extractive answers per result
+    :param deadline_seconds: Timeout of every Search RPC, overridable with
+        SEARCH_DEADLINE_OVERRIDES
+    """
+
+    page_size: int = 5
+    max_results: int = 5
+    max_snippet_count: int = 0
+    max_extractive_segment_count: int = 0
+    max_extractive_answer_count: int = 0
+    deadline_seconds: float = float(os.environ.get("SEARCH_DEADLINE_SECONDS", "10"))
+
+    def content_search_spec(
+        self,
+    ) -> discoveryengine.SearchRequest.ContentSearchSpec | None:
+        spec = discoveryengine.SearchRequest.ContentSearchSpec
+        if self.max_snippet_count <= 0 and not (
+            self.max_extractive_segment_count or self.max_extractive_answer_count
+        ):
+            return None
+        return spec(
+            snippet_spec=spec.SnippetSpec(
+                return_snippet=self.max_snippet_count > 0,
+                max_snippet_count=self.max_snippet_count,
+            ),
+            extractive_content_spec=spec.ExtractiveContentSpec(
+                max_extractive_segment_count=self.max_extractive_segment_count,
+                max_extractive_answer_count=self.max_extractive_answer_count,
+            ),
+        )
+
 
-@dataclass
+@dataclass(frozen=True)
 class DataStore:
     id: str
     name: str
+    # Turns the documents of one search call into the text the model sees
+    formatter: SearchResultFormatter = field(default_factory=ResultFormatter)
+    profile: SearchProfile = field(default_factory=SearchProfile)
+
+    @property
+    def key(self) -> str:
+        """Short, stable name of the data store, e.g. ``technical-docs``."""
+        return self.id.rsplit("_", 1)[0]
 
 
 DATA_STORES = [
     DataStore(
         id="technical-docs_1751366705621",
         name="Technical Docs for Bikes",
+        formatter=ResultFormatter(fields=("title", "link", "content", "body")),
     ),
     DataStore(
         id="bike-histories_1751381211957",
         name="Work order and Damage report histories of bikes",
+        formatter=ResultFormatter(
+            fields=(
+                "frame_number",
+                "customer_bike_id",
+                "work_order_number",
+                "date",
+                "work_description",
+                "damage_report",
+                "content",
+            )
+        ),
     ),
     DataStore(
         id="slack-messages_1747059296012",
         name="Slack messages from internal technical channels",
+        formatter=ResultFormatter(
+            fields=("channel", "date", "text", "content", "link")
+        ),
     ),
     DataStore(
         id="yeplypedia_1751380874456",
         name="Internal Yeplypedia knowledge base (wiki-like)",
+        formatter=ResultFormatter(fields=("title", "link", "body", "content")),
     ),
     DataStore(
         id="erp-software-system_1751387305393",
         name="Documentation on how to use our ERP software system",
+        formatter=ResultFormatter(fields=("title", "link", "content", "body")),
     ),
 ]
 
@@ -73,7 +179,8 @@ def search_bike_histories(search_query: str) -> str:
     Searches work order and damage report histories of bikes
 
     Args:
-        search_query: Important keywords to search for
+        search_query: Important keywords to search for; include frame numbers,
+            customer bike IDs and work order numbers verbatim
     """
     return search_engine(search_query, DATA_STORES[1])
 
@@ -110,6 +217,12 @@ def search_erp_software_system(search_query: str) -> str:
     return search_engine(search_query, DATA_STORES[4])
 
 
+@functools.cache
+def data_store_path(data_store_id: str) -> str:
+    """Full resource name of a data store within the search engine's location."""
+    return f"projects/{project_id}/locations/{location}/collections/default_collection/dataStores/{data_store_id}"
+
+
 def search_engine(search_query: str, data_store: DataStore) -> str:
     """
     Search the engine and return formatted results as a markdown string for LLM consumption.
@@ -119,86 +232,256 @@ def search_engine(search_query: str, data_store: DataStore) -> str:
     """
 
     try:
-        client_options = (
-            ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
-            if location != "global"
-            else None
-        )
-
-        client = SearchServiceClient(client_options=client_options)
+        results = fetch_search_results(search_query, data_store)
+        return render_search_results(results, data_store)
 
-        serving_config = f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_config"
-
-        request = discoveryengine.SearchRequest(
-            serving_config=serving_config,
-            query=search_query,
-            page_size=8,
-            content_search_spec=discoveryengine.SearchRequest.ContentSearchSpec(
-                snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
-                    return_snippet=True,
-                    max_snippet_count=1,  # Limit snippets to 1 per result
-                )
-            ),
-            data_store_specs=[
-                discoveryengine.SearchRequest.DataStoreSpec(
-                    data_store=f"projects/{project_id}/locations/{location}/collections/default_collection/dataStores/{data_store.id}"
-                )
-            ],
-            params={
-                "user_country_code": "nl",
-            },
+    except CircuitOpen:
+        return (
+            f"Search in '{data_store.name}' is temporarily unavailable. "
+            "Answer without it or try again later."
         )
+    except exceptions.ResourceExhausted:
+        return (
+            "Rate limit exceeded. Do not retry this search right away; answer "
+            "with what you have or try again in a moment."
+        )
+    except exceptions.DeadlineExceeded:
+        return f"Search in '{data_store.name}' timed out. Please try again."
+    except exceptions.GoogleAPICallError:
+        logger.exception(f"Search in {data_store.id} failed")
+        return (
+            f"Search in '{data_store.name}' failed. Do not retry this search right "
+            "away; answer with what you have or try again in a moment."
+        )
+    # except Exception as e:
+    #     return f"Search encountered an error: {str(e)[:100]}..."
 
-        # Execute search with timeout handling
-        page_result = client.search(request)
-
-        results = []
-        result_count = 0
-        max_results = 5
-
-        for response in page_result:
-            if result_count >= max_results:
-                break
 
-            if response.document.struct_data:
-                formatted_result = format_search_result_for_llm(
-                    response.document.struct_data
-                )
-                if formatted_result:
-                    results.append(formatted_result)
-                    result_count += 1
+def fetch_search_results(search_query: str, data_store: DataStore) -> list[str]:
+    """Formatted results of one data store in rank order, cached when enabled."""
+    start = time.perf_counter()
+    with search_span(data_store.id) as span:
+        try:
+            results, source = _fetch_search_results(search_query, data_store)
+        except Exception as e:
+            get_search_instruments().record_search(
+                data_store.id, time.perf_counter() - start, error=e
+            )
+            raise
+        span.set_attribute(SOURCE_ATTRIBUTE, source)
+        span.set_attribute(RESULTS_ATTRIBUTE, len(results))
+    get_search_instruments().record_search(
+        data_store.id, time.perf_counter() - start, source, len(results)
+    )
+    return results
+
+
+def _fetch_search_results(
+    search_query: str, data_store: DataStore
+) -> tuple[list[str], str]:
+    """``fetch_search_results`` and the name of the source that answered."""
+    cache = get_search_cache()
+    if cache is not None:
+        cached = cache.get(data_store.id, search_query)
+        if cached is not None:
+            return cached, "cache"
+    identified = identifier_results(search_query, data_store)
+    if identified is not None:
+        return identified, "identifier_index"
+    lexical = lexical_results(search_query, data_store)
+    if lexical is not None:
+        return lexical, "lexical_index"
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        cached = semantic_cache.lookup(data_store.id, search_query)
+        if cached is not None:
+            return cached, "semantic_cache"
+
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return search_remote(search_query, data_store), "remote"
+    # Identical searches in flight share one request
+    key = (data_store.id, normalize_query(search_query))
+    results = single_flight.do(key, lambda: search_remote(search_query, data_store))
+    return list(results), "remote"
+
+
+def search_remote(search_query: str, data_store: DataStore) -> list[str]:
+    """Search the data store in Discovery Engine and cache the results."""
+    request = build_search_request(search_query, data_store)
+    page_sizes: list[int] = []
+    start = time.perf_counter()
+    try:
+        results = format_search_results(
+            _page_results(search_pages(request, data_store), page_sizes), data_store
+        )
+    except exceptions.DeadlineExceeded:
+        get_latency_recorder().record_deadline_exceeded(data_store.id)
+        raise
+    get_latency_recorder().record_call(data_store.id, time.perf_counter() - start)
+    record_response_size(data_store, page_sizes, len(results))
 
-        if results:
-            output = ""
-            for i, result in enumerate(results, 1):
-                output += f"## Result {i}\n{result}\n\n---\n\n"
-        else:
-            output = "No relevant results found."
+    if (cache := get_search_cache()) is not None:
+        cache.put(data_store.id, search_query, results)
+    if (semantic_cache := get_semantic_cache()) is not None:
+        semantic_cache.add(data_store.id, search_query, results)
+    return results
 
-        return f"# Search Results for '{data_store.name}'\n\n{output}"
-
-    except exceptions.ResourceExhausted:
-        return "Rate limit exceeded. Please try again in a moment."
-    # except Exception as e:
-    #     return f"Search encountered an error: {str(e)[:100]}..."
 
+def identifier_results(search_query: str, data_store: DataStore) -> list[str] | None:
+    """
+    Formatted chunks of the identifiers (frame numbers, work order numbers, ...)
+    named in the query, from the data store's identifier index; None when it
+    has no index or the query names no identifier in it.
+    """
+    index = get_identifier_index(data_store.key)
+    if index is None:
+        return None
+    hits = index.lookup(search_query, data_store.profile.max_results)
+    if not hits:
+        return None
+    logger.info(f"Answered '{search_query}' in {data_store.id} from identifier index")
+    return data_store.formatter.format_results([hit.document for hit in hits])
+
+
+def search_pages(
+    request: discoveryengine.SearchRequest, data_store: DataStore
+) -> Iterator[discoveryengine.SearchResponse]:
+    """
+    Response pages of a search, each fetched by one RPC on a client leased
+    from the pool for that RPC and bounded by the data store's deadline. The
+    first RPC is hedged when a hedger is installed, and rate limited, retried
+    and circuit broken when a search guard is. Further pages are only fetched
+    as the caller reads on.
+    """
+    deadline = deadline_for(data_store)
+    guard = get_search_guard()
+
+    def fetch(
+        page_request: discoveryengine.SearchRequest,
+    ) -> discoveryengine.SearchResponse:
+        with get_search_client_pool().client(API_ENDPOINT) as client:
+            pager = client.search(page_request, timeout=deadline)
+        # The pager holds the page it was created with; reading it sends no RPC
+        return next(iter(pager.pages))
+
+    def attempt() -> discoveryengine.SearchResponse:
+        if guard is not None:
+            # Hedges spend rate limit tokens too
+            guard.acquire(data_store.key)
+        start = time.perf_counter()
+        try:
+            return fetch(request)
+        finally:
+            get_latency_recorder().record_attempt(
+                data_store.id, time.perf_counter() - start
+            )
+
+    def hedged() -> discoveryengine.SearchResponse:
+        hedger = get_hedger()
+        return hedger.call(data_store.id, attempt) if hedger else attempt()
+
+    page = guard.call(data_store.key, hedged) if guard else hedged()
+    yield page
+    while page.next_page_token:
+        page = fetch(
+            discoveryengine.SearchRequest(request, page_token=page.next_page_token)
+        )
+        yield page
 
-def format_search_result_for_llm(struct_data: struct_pb2.Struct | MapComposite) -> str:
-    data = struct_data_to_dict(struct_data)
-    logger.info(f"Formatting search result: {data}")
 
-    # content = data.get("content", "")
-    # if content:
-    #     return f"**Content:**\n{content}"
+def deadline_for(data_store: DataStore) -> float:
+    """RPC timeout of a data store, SEARCH_DEADLINE_OVERRIDES taking precedence."""
+    return DEADLINE_OVERRIDES.get(data_store.key, data_store.profile.deadline_seconds)
 
-    # Don't use json.dumps as the data might contain non-serializable objects like proto.marshal.collections.repeated.RepeatedComposite
-    raw_data = str(data)
-    return f"**Data:**\n{raw_data}"
 
+def lexical_results(search_query: str, data_store: DataStore) -> list[str] | None:
+    """
+    Formatted results from the data store's in-process lexical index, if it has
+    one and every identifier in the query matches; None otherwise.
+    """
+    index = get_lexical_index(data_store.key)
+    if index is None:
+        return None
+    hits = index.confident_search(search_query, data_store.profile.max_results)
+    if not hits:
+        return None
+    logger.info(f"Answered '{search_query}' in {data_store.id} from lexical index")
+    return data_store.formatter.format_results([hit.document for hit in hits])
+
+
+def build_search_request(
+    search_query: str, data_store: DataStore
+) -> discoveryengine.SearchRequest:
+    return discoveryengine.SearchRequest(
+        serving_config=SERVING_CONFIG,
+        query=search_query,
+        page_size=data_store.profile.page_size,
+        content_search_spec=data_store.profile.content_search_spec(),
+        data_store_specs=[
+            discoveryengine.SearchRequest.DataStoreSpec(
+                data_store=data_store_path(data_store.id)
+            )
+        ],
+        params={
+            "user_country_code": "nl",
+        },
+    )
+
+
+def _page_results(
+    pages: Iterable[discoveryengine.SearchResponse], page_sizes: list[int]
+) -> Iterator[discoveryengine.SearchResponse.SearchResult]:
+    """Results of all pages read, appending each page's payload size."""
+    for page in pages:
+        page_sizes.append(discoveryengine.SearchResponse.pb(page).ByteSize())
+        yield from page.results
+
+
+def record_response_size(
+    data_store: DataStore, page_sizes: list[int], result_count: int
+) -> None:
+    response_bytes = sum(page_sizes)
+    get_response_size_recorder().record(
+        data_store.id, response_bytes, len(page_sizes), result_count
+    )
+    get_search_instruments().record_response(data_store.id, response_bytes)
+    logger.debug(
+        f"Search in {data_store.id} read {response_bytes} bytes "
+        f"in {len(page_sizes)} page(s)"
+    )
+
+
+def format_search_results(
+    responses: Iterable[discoveryengine.SearchResponse.SearchResult],
+    data_store: DataStore,
+    max_results: int | None = None,
+) -> list[str]:
+    max_results = max_results or data_store.profile.max_results
+    documents: list[dict[str, Any]] = []
+
+    for response in responses:
+        struct_data = result_struct_data(response)
+        if struct_data is not None:
+            documents.append(
+                decode_struct_data(struct_data, data_store.formatter.fields)
+            )
+        # Stop before pulling another result, which may fetch another page
+        if len(documents) >= max_results:
+            break
+
+    logger.debug(f"Formatting {len(documents)} results of {data_store.id}")
+    return data_store.formatter.format_results(documents)
+
+
+def render_search_results(results: list[str], data_store: DataStore) -> str:
+    if results:
+        output = "".join(
+            f"## Result {i}\n{result}\n\n---\n\n" for i, result in enumerate(results, 1)
+        )
+    else:
+        output = "No relevant results found."
 
-def struct_data_to_dict(struct_data: struct_pb2.Struct | MapComposite) -> dict:
-    if isinstance(struct_data, MapComposite):
-        return dict(struct_data)
-    if isinstance(struct_data, struct_pb2.Struct):
-        return MessageToDict(struct_data)
-    raise ValueError(f"Unsupported type: {type(struct_data)}")
+    rendered = f"# Search Results for '{data_store.name}'\n\n{output}"
+    get_search_instruments().record_output(data_store.id, len(rendered))
+    return rendered
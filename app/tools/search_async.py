@@ -0,0 +1,402 @@
+"""
+Async variants of the search tools in app.tools.search.
+
+They share request building and result formatting with the sync tools but run
+on SearchServiceAsyncClient, so a worker's event loop can keep many searches in
+flight instead of blocking on each Discovery Engine round trip. Function names
+and docstrings match the sync tools because ADK exposes them to the model.
+
+search_all_sources fans one query out to several data stores concurrently and,
+when a re-ranker is installed, keeps only the best results across them. The
+single-source tools are not re-ranked: they return one store's own top
+``max_results``.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from typing import Any, Optional
+
+from google.api_core import exceptions
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+from app.tools.cache import get_search_cache, normalize_query
+from app.tools.client_pool import get_search_client_pool
+from app.tools.hedging import get_hedger
+from app.tools.identifier_index import get_identifier_index, identifier_index_loaded
+from app.tools.lexical_index import get_lexical_index, lexical_index_loaded
+from app.tools.rate_limit import CircuitOpen, get_search_guard
+from app.tools.rerank import get_search_reranker
+from app.tools.search import (
+    API_ENDPOINT,
+    DATA_STORES,
+    DataStore,
+    build_search_request,
+    deadline_for,
+    identifier_results,
+    lexical_results,
+    record_response_size,
+    render_search_results,
+)
+from app.tools.search_metrics import (
+    RESULTS_ATTRIBUTE,
+    SOURCE_ATTRIBUTE,
+    get_latency_recorder,
+    get_search_instruments,
+    search_span,
+)
+from app.tools.semantic_cache import get_semantic_cache
+from app.tools.single_flight import get_single_flight
+from app.tools.struct_decoding import decode_struct_data, result_struct_data
+
+logger = logging.getLogger(__name__)
+
+FANOUT_DEADLINE_SECONDS = float(os.environ.get("SEARCH_FANOUT_DEADLINE_SECONDS", "8"))
+FANOUT_MAX_CHARS = int(os.environ.get("SEARCH_FANOUT_MAX_CHARS", "12000"))
+
+
+async def search_technical_docs(search_query: str) -> str:
+    """
+    Searches for technical bike documentation
+
+    Args:
+        search_query: Important keywords to search for
+    """
+    return await search_engine_async(search_query, DATA_STORES[0])
+
+
+async def search_bike_histories(search_query: str) -> str:
+    """
+    Searches work order and damage report histories of bikes
+
+    Args:
+        search_query: Important keywords to search for; include frame numbers,
+            customer bike IDs and work order numbers verbatim
+    """
+    return await search_engine_async(search_query, DATA_STORES[1])
+
+
+async def search_slack_messages(search_query: str) -> str:
+    """
+    Searches for messages from internal technical channels
+
+    Args:
+        search_query: Important keywords to search for
+    """
+    return await search_engine_async(search_query, DATA_STORES[2])
+
+
+async def search_yeplypedia(search_query: str) -> str:
+    """
+    Searches for information in the internal Yeplypedia knowledge base.
+    It contains various information about company processes, procedures, tutorials, customer-specific information, etc.
+
+    Args:
+        search_query: Important keywords to search for
+    """
+    return await search_engine_async(search_query, DATA_STORES[3])
+
+
+async def search_erp_software_system(search_query: str) -> str:
+    """
+    Searches for information on how to use our ERP software system, including Ops tool, Vantool, B2B portal (My-Business), B2C portal (My-Yeply) and booking app.
+    It also includes general information about the software system, and integration with other systems and businesses.
+
+    Args:
+        search_query: Important keywords to search for
+    """
+    return await search_engine_async(search_query, DATA_STORES[4])
+
+
+async def search_all_sources(
+    search_query: str,
+    sources: Optional[list[str]] = None,  # noqa: UP045 - ADK cannot parse `X | None`
+) -> str:
+    """
+    Searches several sources at once and returns one merged list of results.
+    Prefer this over calling the single-source search tools one after another.
+
+    Args:
+        search_query: Important keywords to search for
+        sources: Sources to search, any of "technical-docs", "bike-histories", "slack-messages", "yeplypedia", "erp-software-system". Searches all sources if empty.
+    """
+    data_stores = [ds for ds in DATA_STORES if not sources or ds.key in sources]
+    if not data_stores:
+        known = ", ".join(ds.key for ds in DATA_STORES)
+        return f"Unknown sources {sources}. Available sources: {known}"
+
+    tasks = {
+        asyncio.create_task(fetch_search_results_async(search_query, ds)): ds
+        for ds in data_stores
+    }
+    done, pending = await asyncio.wait(tasks, timeout=FANOUT_DEADLINE_SECONDS)
+    for task in pending:
+        task.cancel()
+
+    per_source: list[tuple[DataStore, list[str]]] = []
+    notes = [f"- {tasks[task].name}: timed out" for task in pending]
+    for task, data_store in tasks.items():
+        if task not in done:
+            continue
+        if task.cancelled():
+            # E.g. a shared request that its other waiters abandoned
+            logger.warning(f"Search in {data_store.id} was cancelled")
+            notes.append(f"- {data_store.name}: failed")
+        elif (error := task.exception()) is not None:
+            logger.warning(f"Search in {data_store.id} failed: {error!r}")
+            if isinstance(error, CircuitOpen):
+                reason = "temporarily unavailable"
+            elif isinstance(error, exceptions.ResourceExhausted):
+                reason = "rate limit exceeded"
+            elif isinstance(error, exceptions.DeadlineExceeded):
+                reason = "timed out"
+            else:
+                reason = "failed"
+            notes.append(f"- {data_store.name}: {reason}")
+        else:
+            per_source.append((data_store, task.result()))
+
+    ranked = merge_results(per_source)
+    reranker = get_search_reranker()
+    if reranker is not None:
+        ranked = [
+            (r.source, r.text) for r in await reranker.arerank(search_query, ranked)
+        ]
+    output_chars: dict[str, int] = {}
+    for data_store, text in ranked:
+        output_chars[data_store.id] = output_chars.get(data_store.id, 0) + len(text)
+    for data_store_id, chars in output_chars.items():
+        get_search_instruments().record_output(data_store_id, chars)
+    return render_ranked_results(ranked, notes, FANOUT_MAX_CHARS)
+
+
+def merge_results(
+    per_source: list[tuple[DataStore, list[str]]],
+) -> list[tuple[DataStore, str]]:
+    """Interleave the ranked results of several sources and drop duplicates."""
+    seen: set[str] = set()
+    merged: list[tuple[DataStore, str]] = []
+    rank = 0
+    while any(rank < len(r) for _, r in per_source):
+        for data_store, results in per_source:
+            if rank >= len(results):
+                continue
+            fingerprint = " ".join(results[rank].split())
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                merged.append((data_store, results[rank]))
+        rank += 1
+    return merged
+
+
+def render_ranked_results(
+    ranked: list[tuple[DataStore, str]], notes: list[str], max_chars: int
+) -> str:
+    """Render results in the given order, stopping before ``max_chars``."""
+    sections: list[str] = []
+    used = 0
+    for data_store, result in ranked:
+        section = (
+            f"## Result {len(sections) + 1} ({data_store.name})\n{result}\n\n---\n\n"
+        )
+        if used + len(section) > max_chars:
+            if not sections:
+                sections.append(section[:max_chars])
+            break
+        sections.append(section)
+        used += len(section)
+
+    output = "".join(sections) or "No relevant results found.\n\n"
+    if notes:
+        output += "Sources without results in time:\n" + "\n".join(notes) + "\n"
+    return f"# Search Results across sources\n\n{output}"
+
+
+async def search_engine_async(search_query: str, data_store: DataStore) -> str:
+    """
+    Search the engine without blocking the event loop and return formatted results
+    as a markdown string for LLM consumption.
+
+    Returns:
+        str: Formatted search results as markdown text
+    """
+
+    try:
+        results = await fetch_search_results_async(search_query, data_store)
+        return render_search_results(results, data_store)
+
+    except CircuitOpen:
+        return (
+            f"Search in '{data_store.name}' is temporarily unavailable. "
+            "Answer without it or try again later."
+        )
+    except exceptions.ResourceExhausted:
+        return (
+            "Rate limit exceeded. Do not retry this search right away; answer "
+            "with what you have or try again in a moment."
+        )
+    except exceptions.DeadlineExceeded:
+        return f"Search in '{data_store.name}' timed out. Please try again."
+    except exceptions.GoogleAPICallError:
+        logger.exception(f"Search in {data_store.id} failed")
+        return (
+            f"Search in '{data_store.name}' failed. Do not retry this search right "
+            "away; answer with what you have or try again in a moment."
+        )
+
+
+async def fetch_search_results_async(
+    search_query: str, data_store: DataStore
+) -> list[str]:
+    """Search one data store and return its formatted results in rank order."""
+    start = time.perf_counter()
+    with search_span(data_store.id) as span:
+        try:
+            results, source = await _fetch_search_results_async(
+                search_query, data_store
+            )
+        except (Exception, asyncio.CancelledError) as e:
+            get_search_instruments().record_search(
+                data_store.id, time.perf_counter() - start, error=e
+            )
+            raise
+        span.set_attribute(SOURCE_ATTRIBUTE, source)
+        span.set_attribute(RESULTS_ATTRIBUTE, len(results))
+    get_search_instruments().record_search(
+        data_store.id, time.perf_counter() - start, source, len(results)
+    )
+    return results
+
+
+async def _fetch_search_results_async(
+    search_query: str, data_store: DataStore
+) -> tuple[list[str], str]:
+    """``fetch_search_results_async`` and the name of the source that answered."""
+    cache = get_search_cache()
+    if cache is not None:
+        cached = await cache.aget(data_store.id, search_query)
+        if cached is not None:
+            return cached, "cache"
+    identified = await identifier_results_async(search_query, data_store)
+    if identified is not None:
+        return identified, "identifier_index"
+    lexical = await lexical_results_async(search_query, data_store)
+    if lexical is not None:
+        return lexical, "lexical_index"
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        cached = await semantic_cache.alookup(data_store.id, search_query)
+        if cached is not None:
+            return cached, "semantic_cache"
+
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return await search_remote_async(search_query, data_store), "remote"
+    # Identical searches in flight share one request, with the sync tools too
+    key = (data_store.id, normalize_query(search_query))
+    results = await single_flight.ado(
+        key, lambda: search_remote_async(search_query, data_store)
+    )
+    return list(results), "remote"
+
+
+async def identifier_results_async(
+    search_query: str, data_store: DataStore
+) -> list[str] | None:
+    """``identifier_results``, reading the index in a thread rather than on the loop."""
+    if not identifier_index_loaded(data_store.key):
+        await asyncio.to_thread(get_identifier_index, data_store.key)
+    return identifier_results(search_query, data_store)
+
+
+async def lexical_results_async(
+    search_query: str, data_store: DataStore
+) -> list[str] | None:
+    """``lexical_results``, building the index in a thread rather than on the loop."""
+    if not lexical_index_loaded(data_store.key):
+        await asyncio.to_thread(get_lexical_index, data_store.key)
+    return lexical_results(search_query, data_store)
+
+
+async def search_remote_async(search_query: str, data_store: DataStore) -> list[str]:
+    """Async ``search_remote``."""
+    request = build_search_request(search_query, data_store)
+    max_results = data_store.profile.max_results
+    documents: list[dict[str, Any]] = []
+    page_sizes: list[int] = []
+
+    start = time.perf_counter()
+    try:
+        async for page in search_pages_async(request, data_store):
+            page_sizes.append(discoveryengine.SearchResponse.pb(page).ByteSize())
+            for response in page.results:
+                if len(documents) >= max_results:
+                    break
+
+                struct_data = result_struct_data(response)
+                if struct_data is not None:
+                    documents.append(
+                        decode_struct_data(struct_data, data_store.formatter.fields)
+                    )
+            if len(documents) >= max_results:
+                break
+    except exceptions.DeadlineExceeded:
+        get_latency_recorder().record_deadline_exceeded(data_store.id)
+        raise
+    get_latency_recorder().record_call(data_store.id, time.perf_counter() - start)
+
+    results = data_store.formatter.format_results(documents)
+    record_response_size(data_store, page_sizes, len(results))
+
+    if (cache := get_search_cache()) is not None:
+        await cache.aput(data_store.id, search_query, results)
+    if (semantic_cache := get_semantic_cache()) is not None:
+        await semantic_cache.aadd(data_store.id, search_query, results)
+    return results
+
+
+def search_pages_async(
+    request: discoveryengine.SearchRequest, data_store: DataStore
+) -> AsyncIterator[discoveryengine.SearchResponse]:
+    """
+    Async ``search_pages``: a client leased and a deadline per RPC, first RPC
+    hedged and guarded if enabled.
+    """
+    deadline = deadline_for(data_store)
+    guard = get_search_guard()
+
+    async def fetch(
+        page_request: discoveryengine.SearchRequest,
+    ) -> discoveryengine.SearchResponse:
+        async with get_search_client_pool().async_client(API_ENDPOINT) as client:
+            pager = await client.search(page_request, timeout=deadline)
+        # The pager holds the page it was created with; reading it sends no RPC
+        return await anext(aiter(pager.pages))
+
+    async def attempt() -> discoveryengine.SearchResponse:
+        if guard is not None:
+            await guard.aacquire(data_store.key)
+        start = time.perf_counter()
+        try:
+            return await fetch(request)
+        finally:
+            get_latency_recorder().record_attempt(
+                data_store.id, time.perf_counter() - start
+            )
+
+    async def hedged() -> discoveryengine.SearchResponse:
+        hedger = get_hedger()
+        return await (hedger.acall(data_store.id, attempt) if hedger else attempt())
+
+    async def pages() -> AsyncIterator[discoveryengine.SearchResponse]:
+        page = await (guard.acall(data_store.key, hedged) if guard else hedged())
+        yield page
+        while page.next_page_token:
+            page = await fetch(
+                discoveryengine.SearchRequest(request, page_token=page.next_page_token)
+            )
+            yield page
+
+    return pages()
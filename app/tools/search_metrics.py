@@ -0,0 +1,409 @@
+import asyncio
+import bisect
+import math
+import threading
+from collections.abc import Iterable
+from contextlib import AbstractContextManager
+from dataclasses import asdict, dataclass, field
+
+from google.api_core import exceptions
+from opentelemetry import metrics, trace
+
+from app.tools.rate_limit import CircuitBreaker, get_search_guard
+
+
+@dataclass
+class ResponseSizeStats:
+    calls: int = 0
+    pages: int = 0
+    results: int = 0
+    response_bytes: int = 0
+    max_response_bytes: int = 0
+
+    @property
+    def mean_response_bytes(self) -> float:
+        return self.response_bytes / self.calls if self.calls else 0.0
+
+
+class ResponseSizeRecorder:
+    """
+    Thread-safe totals of the SearchResponse payload size per data store.
+
+    Sizes are the serialized protobuf size of every page a call read, i.e. what
+    the service sent before transport compression.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[str, ResponseSizeStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, data_store_id: str, response_bytes: int, pages: int, results: int
+    ) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(data_store_id, ResponseSizeStats())
+            stats.calls += 1
+            stats.pages += pages
+            stats.results += results
+            stats.response_bytes += response_bytes
+            stats.max_response_bytes = max(stats.max_response_bytes, response_bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                data_store_id: {
+                    **asdict(stats),
+                    "mean_response_bytes": stats.mean_response_bytes,
+                }
+                for data_store_id, stats in self._stats.items()
+            }
+
+
+_response_sizes = ResponseSizeRecorder()
+
+
+def get_response_size_recorder() -> ResponseSizeRecorder:
+    """Return the process-wide recorder of search response sizes."""
+    return _response_sizes
+
+
+# Upper bounds in seconds, 1 ms to ~82 s in steps of 25%
+LATENCY_BUCKETS = tuple(0.001 * 1.25**i for i in range(51))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; quantiles are bucket upper bounds."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # One extra bucket for everything above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts, strict=False):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return math.inf
+
+
+@dataclass
+class SearchLatencyStats:
+    calls: LatencyHistogram = field(default_factory=LatencyHistogram)
+    attempts: LatencyHistogram = field(default_factory=LatencyHistogram)
+    hedges: int = 0
+    hedge_wins: int = 0
+    deadline_exceeded: int = 0
+
+
+class SearchLatencyRecorder:
+    """
+    Thread-safe latency histograms of search calls per data store.
+
+    A call is one search as the tool sees it; an attempt is one Search RPC, so
+    a hedged call has two. Attempt quantiles drive the hedging delay, call
+    quantiles show what the agent turn waited.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[str, SearchLatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def _of(self, data_store_id: str) -> SearchLatencyStats:
+        # Must be called with self._lock held
+        return self._stats.setdefault(data_store_id, SearchLatencyStats())
+
+    def record_call(self, data_store_id: str, seconds: float) -> None:
+        with self._lock:
+            self._of(data_store_id).calls.observe(seconds)
+
+    def record_attempt(self, data_store_id: str, seconds: float) -> None:
+        with self._lock:
+            self._of(data_store_id).attempts.observe(seconds)
+
+    def record_hedge(self, data_store_id: str, won: bool) -> None:
+        with self._lock:
+            stats = self._of(data_store_id)
+            stats.hedges += 1
+            stats.hedge_wins += won
+
+    def record_deadline_exceeded(self, data_store_id: str) -> None:
+        with self._lock:
+            self._of(data_store_id).deadline_exceeded += 1
+
+    def attempt_quantile(
+        self, data_store_id: str, q: float, min_samples: int = 1
+    ) -> float | None:
+        """Attempt latency quantile, or None with fewer than ``min_samples``."""
+        with self._lock:
+            attempts = self._of(data_store_id).attempts
+            if attempts.count < min_samples:
+                return None
+            return attempts.quantile(q)
+
+    def histogram(
+        self, data_store_id: str, kind: str = "calls"
+    ) -> list[tuple[float, int]]:
+        """``(upper bound in seconds, count)`` of the non-empty buckets."""
+        with self._lock:
+            histogram: LatencyHistogram = getattr(self._of(data_store_id), kind)
+            bounds = [*histogram.buckets, math.inf]
+            return [(b, c) for b, c in zip(bounds, histogram.counts, strict=True) if c]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                data_store_id: {
+                    "calls": stats.calls.count,
+                    "attempts": stats.attempts.count,
+                    "hedges": stats.hedges,
+                    "hedge_wins": stats.hedge_wins,
+                    "deadline_exceeded": stats.deadline_exceeded,
+                    **{
+                        f"call_p{round(q * 100)}_ms": (stats.calls.quantile(q) or 0.0)
+                        * 1000
+                        for q in (0.5, 0.95, 0.99)
+                    },
+                    "attempt_p95_ms": (stats.attempts.quantile(0.95) or 0.0) * 1000,
+                }
+                for data_store_id, stats in self._stats.items()
+            }
+
+
+_latencies = SearchLatencyRecorder()
+
+
+def get_latency_recorder() -> SearchLatencyRecorder:
+    """Return the process-wide recorder of search latencies."""
+    return _latencies
+
+
+# Explicit bucket bounds of the OTel histograms
+DURATION_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BOUNDS = tuple(256 * 4**i for i in range(9))
+COUNT_BOUNDS = (0, 1, 2, 3, 5, 8, 10, 15, 20, 30, 50)
+
+
+# Span of one data store search and its attributes, read by
+# ``app.utils.span_analysis``
+SEARCH_SPAN_PREFIX = "search "
+DATA_STORE_ATTRIBUTE = "search.data_store"
+SOURCE_ATTRIBUTE = "search.source"
+RESULTS_ATTRIBUTE = "search.results"
+
+tracer = trace.get_tracer(__name__)
+
+
+def search_span(data_store_id: str) -> AbstractContextManager[trace.Span]:
+    """
+    A span around one data store search, so exported traces show which data
+    stores a tool call waited on.
+    """
+    return tracer.start_as_current_span(
+        SEARCH_SPAN_PREFIX + data_store_id,
+        attributes={DATA_STORE_ATTRIBUTE: data_store_id},
+    )
+
+
+def error_type(error: BaseException) -> str:
+    """Low-cardinality ``error.type`` of a failed search."""
+    if isinstance(error, exceptions.ResourceExhausted):
+        return "rate_limited"
+    if isinstance(error, exceptions.ServiceUnavailable):
+        return "unavailable"
+    if isinstance(error, exceptions.DeadlineExceeded):
+        return "timeout"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return type(error).__name__
+
+
+# Values of the search.circuit.state gauge
+CIRCUIT_STATES = {
+    CircuitBreaker.CLOSED: 0,
+    CircuitBreaker.HALF_OPEN: 1,
+    CircuitBreaker.OPEN: 2,
+}
+
+
+def _observe_bucket_tokens(
+    options: metrics.CallbackOptions,
+) -> Iterable[metrics.Observation]:
+    guard = get_search_guard()
+    if guard is None:
+        return []
+    return [
+        metrics.Observation(bucket.tokens, {"bucket": name})
+        for name, bucket in guard.buckets.items()
+    ]
+
+
+def _observe_throttled(
+    options: metrics.CallbackOptions,
+) -> Iterable[metrics.Observation]:
+    guard = get_search_guard()
+    if guard is None:
+        return []
+    return [
+        metrics.Observation(bucket.metrics()["rejected"], {"bucket": name})
+        for name, bucket in guard.buckets.items()
+    ]
+
+
+def _observe_circuit_state(
+    options: metrics.CallbackOptions,
+) -> Iterable[metrics.Observation]:
+    guard = get_search_guard()
+    if guard is None:
+        return []
+    return [
+        metrics.Observation(CIRCUIT_STATES[str(m["circuit"])], {"data_store_key": key})
+        for key, m in guard.metrics().items()
+    ]
+
+
+def _observe_short_circuits(
+    options: metrics.CallbackOptions,
+) -> Iterable[metrics.Observation]:
+    guard = get_search_guard()
+    if guard is None:
+        return []
+    return [
+        metrics.Observation(float(m["short_circuited"]), {"data_store_key": key})
+        for key, m in guard.metrics().items()
+    ]
+
+
+class SearchInstruments:
+    """
+    OpenTelemetry instruments of the search hot path, all labelled with the
+    data store ID. Without a MeterProvider (see ``app.utils.metrics``) they are
+    no-ops.
+
+    ``source`` says where results came from: ``remote`` (Discovery Engine),
+    ``cache``, ``identifier_index``, ``lexical_index`` or ``semantic_cache``.
+
+    The state of the search guard (``app.tools.rate_limit``) is observed when
+    metrics are collected: tokens and throttled calls per rate limit bucket,
+    circuit state (0 closed, 1 half open, 2 open) and short-circuited calls
+    per data store key, e.g. ``bike-histories``.
+    """
+
+    def __init__(self, meter: metrics.Meter | None = None) -> None:
+        meter = meter or metrics.get_meter(__name__)
+        self.duration = meter.create_histogram(
+            "search.duration",
+            unit="s",
+            description="Duration of one data store search",
+            explicit_bucket_boundaries_advisory=DURATION_BOUNDS,
+        )
+        self.results = meter.create_histogram(
+            "search.results",
+            unit="{result}",
+            description="Results returned by one data store search",
+            explicit_bucket_boundaries_advisory=COUNT_BOUNDS,
+        )
+        self.response_size = meter.create_histogram(
+            "search.response.size",
+            unit="By",
+            description="SearchResponse bytes read by one Discovery Engine call",
+            explicit_bucket_boundaries_advisory=BYTES_BOUNDS,
+        )
+        self.output_size = meter.create_histogram(
+            "search.output.size",
+            unit="{char}",
+            description="Characters of formatted results handed to the model",
+            explicit_bucket_boundaries_advisory=BYTES_BOUNDS,
+        )
+        self.errors = meter.create_counter(
+            "search.errors",
+            unit="{error}",
+            description="Failed data store searches by error type",
+        )
+        self.bucket_tokens = meter.create_observable_gauge(
+            "search.rate_limit.tokens",
+            callbacks=[_observe_bucket_tokens],
+            unit="{token}",
+            description="Tokens available in a search rate limit bucket",
+        )
+        self.throttled = meter.create_observable_counter(
+            "search.rate_limit.throttled",
+            callbacks=[_observe_throttled],
+            unit="{call}",
+            description="Searches rejected by the client-side rate limit",
+        )
+        self.circuit_state = meter.create_observable_gauge(
+            "search.circuit.state",
+            callbacks=[_observe_circuit_state],
+            description="Search circuit of a data store: 0 closed, 1 half open, 2 open",
+        )
+        self.short_circuits = meter.create_observable_counter(
+            "search.circuit.short_circuits",
+            callbacks=[_observe_short_circuits],
+            unit="{call}",
+            description="Searches rejected while the data store's circuit was open",
+        )
+
+    def record_search(
+        self,
+        data_store_id: str,
+        seconds: float,
+        source: str | None = None,
+        results: int | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        attributes = {"data_store": data_store_id}
+        if error is not None:
+            attributes["error.type"] = error_type(error)
+            self.errors.add(1, attributes)
+        else:
+            attributes["source"] = source or "remote"
+            if results is not None:
+                self.results.record(results, attributes)
+        self.duration.record(seconds, attributes)
+
+    def record_response(self, data_store_id: str, response_bytes: int) -> None:
+        self.response_size.record(response_bytes, {"data_store": data_store_id})
+
+    def record_output(self, data_store_id: str, chars: int) -> None:
+        self.output_size.record(chars, {"data_store": data_store_id})
+
+
+_instruments: SearchInstruments | None = None
+_instruments_lock = threading.Lock()
+
+
+def get_search_instruments() -> SearchInstruments:
+    """Return the process-wide search instruments, created on first use."""
+    global _instruments
+    if _instruments is None:
+        with _instruments_lock:
+            if _instruments is None:
+                _instruments = SearchInstruments()
+    return _instruments
+
+
+def set_search_instruments(instruments: SearchInstruments | None) -> None:
+    """Replace the search instruments; None recreates them from the global meter."""
+    global _instruments
+    with _instruments_lock:
+        _instruments = instruments
@@ -0,0 +1,293 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.tools.cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def identifiers(query: str) -> frozenset[str]:
+    """Tokens containing a digit, e.g. part numbers, error codes, frame numbers."""
+    return frozenset(t for t in re.findall(r"[\w-]+", query) if re.search(r"\d", t))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand-in for the Vertex AI embedding model.
+
+    Hashes words and character trigrams into a fixed-size, L2-normalized
+    vector, so paraphrases sharing word stems land close to each other. Meant
+    for tests and benchmarks, not for retrieval quality.
+    """
+
+    def __init__(self, dimension: int = 256) -> None:
+        self.dimension = dimension
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.casefold()):
+            padded = f"#{word}#"
+            features = [word] + [padded[i : i + 3] for i in range(len(padded) - 2)]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    embedding_calls: int = 0
+
+
+class _DataStoreEntries:
+    """Cached queries of one data store as a contiguous matrix of unit vectors."""
+
+    def __init__(self, capacity: int, dimension: int) -> None:
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.expires_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.results: list[list[str]] = []
+        self.slots: dict[str, int] = {}
+        self.queries: list[str] = []
+
+    @property
+    def size(self) -> int:
+        return len(self.results)
+
+
+class SemanticQueryCache:
+    """
+    Cache of search results that also answers near-duplicate queries.
+
+    Queries are embedded and compared by cosine similarity against the recently
+    cached queries of the same data store in one matrix-vector product; the best
+    match at or above ``threshold`` is returned. Each data store keeps at most
+    ``max_entries_per_data_store`` entries and evicts expired, then least
+    recently used ones. Query embeddings are memoized so a miss followed by
+    ``add`` embeds only once.
+
+    Embeddings rate "E-10 error" and "E-12 error" as near-identical, so a match
+    is only served when both queries mention the same identifiers.
+
+    ``embeddings`` may also be a zero-argument factory; it is called on the
+    first lookup so building the model does not happen at import time, and in
+    a thread when that lookup is async.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings | Callable[[], Embeddings],
+        threshold: float = 0.9,
+        max_entries_per_data_store: int = 256,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries_per_data_store = max_entries_per_data_store
+        self.ttl_seconds = ttl_seconds
+        self.stats = SemanticCacheStats()
+        self._clock = clock
+        self._data_stores: dict[str, _DataStoreEntries] = {}
+        self._vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        # Not self._lock: lookups of memoized queries need not wait for the model
+        self._embeddings_lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if not isinstance(self._embeddings, Embeddings):
+            with self._embeddings_lock:
+                if not isinstance(self._embeddings, Embeddings):
+                    self._embeddings = self._embeddings()
+        return self._embeddings
+
+    async def _aembeddings(self) -> Embeddings:
+        if isinstance(self._embeddings, Embeddings):
+            return self._embeddings
+        # Building the model looks up credentials and initializes Vertex AI
+        return await asyncio.to_thread(lambda: self.embeddings)
+
+    def lookup(self, data_store_id: str, search_query: str) -> list[str] | None:
+        query = normalize_query(search_query)
+        vector = self._memoized_vector(query)
+        if vector is None:
+            vector = self._remember_vector(
+                query, self.embeddings.embed_query(search_query)
+            )
+        return self._lookup(data_store_id, query, vector)
+
+    async def alookup(self, data_store_id: str, search_query: str) -> list[str] | None:
+        query = normalize_query(search_query)
+        vector = self._memoized_vector(query)
+        if vector is None:
+            embeddings = await self._aembeddings()
+            vector = self._remember_vector(
+                query, await embeddings.aembed_query(search_query)
+            )
+        return self._lookup(data_store_id, query, vector)
+
+    def add(self, data_store_id: str, search_query: str, results: list[str]) -> None:
+        query = normalize_query(search_query)
+        vector = self._memoized_vector(query)
+        if vector is None:
+            vector = self._remember_vector(
+                query, self.embeddings.embed_query(search_query)
+            )
+        self._add(data_store_id, query, vector, results)
+
+    async def aadd(
+        self, data_store_id: str, search_query: str, results: list[str]
+    ) -> None:
+        query = normalize_query(search_query)
+        vector = self._memoized_vector(query)
+        if vector is None:
+            embeddings = await self._aembeddings()
+            vector = self._remember_vector(
+                query, await embeddings.aembed_query(search_query)
+            )
+        self._add(data_store_id, query, vector, results)
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "size": sum(e.size for e in self._data_stores.values()),
+            }
+
+    def _memoized_vector(self, query: str) -> np.ndarray | None:
+        with self._lock:
+            vector = self._vectors.get(query)
+            if vector is not None:
+                self._vectors.move_to_end(query)
+            return vector
+
+    def _remember_vector(self, query: str, embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        with self._lock:
+            self.stats.embedding_calls += 1
+            self._vectors[query] = vector
+            while len(self._vectors) > self.max_entries_per_data_store:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _lookup(
+        self, data_store_id: str, query: str, vector: np.ndarray
+    ) -> list[str] | None:
+        now = self._clock()
+        with self._lock:
+            entries = self._data_stores.get(data_store_id)
+            if entries is None or entries.size == 0:
+                self.stats.misses += 1
+                return None
+            size = entries.size
+            similarities = entries.vectors[:size] @ vector
+            similarities[entries.expires_at[:size] <= now] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold or identifiers(query) != identifiers(
+                entries.queries[best]
+            ):
+                self.stats.misses += 1
+                return None
+            entries.last_used[best] = now
+            self.stats.hits += 1
+            logger.info(
+                f"Semantic cache hit ({similarities[best]:.3f}) "
+                f"on '{entries.queries[best]}'"
+            )
+            return list(entries.results[best])
+
+    def _add(
+        self,
+        data_store_id: str,
+        query: str,
+        vector: np.ndarray,
+        results: list[str],
+    ) -> None:
+        now = self._clock()
+        with self._lock:
+            entries = self._data_stores.get(data_store_id)
+            if entries is None:
+                entries = self._data_stores[data_store_id] = _DataStoreEntries(
+                    self.max_entries_per_data_store, vector.shape[0]
+                )
+            slot = entries.slots.get(query)
+            if slot is None and entries.size < self.max_entries_per_data_store:
+                slot = entries.size
+                entries.results.append(results)
+                entries.queries.append(query)
+            elif slot is None:
+                expired = np.flatnonzero(entries.expires_at <= now)
+                slot = (
+                    int(expired[0])
+                    if expired.size
+                    else int(np.argmin(entries.last_used))
+                )
+                del entries.slots[entries.queries[slot]]
+                entries.queries[slot] = query
+                self.stats.evictions += 1
+            entries.slots[query] = slot
+            entries.results[slot] = list(results)
+            entries.vectors[slot] = vector
+            entries.expires_at[slot] = now + self.ttl_seconds
+            entries.last_used[slot] = now
+
+
+def semantic_cache_from_env(
+    embeddings: Embeddings | Callable[[], Embeddings],
+) -> SemanticQueryCache | None:
+    """
+    Build the semantic cache from SEARCH_SEMANTIC_CACHE_* environment variables.
+
+    It is opt-in (SEARCH_SEMANTIC_CACHE=true) because every exact-cache miss
+    costs an embedding call.
+    """
+    if os.environ.get("SEARCH_SEMANTIC_CACHE", "false").lower() != "true":
+        return None
+    return SemanticQueryCache(
+        embeddings,
+        threshold=float(os.environ.get("SEARCH_SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        max_entries_per_data_store=int(
+            os.environ.get("SEARCH_SEMANTIC_CACHE_MAX_ENTRIES", "256")
+        ),
+        ttl_seconds=float(os.environ.get("SEARCH_SEMANTIC_CACHE_TTL_SECONDS", "300")),
+    )
+
+
+_semantic_cache: SemanticQueryCache | None = None
+
+
+def get_semantic_cache() -> SemanticQueryCache | None:
+    """Return the process-wide semantic cache, or None if it is not enabled."""
+    return _semantic_cache
+
+
+def set_semantic_cache(cache: SemanticQueryCache | None) -> None:
+    """Install the process-wide semantic cache; None disables it."""
+    global _semantic_cache
+    _semantic_cache = cache
@@ -0,0 +1,172 @@
+"""
+Coalescing of identical in-flight searches.
+
+Parallel tool calls of one turn, or several mechanics asking about the same
+bike, often send the same query to the same data store at the same moment.
+The first caller of a key runs the search; callers arriving while it is in
+flight wait for it and receive its result (or its error) instead of sending
+a duplicate request.
+
+Async callers can join any flight, including ones led by a thread or another
+event loop. Sync callers only join flights led by sync callers, so a blocking
+wait can never hold up the event loop the flight runs on.
+"""
+
+import asyncio
+import os
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent import futures
+from dataclasses import asdict, dataclass, field
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    # Callers that ran their own request
+    leaders: int = 0
+    # Callers that received another caller's result
+    coalesced: int = 0
+
+
+@dataclass
+class _Flight:
+    future: futures.Future = field(default_factory=futures.Future)
+    is_async: bool = False
+    # Leader task of an async flight and the loop it runs on
+    task: asyncio.Task | None = None
+    loop: asyncio.AbstractEventLoop | None = None
+    waiters: int = 1
+
+
+class SingleFlight:
+    """At most one in-flight call per key; concurrent callers share its outcome."""
+
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._flights: dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run ``fn``, or wait for the call of ``key`` another thread is running."""
+        joined: _Flight | None = None
+        led: _Flight | None = None
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.is_async:
+                flight.waiters += 1
+                self.stats.coalesced += 1
+                joined = flight
+            else:
+                self.stats.leaders += 1
+                # Behind an async flight, run uncoalesced rather than block
+                if flight is None:
+                    led = self._flights[key] = _Flight()
+        if joined is not None:
+            return joined.future.result()
+        if led is None:
+            return fn()
+        try:
+            result = fn()
+        except BaseException as e:
+            led.future.set_exception(e)
+            raise
+        else:
+            led.future.set_result(result)
+            return result
+        finally:
+            self._finish(key, led)
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        ``do`` for coroutines. The shared request keeps running while any
+        caller waits for it and is cancelled once all of them are.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.stats.coalesced += 1
+            else:
+                self.stats.leaders += 1
+                flight = self._flights[key] = _Flight(
+                    is_async=True, loop=asyncio.get_running_loop()
+                )
+                flight.task = asyncio.ensure_future(self._lead(key, flight, fn))
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0
+                # Callers arriving before the cancellation runs start afresh
+                if abandoned and self._flights.get(key) is flight:
+                    del self._flights[key]
+            if abandoned and flight.task is not None and flight.loop is not None:
+                # The last waiter may be on another thread's event loop
+                if not flight.loop.is_closed():
+                    flight.loop.call_soon_threadsafe(flight.task.cancel)
+            raise
+
+    async def _lead(
+        self, key: Hashable, flight: _Flight, fn: Callable[[], Awaitable[T]]
+    ) -> None:
+        try:
+            result: Any = await fn()
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except BaseException as e:
+            flight.future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            flight.future.set_result(result)
+        finally:
+            self._finish(key, flight)
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {**asdict(self.stats), "in_flight": len(self._flights)}
+
+
+def single_flight_from_env() -> SingleFlight | None:
+    """Coalescing is on unless SEARCH_SINGLE_FLIGHT=false."""
+    if os.environ.get("SEARCH_SINGLE_FLIGHT", "true").lower() == "false":
+        return None
+    return SingleFlight()
+
+
+_single_flight: SingleFlight | None = None
+_single_flight_initialized = False
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight | None:
+    """Return the process-wide search coalescer, or None if it is disabled."""
+    global _single_flight, _single_flight_initialized
+    if not _single_flight_initialized:
+        with _single_flight_lock:
+            if not _single_flight_initialized:
+                _single_flight = single_flight_from_env()
+                _single_flight_initialized = True
+    return _single_flight
+
+
+def set_single_flight(single_flight: SingleFlight | None) -> None:
+    """Replace the process-wide search coalescer; None disables coalescing."""
+    global _single_flight, _single_flight_initialized
+    with _single_flight_lock:
+        _single_flight = single_flight
+        _single_flight_initialized = True
@@ -0,0 +1,137 @@
+"""
+Decoder from Discovery Engine ``struct_data`` to plain Python values.
+
+``dict(MapComposite)`` and ``MessageToDict`` convert every field of a result,
+including embedding vectors and long fields the formatter drops right away,
+and proto-plus wraps each access in marshal lookups. This decoder reads the
+underlying ``google.protobuf.Struct`` directly, visits only the requested
+fields and hands out nested lists and structs as read-only views that decode
+their items on access.
+"""
+
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from typing import Any, overload
+
+from google.cloud import discoveryengine_v1 as discoveryengine
+from google.protobuf import struct_pb2
+from proto.marshal.collections.maps import MapComposite
+
+
+class StructView(Mapping[str, Any]):
+    """Read-only mapping over a ``Struct`` that decodes values on access."""
+
+    __slots__ = ("_fields",)
+
+    def __init__(self, struct: struct_pb2.Struct) -> None:
+        self._fields = struct.fields
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return decode_value(self._fields[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ListView(Sequence[Any]):
+    """Read-only sequence over a ``ListValue`` that decodes items on access."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, list_value: struct_pb2.ListValue) -> None:
+        self._values = list_value.values
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Any]: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return [decode_value(v) for v in self._values[index]]
+        return decode_value(self._values[index])
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other, strict=False)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def decode_value(value: struct_pb2.Value) -> Any:
+    """Python value of a ``google.protobuf.Value``; lists and structs as views."""
+    kind = value.WhichOneof("kind")
+    if kind == "string_value":
+        return value.string_value
+    if kind == "number_value":
+        return value.number_value
+    if kind == "bool_value":
+        return value.bool_value
+    if kind == "list_value":
+        return ListView(value.list_value)
+    if kind == "struct_value":
+        return StructView(value.struct_value)
+    return None
+
+
+def _has_content(value: struct_pb2.Value) -> bool:
+    kind = value.WhichOneof("kind")
+    if kind == "string_value":
+        return bool(value.string_value)
+    if kind == "list_value":
+        return bool(value.list_value.values)
+    if kind == "struct_value":
+        return bool(value.struct_value.fields)
+    return kind is not None and kind != "null_value"
+
+
+def decode_struct_data(
+    struct_data: struct_pb2.Struct | MapComposite, fields: Iterable[str] = ()
+) -> dict[str, Any]:
+    """
+    Decode the given ``fields`` of a result's ``struct_data`` in order.
+
+    Without ``fields``, or when the document has content in none of them, all
+    fields are decoded, matching the fallback of ResultFormatter.
+    """
+    if isinstance(struct_data, MapComposite):
+        raw = struct_data.pb
+    elif isinstance(struct_data, struct_pb2.Struct):
+        raw = struct_data.fields
+    else:
+        raise ValueError(f"Unsupported type: {type(struct_data)}")
+
+    projected = {name: raw[name] for name in fields if name in raw}
+    if any(_has_content(value) for value in projected.values()):
+        return {name: decode_value(value) for name, value in projected.items()}
+    return {name: decode_value(value) for name, value in raw.items()}
+
+
+def result_struct_data(
+    result: discoveryengine.SearchResponse.SearchResult,
+) -> struct_pb2.Struct | None:
+    """
+    The raw ``struct_data`` of a search result, or None if it has none.
+
+    Goes through the underlying protobuf message instead of the proto-plus
+    attribute chain, which builds a wrapper per access.
+    """
+    document = discoveryengine.SearchResponse.SearchResult.pb(result).document
+    if not document.HasField("struct_data") or not document.struct_data.fields:
+        return None
+    return document.struct_data
@@ -0,0 +1,289 @@
+"""
+Local approximate nearest neighbour search over the pipeline's chunk embeddings.
+
+``VectorIndex.build`` turns the JSONL export of the ``process_data`` step into
+an IVF index directory: the embeddings as one contiguous float32 (or int8 with
+per-row scales) matrix ordered by inverted list, the list centroids and offsets,
+and the documents without their vectors. ``VectorIndex.load`` memory-maps all of
+it, so loading is zero-copy and every worker on a host shares the same page
+cache.
+
+A query scores the centroids, then only the ``nprobe`` closest lists, which are
+contiguous row ranges of the matrix. Vectors are L2-normalized, so the inner
+product is the cosine similarity.
+
+    python -m app.tools.vector_index 'export/*.jsonl' /var/lib/agent/vector-index --quantize int8
+"""
+
+import argparse
+import glob
+import json
+import logging
+import mmap
+import os
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class VectorHit:
+    id: str
+    score: float
+    document: dict[str, Any]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _kmeans(
+    vectors: np.ndarray, n_lists: int, iterations: int, seed: int
+) -> np.ndarray:
+    """Spherical k-means on (a sample of) unit vectors; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_lists * 256)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=n_lists) == 0
+        # Re-seed empty lists with random sample points
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+def _assign(
+    vectors: np.ndarray, centroids: np.ndarray, batch: int = 8192
+) -> np.ndarray:
+    return np.concatenate(
+        [
+            np.argmax(vectors[i : i + batch] @ centroids.T, axis=1)
+            for i in range(0, len(vectors), batch)
+        ]
+    )
+
+
+class VectorIndex:
+    """
+    Memory-mapped IVF index; create it with ``build`` and open it with ``load``.
+
+    :param nprobe: Inverted lists scanned per query; more is slower and closer
+        to exact search
+    """
+
+    def __init__(self, path: str | Path, nprobe: int = 16) -> None:
+        self.path = Path(path)
+        self.nprobe = nprobe
+        meta = json.loads((self.path / "meta.json").read_text())
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index version {meta['version']}")
+        self.dimension: int = meta["dimension"]
+        self.quantization: str = meta["quantization"]
+        self.count: int = meta["count"]
+        self.centroids = np.load(self.path / "centroids.npy", mmap_mode="r")
+        self.list_offsets = np.load(self.path / "list_offsets.npy", mmap_mode="r")
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.scales = (
+            np.load(self.path / "scales.npy", mmap_mode="r")
+            if self.quantization == "int8"
+            else None
+        )
+        self.document_offsets = np.load(
+            self.path / "document_offsets.npy", mmap_mode="r"
+        )
+        with open(self.path / "documents.jsonl", "rb") as f:
+            self._documents = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(f.fileno()).st_size
+                else b""
+            )
+
+    @classmethod
+    def load(cls, path: str | Path, nprobe: int = 16) -> "VectorIndex":
+        """Memory-map the index written by ``build`` at ``path``."""
+        return cls(path, nprobe=nprobe)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        documents: list[dict[str, Any]],
+        path: str | Path,
+        n_lists: int | None = None,
+        quantization: str = "float32",
+        iterations: int = 15,
+        seed: int = 0,
+    ) -> None:
+        """
+        Write an index of ``vectors`` (one row per document) to ``path``.
+
+        :param n_lists: Inverted lists, defaults to ~4 * sqrt(len(vectors))
+        :param quantization: ``float32`` or ``int8`` (4x smaller, per-row scale)
+        """
+        if quantization not in ("float32", "int8"):
+            raise ValueError(f"Unsupported quantization {quantization}")
+        if len(vectors) != len(documents):
+            raise ValueError("Need exactly one document per vector")
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        n_lists = min(len(vectors), n_lists or max(1, int(4 * np.sqrt(len(vectors)))))
+
+        centroids = _kmeans(vectors, n_lists, iterations, seed)
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+        ordered = vectors[order]
+
+        np.save(path / "centroids.npy", centroids)
+        np.save(path / "list_offsets.npy", list_offsets)
+        if quantization == "int8":
+            scales = np.abs(ordered).max(axis=1) / 127
+            scales[scales == 0] = 1
+            np.save(
+                path / "vectors.npy",
+                np.round(ordered / scales[:, None]).astype(np.int8),
+            )
+            np.save(path / "scales.npy", scales.astype(np.float32))
+        else:
+            np.save(path / "vectors.npy", ordered)
+
+        document_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        with open(path / "documents.jsonl", "wb") as f:
+            for row, i in enumerate(order):
+                line = json.dumps(documents[i]).encode() + b"\n"
+                f.write(line)
+                document_offsets[row + 1] = document_offsets[row] + len(line)
+        np.save(path / "document_offsets.npy", document_offsets)
+        (path / "meta.json").write_text(
+            json.dumps(
+                {
+                    "version": FORMAT_VERSION,
+                    "dimension": int(vectors.shape[1]),
+                    "count": len(vectors),
+                    "lists": n_lists,
+                    "quantization": quantization,
+                }
+            )
+        )
+
+    @classmethod
+    def build_from_jsonl(
+        cls,
+        pattern: str,
+        path: str | Path,
+        embedding_column: str = "embedding",
+        **kwargs: Any,
+    ) -> None:
+        """
+        Build from the pipeline export (``{"id", "json_data"}`` rows) or flat
+        JSON rows; the embedding column is dropped from the stored documents.
+        """
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise FileNotFoundError(f"No JSONL files match {pattern}")
+        start = time.perf_counter()
+        vectors = []
+        documents = []
+        for document in _read_jsonl(paths):
+            vector = document.pop(embedding_column, None)
+            if vector:
+                vectors.append(np.asarray(vector, dtype=np.float32))
+                documents.append(document)
+        cls.build(np.stack(vectors), documents, path, **kwargs)
+        logger.info(
+            f"Built vector index of {len(documents)} chunks in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+
+    def search(
+        self, query: np.ndarray | list[float], k: int = 10, nprobe: int | None = None
+    ) -> list[VectorHit]:
+        """Approximate top ``k`` documents by cosine similarity."""
+        q = _normalize(np.asarray(query, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ q
+        lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        ranges = [(self.list_offsets[i], self.list_offsets[i + 1]) for i in lists]
+        rows = np.concatenate(
+            [np.arange(start, end) for start, end in ranges if end > start]
+            or [np.empty(0, dtype=np.int64)]
+        )
+        scores = np.concatenate(
+            [self._scores(q, start, end) for start, end in ranges if end > start]
+            or [np.empty(0, dtype=np.float32)]
+        )
+        return self._top(rows, scores, k)
+
+    def search_exact(
+        self, query: np.ndarray | list[float], k: int = 10
+    ) -> list[VectorHit]:
+        """Exhaustive search over all rows, e.g. to measure recall."""
+        q = _normalize(np.asarray(query, dtype=np.float32))
+        return self._top(np.arange(self.count), self._scores(q, 0, self.count), k)
+
+    def _scores(self, q: np.ndarray, start: int, end: int) -> np.ndarray:
+        block = self.vectors[start:end]
+        if self.scales is None:
+            return block @ q
+        return (block @ q) * self.scales[start:end]
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, k: int) -> list[VectorHit]:
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [self._hit(int(rows[i]), float(scores[i])) for i in order]
+
+    def _hit(self, row: int, score: float) -> VectorHit:
+        start, end = self.document_offsets[row], self.document_offsets[row + 1]
+        document = json.loads(self._documents[start:end])
+        return VectorHit(
+            id=str(document.get("id", row)), score=score, document=document
+        )
+
+
+def _read_jsonl(paths: list[str]) -> Iterator[dict[str, Any]]:
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield json.loads(row["json_data"]) if "json_data" in row else row
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Build a vector index from the pipeline's JSONL export"
+    )
+    parser.add_argument("export", help="Glob of the exported JSONL files")
+    parser.add_argument("output", help="Index directory to write")
+    parser.add_argument("--embedding-column", default="embedding")
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--quantize", choices=["float32", "int8"], default="float32")
+    args = parser.parse_args()
+    VectorIndex.build_from_jsonl(
+        args.export,
+        args.output,
+        embedding_column=args.embedding_column,
+        n_lists=args.lists,
+        quantization=args.quantize,
+    )
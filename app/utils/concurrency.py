@@ -0,0 +1,229 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Worker processes per Agent Engine replica and queries served per worker.
+
+The Agent Engine runtime starts NUM_WORKERS worker processes. Within a
+worker, queries run concurrently on threads (``stream_query``) or on the event
+loop (``async_stream_query``); since most of a turn waits on Gemini and
+Discovery Engine, one worker can serve many. AGENT_MAX_CONCURRENT_QUERIES caps
+that number per worker, so a burst queues instead of overloading the worker's
+CPU and the downstream rate limits; 0 leaves it unlimited.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+
+
+@dataclass(frozen=True)
+class WorkerConcurrency:
+    """
+    :param num_workers: Worker processes per replica
+    :param max_concurrent_queries: Queries one worker serves at once, 0 for
+        no limit
+    """
+
+    num_workers: int = 1
+    max_concurrent_queries: int = 0
+
+    @classmethod
+    def from_env(cls) -> "WorkerConcurrency":
+        """Read NUM_WORKERS and AGENT_MAX_CONCURRENT_QUERIES."""
+        defaults = cls()
+        concurrency = cls(
+            num_workers=int(os.environ.get("NUM_WORKERS", defaults.num_workers)),
+            max_concurrent_queries=int(
+                os.environ.get(
+                    "AGENT_MAX_CONCURRENT_QUERIES", defaults.max_concurrent_queries
+                )
+            ),
+        )
+        concurrency.validate()
+        return concurrency
+
+    def validate(self) -> None:
+        if self.num_workers < 1:
+            raise ValueError(f"NUM_WORKERS must be at least 1, got {self.num_workers}")
+        if self.max_concurrent_queries < 0:
+            raise ValueError(
+                "AGENT_MAX_CONCURRENT_QUERIES must not be negative, got "
+                f"{self.max_concurrent_queries}"
+            )
+
+    def env_vars(self) -> dict[str, str]:
+        """The deployment environment variables applying this layout."""
+        return {
+            "NUM_WORKERS": str(self.num_workers),
+            "AGENT_MAX_CONCURRENT_QUERIES": str(self.max_concurrent_queries),
+        }
+
+
+# A waiting thread's event, or a waiting task's loop and future
+_Waiter = threading.Event | tuple[asyncio.AbstractEventLoop, asyncio.Future]
+
+
+@dataclass
+class QueryLimiterStats:
+    admitted: int = 0
+    # Admitted only after waiting for a free slot
+    waited: int = 0
+    wait_seconds: float = 0.0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+
+class QueryLimiter:
+    """
+    Admits at most ``limit`` concurrent queries of this worker, from threads
+    and event loops alike; further queries wait for a slot, first come first
+    served. A limit of 0 admits every query immediately.
+
+    A released slot is handed straight to the longest waiting query: a thread
+    through its event, a task through a future resolved on its own loop. Tasks
+    wait without a thread of their own, so waiting queries never take the
+    default executor that admitted ones need for ``asyncio.to_thread``.
+    """
+
+    def __init__(self, limit: int = 0) -> None:
+        self.limit = limit
+        self.stats = QueryLimiterStats()
+        self._free = limit if limit > 0 else None
+        self._waiters: deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot, blocking the calling thread until one is free."""
+        start = time.monotonic()
+        event = threading.Event()
+        waited = not self._acquire_or_queue(event)
+        if waited:
+            event.wait()
+        self._admitted(waited, start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """Hold a slot, waiting for one without blocking the event loop."""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        waited = not self._acquire_or_queue(waiter)
+        if waited:
+            _, future = waiter
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    queued = waiter in self._waiters
+                    if queued:
+                        self._waiters.remove(waiter)
+                # A cancelled future makes _hand_over pass the slot on
+                future.cancel()
+                if not queued and not future.cancelled():
+                    # The slot was handed over just before the cancellation
+                    self._release_slot()
+                raise
+        self._admitted(waited, start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {"limit": self.limit, **asdict(self.stats)}
+
+    def _admitted(self, waited: bool, start: float) -> None:
+        with self._lock:
+            self.stats.admitted += 1
+            self.stats.in_flight += 1
+            self.stats.max_in_flight = max(
+                self.stats.max_in_flight, self.stats.in_flight
+            )
+            if waited:
+                self.stats.waited += 1
+                self.stats.wait_seconds += time.monotonic() - start
+
+    def _acquire_or_queue(self, waiter: _Waiter) -> bool:
+        """Take a free slot, or queue ``waiter`` for the next released one."""
+        with self._lock:
+            if self._free is None:
+                return True
+            if self._free > 0:
+                self._free -= 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def _release(self) -> None:
+        with self._lock:
+            self.stats.in_flight -= 1
+        if self._free is not None:
+            self._release_slot()
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._free = (self._free or 0) + 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(self._hand_over, future)
+        except RuntimeError:
+            # The waiter's loop is closed
+            self._release_slot()
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.done():
+            # Cancelled while the slot was on its way
+            self._release_slot()
+        else:
+            future.set_result(None)
+
+
+_limiter: QueryLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_query_limiter() -> QueryLimiter:
+    """Return this worker's query limiter, configured from the environment."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = QueryLimiter(
+                    WorkerConcurrency.from_env().max_concurrent_queries
+                )
+    return _limiter
+
+
+def set_query_limiter(limiter: QueryLimiter | None) -> None:
+    """Replace the query limiter; None recreates it from the environment."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
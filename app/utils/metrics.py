@@ -0,0 +1,86 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+
+from opentelemetry import metrics
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import (
+    ConsoleMetricExporter,
+    InMemoryMetricReader,
+    MetricExporter,
+    MetricReader,
+    PeriodicExportingMetricReader,
+)
+from opentelemetry.sdk.resources import Resource
+
+SERVICE_NAME = "agent-123"
+
+
+def metric_exporter(name: str) -> MetricExporter:
+    """
+    Build a push exporter by name: ``console``, ``otlp`` or ``gcp`` (Cloud
+    Monitoring). The last two need their optional exporter packages.
+    """
+    if name == "console":
+        return ConsoleMetricExporter()
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import (
+            OTLPMetricExporter,
+        )
+
+        return OTLPMetricExporter()
+    if name == "gcp":
+        from opentelemetry.exporter.cloud_monitoring import (
+            CloudMonitoringMetricsExporter,
+        )
+
+        return CloudMonitoringMetricsExporter(
+            project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
+        )
+    raise ValueError(f"Unknown metrics exporter {name!r}")
+
+
+def metric_reader_from_env() -> MetricReader | None:
+    """
+    The metric reader selected by OTEL_METRICS_EXPORTER: ``none`` (default),
+    ``memory`` for tests, or a push exporter of ``metric_exporter``. Push
+    exporters export every OTEL_METRIC_EXPORT_INTERVAL milliseconds (60000).
+    """
+    name = os.environ.get("OTEL_METRICS_EXPORTER", "none").lower()
+    if name == "none":
+        return None
+    if name == "memory":
+        return InMemoryMetricReader()
+    try:
+        return PeriodicExportingMetricReader(metric_exporter(name))
+    except (ImportError, ValueError) as e:
+        logging.warning(f"Metrics exporter {name} unavailable, metrics off: {e!r}")
+        return None
+
+
+def set_up_meter_provider(reader: MetricReader | None) -> MeterProvider | None:
+    """
+    Install a global MeterProvider exporting through ``reader``; with None no
+    provider is installed and all instruments stay no-ops.
+    """
+    if reader is None:
+        return None
+    provider = MeterProvider(
+        metric_readers=[reader],
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+    )
+    metrics.set_meter_provider(provider)
+    return provider
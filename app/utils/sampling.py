@@ -0,0 +1,280 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.trace import StatusCode
+
+INVOCATION_ID_ATTRIBUTE = "gcp.vertex.agent.invocation_id"
+
+
+@dataclass(frozen=True)
+class TailSamplingPolicy:
+    """
+    Which finished traces to export, and how much to buffer while deciding.
+
+    :param sample_ratio: Share of the traces that are neither slow, failed nor
+        rated negatively which is still exported
+    :param slow_seconds: Traces at least this long are always exported
+    :param negative_score_below: Feedback scores below this are negative
+    :param decision_wait_seconds: Traces whose root span has not ended after
+        this long are decided with the spans seen so far
+    :param max_traces: Traces buffered while waiting for their root span
+    :param max_spans_per_trace: Spans buffered per trace; later ones are dropped
+    :param max_buffered_spans: Spans buffered over all waiting traces
+    :param max_held_spans: Spans of sampled-out traces kept for late feedback
+    """
+
+    sample_ratio: float = 0.1
+    slow_seconds: float = 10.0
+    negative_score_below: float = 0.0
+    decision_wait_seconds: float = 120.0
+    max_traces: int = 1000
+    max_spans_per_trace: int = 1000
+    max_buffered_spans: int = 20000
+    max_held_spans: int = 10000
+
+    @classmethod
+    def from_env(cls) -> "TailSamplingPolicy":
+        """Build the policy from TRACE_SAMPLE_* environment variables."""
+        defaults = cls()
+        return cls(
+            # Unset, every trace is exported and no sampling happens
+            sample_ratio=float(os.environ.get("TRACE_SAMPLE_RATIO", "1")),
+            slow_seconds=float(
+                os.environ.get("TRACE_SAMPLE_SLOW_SECONDS", defaults.slow_seconds)
+            ),
+            negative_score_below=float(
+                os.environ.get(
+                    "TRACE_SAMPLE_NEGATIVE_SCORE_BELOW", defaults.negative_score_below
+                )
+            ),
+            max_buffered_spans=int(
+                os.environ.get(
+                    "TRACE_SAMPLE_MAX_BUFFERED_SPANS", defaults.max_buffered_spans
+                )
+            ),
+        )
+
+
+@dataclass
+class TailSamplingStats:
+    kept_slow: int = 0
+    kept_error: int = 0
+    kept_feedback: int = 0
+    kept_sampled: int = 0
+    dropped: int = 0
+    # Decided before their root span ended, to respect the buffer limits
+    decided_early: int = 0
+    # Spans over max_spans_per_trace, never exported
+    spans_over_limit: int = 0
+    # Sampled-out traces released by late negative feedback
+    released_by_feedback: int = 0
+
+
+@dataclass
+class _Trace:
+    started_at: float
+    spans: list[ReadableSpan] = field(default_factory=list)
+    error: bool = False
+    invocation_ids: set[str] = field(default_factory=set)
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Buffers the spans of each trace until its root span ends, then passes all
+    of them to ``processor`` (usually the BatchSpanProcessor of the exporter)
+    or none.
+
+    Slow traces, traces with an error span and traces of invocations with
+    negative feedback are always kept; ``sample_ratio`` of the rest, chosen by
+    trace ID. Sampled-out traces are held a little longer, bounded by
+    ``max_held_spans``, so feedback arriving after the turn can still release
+    them. Feedback only reaches the worker process it is registered in.
+    """
+
+    def __init__(
+        self,
+        processor: SpanProcessor,
+        policy: TailSamplingPolicy | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.processor = processor
+        self.policy = policy or TailSamplingPolicy()
+        self.stats = TailSamplingStats()
+        self._clock = clock
+        self._traces: OrderedDict[int, _Trace] = OrderedDict()
+        self._buffered_spans = 0
+        self._held: OrderedDict[int, _Trace] = OrderedDict()
+        self._held_by_invocation: dict[str, int] = {}
+        self._held_spans = 0
+        self._negative_invocations: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self.processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                trace = self._traces[trace_id] = _Trace(started_at=self._clock())
+            if len(trace.spans) < self.policy.max_spans_per_trace:
+                trace.spans.append(span)
+                self._buffered_spans += 1
+            else:
+                self.stats.spans_over_limit += 1
+            trace.error |= span.status.status_code == StatusCode.ERROR
+            invocation_id = (span.attributes or {}).get(INVOCATION_ID_ATTRIBUTE)
+            if isinstance(invocation_id, str):
+                trace.invocation_ids.add(invocation_id)
+
+            kept: list[ReadableSpan] = []
+            if span.parent is None or span.parent.is_remote:
+                kept += self._decide(trace_id, root=span)
+            kept += self._enforce_limits()
+        for kept_span in kept:
+            self.processor.on_end(kept_span)
+
+    def record_feedback(self, invocation_id: str, score: float) -> bool:
+        """
+        Keep the trace of an invocation rated below ``negative_score_below``,
+        even if it was already sampled out. True if a held trace was released.
+        """
+        if score >= self.policy.negative_score_below:
+            return False
+        with self._lock:
+            trace_id = self._held_by_invocation.get(invocation_id)
+            if trace_id is None:
+                # The trace may still be in progress
+                self._negative_invocations[invocation_id] = None
+                while len(self._negative_invocations) > self.policy.max_traces:
+                    self._negative_invocations.popitem(last=False)
+                return False
+            trace = self._unhold(trace_id)
+            self.stats.released_by_feedback += 1
+        for span in trace.spans:
+            self.processor.on_end(span)
+        return True
+
+    def shutdown(self) -> None:
+        """Decide all waiting traces, then shut down the wrapped processor."""
+        with self._lock:
+            kept: list[ReadableSpan] = []
+            while self._traces:
+                kept += self._decide(next(iter(self._traces)), root=None)
+        for span in kept:
+            self.processor.on_end(span)
+        self.processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.processor.force_flush(timeout_millis)
+
+    def metrics(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "waiting_traces": len(self._traces),
+                "buffered_spans": self._buffered_spans,
+                "held_spans": self._held_spans,
+            }
+
+    def _enforce_limits(self) -> list[ReadableSpan]:
+        # Must be called with self._lock held
+        kept: list[ReadableSpan] = []
+        expired_before = self._clock() - self.policy.decision_wait_seconds
+        while self._traces:
+            trace_id, oldest = next(iter(self._traces.items()))
+            if (
+                len(self._traces) <= self.policy.max_traces
+                and self._buffered_spans <= self.policy.max_buffered_spans
+                and oldest.started_at > expired_before
+            ):
+                break
+            self.stats.decided_early += 1
+            kept += self._decide(trace_id, root=None)
+        return kept
+
+    def _decide(self, trace_id: int, root: ReadableSpan | None) -> list[ReadableSpan]:
+        """Remove a waiting trace; return its spans if it is kept, else hold it."""
+        # Must be called with self._lock held
+        trace = self._traces.pop(trace_id)
+        self._buffered_spans -= len(trace.spans)
+        if trace.error:
+            self.stats.kept_error += 1
+        elif self._duration(trace, root) >= self.policy.slow_seconds:
+            self.stats.kept_slow += 1
+        elif any(i in self._negative_invocations for i in trace.invocation_ids):
+            self.stats.kept_feedback += 1
+        elif (trace_id & 0xFFFFFFFFFFFFFFFF) < self.policy.sample_ratio * 2**64:
+            # The same rule as TraceIdRatioBased, on the random low 64 bits
+            self.stats.kept_sampled += 1
+        else:
+            self.stats.dropped += 1
+            self._hold(trace_id, trace)
+            return []
+        return trace.spans
+
+    @staticmethod
+    def _duration(trace: _Trace, root: ReadableSpan | None) -> float:
+        spans = [root] if root is not None else trace.spans
+        starts = [s.start_time for s in spans if s.start_time]
+        ends = [s.end_time for s in spans if s.end_time]
+        if not starts or not ends:
+            return 0.0
+        return (max(ends) - min(starts)) / 1e9
+
+    def _hold(self, trace_id: int, trace: _Trace) -> None:
+        # Must be called with self._lock held
+        if not trace.invocation_ids or self.policy.max_held_spans <= 0:
+            return
+        self._held[trace_id] = trace
+        self._held_spans += len(trace.spans)
+        for invocation_id in trace.invocation_ids:
+            self._held_by_invocation[invocation_id] = trace_id
+        while self._held_spans > self.policy.max_held_spans:
+            self._unhold(next(iter(self._held)))
+
+    def _unhold(self, trace_id: int) -> _Trace:
+        # Must be called with self._lock held
+        trace = self._held.pop(trace_id)
+        self._held_spans -= len(trace.spans)
+        for invocation_id in trace.invocation_ids:
+            self._held_by_invocation.pop(invocation_id, None)
+        return trace
+
+
+def tail_sampling_processor_from_env(
+    processor: SpanProcessor,
+) -> SpanProcessor:
+    """
+    Wrap ``processor`` in tail-based sampling when TRACE_SAMPLE_RATIO is below
+    1; otherwise every trace is exported and ``processor`` is returned as is.
+    """
+    policy = TailSamplingPolicy.from_env()
+    if policy.sample_ratio >= 1:
+        return processor
+    logging.info(
+        f"Tail-sampling traces, keeping {policy.sample_ratio:.0%} of normal ones"
+    )
+    return TailSamplingSpanProcessor(processor, policy)
@@ -0,0 +1,452 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Offline per-turn latency breakdown of the spans written by
+``CloudTraceLoggingSpanExporter``.
+
+Reads JSONL files of span log entries, either the entries themselves or Cloud
+Logging exports wrapping them in ``jsonPayload`` (optionally gzipped), and
+reconstructs every agent turn, i.e. ADK ``invocation`` span. Each turn's wall
+time is split into LLM calls, tool calls, data store searches, formatting (tool
+time outside searches) and idle gaps (time no LLM or tool span covers), and its
+critical path is computed.
+
+Input is streamed: spans are kept, stripped of their attributes, only until
+the root span of their trace arrives, and at most ``max_open_traces`` traces
+are open at once.
+
+    python -m app.utils.span_analysis 'exported/*.jsonl.gz' --slowest 5
+"""
+
+import argparse
+import glob
+import gzip
+import heapq
+import json
+import math
+import sys
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Any
+
+from app.tools.search_metrics import DATA_STORE_ATTRIBUTE, SEARCH_SPAN_PREFIX
+
+INVOCATION_SPAN = "invocation"
+LLM_SPAN = "call_llm"
+TOOL_SPAN_PREFIX = "execute_tool "
+TOOL_NAME_ATTRIBUTE = "gen_ai.tool.name"
+INVOCATION_ID_ATTRIBUTE = "gcp.vertex.agent.invocation_id"
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass(frozen=True)
+class SpanRecord:
+    """The fields of an exported span the analysis needs."""
+
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    start: float
+    end: float
+    # Tool name of execute_tool spans, data store of search spans
+    tool: str | None = None
+    data_store: str | None = None
+    invocation_id: str | None = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def label(self) -> str:
+        """What time spent in this span is attributed to."""
+        if self.name == LLM_SPAN:
+            return "llm"
+        if self.tool is not None:
+            return f"tool {self.tool}"
+        if self.data_store is not None:
+            return f"search {self.data_store}"
+        return self.name
+
+
+@dataclass
+class TurnBreakdown:
+    """
+    Where the wall time of one turn went, in seconds. Searches run inside
+    tools, so ``searches`` is part of ``tools`` and ``formatting`` is the rest;
+    unless LLM and tool calls overlap, ``llm``, ``tools`` and ``idle`` add up
+    to ``wall``.
+    """
+
+    trace_id: str
+    invocation_id: str | None
+    start: float
+    wall: float
+    llm: float = 0.0
+    tools: float = 0.0
+    searches: float = 0.0
+    formatting: float = 0.0
+    idle: float = 0.0
+    llm_calls: int = 0
+    # Duration of every tool call and data store search of the turn
+    tool_calls: list[tuple[str, float]] = field(default_factory=list)
+    search_calls: list[tuple[str, float]] = field(default_factory=list)
+    # (label, seconds) in time order, consecutive labels merged
+    critical_path: list[tuple[str, float]] = field(default_factory=list)
+
+
+def open_input(path: str) -> IO[str]:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+def read_span_entries(patterns: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    Span log entries of the JSONL files matching ``patterns`` (``-`` for
+    stdin), one line at a time. Lines that are not span entries are skipped.
+    """
+    for pattern in patterns:
+        paths = [pattern] if pattern == "-" else sorted(glob.glob(pattern))
+        for path in paths:
+            with open_input(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    entry = entry.get("jsonPayload", entry)
+                    if isinstance(entry, dict) and "context" in entry:
+                        yield entry
+
+
+def parse_span(entry: dict[str, Any]) -> SpanRecord | None:
+    """The ``SpanRecord`` of a span log entry, None if it never ended."""
+    if not entry.get("start_time") or not entry.get("end_time"):
+        return None
+    name = entry["name"]
+    attributes = entry.get("attributes") or {}
+    tool = data_store = None
+    if name.startswith(TOOL_SPAN_PREFIX):
+        tool = attributes.get(TOOL_NAME_ATTRIBUTE) or name[len(TOOL_SPAN_PREFIX) :]
+    elif name.startswith(SEARCH_SPAN_PREFIX):
+        data_store = (
+            attributes.get(DATA_STORE_ATTRIBUTE) or name[len(SEARCH_SPAN_PREFIX) :]
+        )
+    invocation_id = attributes.get(INVOCATION_ID_ATTRIBUTE)
+    context = entry["context"]
+    return SpanRecord(
+        trace_id=context["trace_id"],
+        span_id=context["span_id"],
+        parent_id=entry.get("parent_id"),
+        name=name,
+        start=_timestamp(entry["start_time"]),
+        end=_timestamp(entry["end_time"]),
+        tool=tool,
+        data_store=data_store,
+        invocation_id=invocation_id if isinstance(invocation_id, str) else None,
+    )
+
+
+def _timestamp(value: str) -> float:
+    # ns_to_iso_str writes a "Z" suffix, which fromisoformat only accepts
+    # from Python 3.11
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class TraceAssembler:
+    """
+    Groups a stream of spans into traces. A trace is complete when a span
+    without a parent arrives (exporters see the root span last); when more
+    than ``max_open_traces`` are open, the least recently extended one is
+    taken as complete. Spans arriving for a completed trace are counted in
+    ``late_spans`` and dropped.
+    """
+
+    def __init__(self, max_open_traces: int = 10000) -> None:
+        self.max_open_traces = max_open_traces
+        self.late_spans = 0
+        self.evicted_traces = 0
+        self._open: OrderedDict[str, list[SpanRecord]] = OrderedDict()
+        self._done: OrderedDict[str, None] = OrderedDict()
+
+    def add(self, span: SpanRecord) -> list[list[SpanRecord]]:
+        """Add a span; return the traces it completes."""
+        if span.trace_id in self._done:
+            self.late_spans += 1
+            return []
+        spans = self._open.pop(span.trace_id, None) or []
+        spans.append(span)
+        if span.parent_id is None:
+            return [self._complete(span.trace_id, spans)]
+        self._open[span.trace_id] = spans
+        completed = []
+        while len(self._open) > self.max_open_traces:
+            trace_id, oldest = self._open.popitem(last=False)
+            self.evicted_traces += 1
+            completed.append(self._complete(trace_id, oldest))
+        return completed
+
+    def flush(self) -> Iterator[list[SpanRecord]]:
+        """Yield the traces still open, at the end of the input."""
+        while self._open:
+            trace_id, spans = self._open.popitem(last=False)
+            yield self._complete(trace_id, spans)
+
+    def _complete(self, trace_id: str, spans: list[SpanRecord]) -> list[SpanRecord]:
+        self._done[trace_id] = None
+        while len(self._done) > self.max_open_traces:
+            self._done.popitem(last=False)
+        return spans
+
+
+def trace_turns(spans: list[SpanRecord]) -> Iterator[TurnBreakdown]:
+    """Break down every turn of one trace."""
+    children: dict[str | None, list[SpanRecord]] = defaultdict(list)
+    span_ids = {span.span_id for span in spans}
+    for span in spans:
+        parent_id = span.parent_id if span.parent_id in span_ids else None
+        children[parent_id].append(span)
+    turns = [span for span in spans if span.name == INVOCATION_SPAN]
+    # Without ADK invocation spans, each root span is a turn
+    for root in turns or children[None]:
+        yield turn_breakdown(root, children)
+
+
+def turn_breakdown(
+    root: SpanRecord, children: dict[str | None, list[SpanRecord]]
+) -> TurnBreakdown:
+    """Split the wall time of the turn rooted at ``root``."""
+    turn = TurnBreakdown(
+        trace_id=root.trace_id,
+        invocation_id=root.invocation_id,
+        start=root.start,
+        wall=root.duration,
+    )
+    llm: list[tuple[float, float]] = []
+    tools: list[tuple[float, float]] = []
+    searches: list[tuple[float, float]] = []
+    stack = list(children.get(root.span_id, ()))
+    while stack:
+        span = stack.pop()
+        stack.extend(children.get(span.span_id, ()))
+        interval = (max(span.start, root.start), min(span.end, root.end))
+        if span.name == LLM_SPAN:
+            llm.append(interval)
+            turn.llm_calls += 1
+            turn.invocation_id = turn.invocation_id or span.invocation_id
+        elif span.tool is not None:
+            tools.append(interval)
+            turn.tool_calls.append((span.tool, span.duration))
+        elif span.data_store is not None:
+            searches.append(interval)
+            turn.search_calls.append((span.data_store, span.duration))
+    turn.llm = covered(llm)
+    turn.tools = covered(tools)
+    turn.searches = covered(searches)
+    turn.formatting = covered(tools + searches) - turn.searches
+    turn.idle = max(0.0, turn.wall - covered(llm + tools + searches))
+    turn.critical_path = critical_path(root, children)
+    return turn
+
+
+def covered(intervals: list[tuple[float, float]]) -> float:
+    """Total length of the union of ``intervals``."""
+    total = 0.0
+    end = -math.inf
+    for start, stop in sorted(intervals):
+        if stop <= end:
+            continue
+        total += stop - max(start, end)
+        end = stop
+    return total
+
+
+def critical_path(
+    root: SpanRecord, children: dict[str | None, list[SpanRecord]]
+) -> list[tuple[str, float]]:
+    """
+    The chain of spans the end of ``root`` waited on: walking back from its
+    end, the child that ended last, then recursively the child that ended
+    last before that one started, with the parent's own time in between.
+    """
+    path: list[tuple[str, float]] = []
+    _walk_back(root, root.end, children, path)
+    merged: list[tuple[str, float]] = []
+    for label, seconds in reversed(path):
+        if merged and merged[-1][0] == label:
+            merged[-1] = (label, merged[-1][1] + seconds)
+        elif seconds > 0:
+            merged.append((label, seconds))
+    return merged
+
+
+def _walk_back(
+    span: SpanRecord,
+    end: float,
+    children: dict[str | None, list[SpanRecord]],
+    path: list[tuple[str, float]],
+) -> None:
+    # Appends in reverse time order
+    cursor = end
+    for child in sorted(
+        children.get(span.span_id, ()), key=lambda c: c.end, reverse=True
+    ):
+        if child.start >= cursor or child.end <= span.start:
+            continue
+        child_end = min(child.end, cursor)
+        path.append((span.label, cursor - child_end))
+        _walk_back(child, child_end, children, path)
+        cursor = max(child.start, span.start)
+    path.append((span.label, cursor - span.start))
+
+
+class LatencyReport:
+    """Aggregates turn breakdowns into percentile tables."""
+
+    def __init__(self, slowest: int = 0) -> None:
+        self.turns = 0
+        self.phases: dict[str, list[float]] = defaultdict(list)
+        self.tools: dict[str, list[float]] = defaultdict(list)
+        self.data_stores: dict[str, list[float]] = defaultdict(list)
+        self.critical: dict[str, float] = defaultdict(float)
+        self.slowest = slowest
+        self._slowest: list[tuple[float, int, TurnBreakdown]] = []
+
+    def add(self, turn: TurnBreakdown) -> None:
+        self.turns += 1
+        for phase in ("wall", "llm", "tools", "searches", "formatting", "idle"):
+            self.phases[phase].append(getattr(turn, phase))
+        for tool, seconds in turn.tool_calls:
+            self.tools[tool].append(seconds)
+        for data_store, seconds in turn.search_calls:
+            self.data_stores[data_store].append(seconds)
+        for label, seconds in turn.critical_path:
+            self.critical[_label_group(label)] += seconds
+        if self.slowest > 0:
+            item = (turn.wall, self.turns, turn)
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heappushpop(self._slowest, item)
+
+    def slowest_turns(self) -> list[TurnBreakdown]:
+        return [turn for _, _, turn in sorted(self._slowest, reverse=True)]
+
+    def render(self) -> str:
+        sections = [
+            f"{self.turns} turns",
+            _table("Per turn (ms)", self.phases),
+            _table("Per tool call (ms)", self.tools),
+            _table("Per data store search (ms)", self.data_stores),
+        ]
+        total = sum(self.critical.values())
+        if total:
+            lines = ["Critical path share"]
+            for label, seconds in sorted(self.critical.items(), key=lambda i: -i[1]):
+                lines.append(f"  {label:<40}{seconds / total:>8.1%}")
+            sections.append("\n".join(lines))
+        for turn in self.slowest_turns():
+            path = " -> ".join(
+                f"{label} {s * 1000:.0f}ms" for label, s in turn.critical_path
+            )
+            sections.append(
+                f"Turn {turn.invocation_id or turn.trace_id} "
+                f"({turn.wall * 1000:.0f}ms): {path}"
+            )
+        return "\n\n".join(sections)
+
+
+def _label_group(label: str) -> str:
+    # Framework spans (agent_run [...], invocation) count as overhead
+    if label == "llm" or label.startswith(("tool ", "search ")):
+        return label
+    return "agent overhead"
+
+
+def _table(title: str, rows: dict[str, list[float]]) -> str:
+    columns = ["count", "mean", *(f"p{p}" for p in PERCENTILES), "max"]
+    width = max([len(title), *(len(name) + 2 for name in rows)])
+    lines = [title.ljust(width) + "".join(f"{c:>10}" for c in columns)]
+    for name, values in sorted(rows.items()):
+        ordered = sorted(values)
+        cells = [
+            sum(ordered) / len(ordered),
+            *(percentile(ordered, p) for p in PERCENTILES),
+            ordered[-1],
+        ]
+        lines.append(
+            f"  {name}".ljust(width)
+            + f"{len(ordered):>10}"
+            + "".join(f"{v * 1000:>10.1f}" for v in cells)
+        )
+    return "\n".join(lines)
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted ``ordered``."""
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def analyze(
+    entries: Iterable[dict[str, Any]],
+    max_open_traces: int = 10000,
+    slowest: int = 0,
+) -> tuple[LatencyReport, TraceAssembler]:
+    """Build the latency report of a stream of span log entries."""
+    report = LatencyReport(slowest=slowest)
+    assembler = TraceAssembler(max_open_traces)
+    for entry in entries:
+        span = parse_span(entry)
+        if span is None:
+            continue
+        for spans in assembler.add(span):
+            for turn in trace_turns(spans):
+                report.add(turn)
+    for spans in assembler.flush():
+        for turn in trace_turns(spans):
+            report.add(turn)
+    return report, assembler
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-turn latency breakdown of exported span JSONL files"
+    )
+    parser.add_argument("inputs", nargs="+", help="JSONL files or globs, - for stdin")
+    parser.add_argument("--max-open-traces", type=int, default=10000)
+    parser.add_argument(
+        "--slowest", type=int, default=0, help="Print the critical path of N turns"
+    )
+    args = parser.parse_args(argv)
+    report, assembler = analyze(
+        read_span_entries(args.inputs), args.max_open_traces, args.slowest
+    )
+    print(report.render())
+    if assembler.late_spans or assembler.evicted_traces:
+        print(
+            f"\n{assembler.evicted_traces} traces completed early, "
+            f"{assembler.late_spans} late spans dropped; "
+            "consider a larger --max-open-traces",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
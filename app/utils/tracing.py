@@ -12,16 +12,370 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
 import json
 import logging
+import os
+import queue
+import threading
+import time
 from collections.abc import Sequence
+from concurrent import futures
+from dataclasses import asdict, dataclass
 from typing import Any
 
 import google.cloud.storage as storage
 from google.cloud import logging as google_cloud_logging
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.util import ns_to_iso_str
+from opentelemetry.trace import (
+    INVALID_SPAN_CONTEXT,
+    SpanContext,
+    format_span_id,
+    format_trace_id,
+)
+
+# Entries.write requests are limited to 10 MB; stay well below
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+# Cloud Logging entries are limited to 256 KB
+MAX_ENTRY_BYTES = 250 * 1024
+# Timestamps, IDs, kind, status and labels of an entry
+_ENTRY_OVERHEAD = 512
+# Appended to attribute values cut to fit an entry
+TRUNCATED_SUFFIX = "...[truncated]"
+
+_STOP = object()
+
+
+@dataclass
+class LogWriterStats:
+    enqueued: int = 0
+    dropped: int = 0
+    written: int = 0
+    failed: int = 0
+    batches: int = 0
+
+
+class BatchedLogWriter:
+    """
+    Writes structured log entries on a background thread, batching them into
+    one entries.write call per ``batch_size`` entries, ``MAX_BATCH_BYTES`` or
+    ``flush_interval`` seconds, whichever comes first.
+
+    ``write`` never blocks: when ``max_queue_size`` entries are waiting, new
+    ones are dropped and counted, so a slow Cloud Logging cannot stall span
+    export or grow memory without bound.
+
+    In a forked worker the writer starts over with its own thread and queue;
+    entries queued before the fork are left to the parent.
+    """
+
+    def __init__(
+        self,
+        logger: google_cloud_logging.Logger,
+        labels: dict[str, str] | None = None,
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+        max_queue_size: int = 4096,
+    ) -> None:
+        self.logger = logger
+        self.labels = labels
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = LogWriterStats()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def write(self, info: dict, size: int = 0) -> bool:
+        """Queue one entry of about ``size`` bytes; False if it was dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((info, size))
+        except queue.Full:
+            with self._lock:
+                self.stats.dropped += 1
+            return False
+        with self._lock:
+            self.stats.enqueued += 1
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Write all queued entries; False if that took longer than ``timeout``."""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def shutdown(self, timeout: float | None = None) -> None:
+        """Write the queued entries and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # The daemon thread keeps writing until the process exits
+            logging.warning(
+                f"Span log writer still had {self._queue.qsize()} entries queued "
+                f"after {timeout} s at shutdown"
+            )
+            return
+        thread.join(timeout)
+
+    def metrics(self) -> dict[str, int]:
+        with self._lock:
+            return {**asdict(self.stats), "queued": self._queue.qsize()}
+
+    def _ensure_started(self) -> None:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _reset_after_fork(self) -> None:
+        # Threads do not survive fork, and the parent's may have held the lock
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self.stats = LogWriterStats()
+
+    def _run(self) -> None:
+        batch: list[dict] = []
+        batch_bytes = 0
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                info, size = item
+                if batch and batch_bytes + size > MAX_BATCH_BYTES:
+                    self._commit(batch)
+                    batch, batch_bytes = [], 0
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(info)
+                batch_bytes += size
+                if len(batch) < self.batch_size:
+                    continue
+            # Full batch, flush interval elapsed, flush() or shutdown()
+            if batch:
+                self._commit(batch)
+                batch, batch_bytes = [], 0
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def _commit(self, entries: list[dict]) -> None:
+        batch = self.logger.batch()
+        for info in entries:
+            batch.log_struct(info, labels=self.labels, severity="INFO")
+        try:
+            batch.commit(partial_success=True)
+        except Exception as e:
+            logging.warning(f"Writing {len(entries)} span log entries failed: {e!r}")
+            with self._lock:
+                self.stats.failed += len(entries)
+                self.stats.batches += 1
+            return
+        with self._lock:
+            self.stats.written += len(entries)
+            self.stats.batches += 1
+
+
+@dataclass
+class UploadStats:
+    uploads: int = 0
+    failed: int = 0
+    dropped: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    bucket_checks: int = 0
+
+
+class GcsPayloadUploader:
+    """
+    Uploads span payloads to a GCS bucket gzip-compressed, from a small thread
+    pool, so export never waits for Cloud Storage.
+
+    At most ``max_pending`` uploads are queued or running; further ones are
+    dropped and counted. Whether the bucket exists is checked in the
+    background once per ``bucket_check_interval`` seconds instead of before
+    every upload.
+
+    Like ``BatchedLogWriter``, a forked worker starts over with its own pool.
+    """
+
+    def __init__(
+        self,
+        bucket: storage.Bucket,
+        max_workers: int = 4,
+        max_pending: int = 64,
+        bucket_check_interval: float = 300.0,
+    ) -> None:
+        self.bucket = bucket
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.bucket_check_interval = bucket_check_interval
+        self.stats = UploadStats()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending: set[futures.Future] = set()
+        self._executor: futures.ThreadPoolExecutor | None = None
+        self._bucket_exists: bool | None = None
+        self._bucket_checked = threading.Event()
+        self._bucket_checked_at: float | None = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def bucket_exists(self) -> bool:
+        """
+        Whether the bucket exists as of the last check. Checks run on the
+        upload pool every ``bucket_check_interval`` seconds, so the caller
+        never waits for one; until the first answers, the bucket is assumed to
+        exist and the uploads queued meanwhile wait for the answer.
+        """
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        now = time.monotonic()
+        check = None
+        with self._lock:
+            if (
+                self._bucket_checked_at is None
+                or now - self._bucket_checked_at >= self.bucket_check_interval
+            ):
+                # Other callers keep the cached answer while the check runs
+                self._bucket_checked_at = now
+                self.stats.bucket_checks += 1
+                check = self._pool().submit(self._check_bucket)
+                self._pending.add(check)
+            exists = self._bucket_exists is not False
+        if check is not None:
+            check.add_done_callback(self._checked)
+        return exists
+
+    def upload(self, blob_name: str, content: str | dict) -> bool:
+        """
+        Queue the upload of ``content``, JSON text or an object serialized on
+        the upload thread; False if too many uploads are pending.
+        """
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        if self._bucket_checked_at is None:
+            # Uploads wait for the first check, so it must be queued first
+            self.bucket_exists()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats.dropped += 1
+            return False
+        with self._lock:
+            future = self._pool().submit(self._upload, blob_name, content)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait for the pending uploads; False if they took longer than ``timeout``."""
+        if self._pid != os.getpid():
+            return True
+        with self._lock:
+            pending = set(self._pending)
+        _, not_done = futures.wait(pending, timeout=timeout)
+        return not not_done
+
+    def shutdown(self) -> None:
+        """Finish the pending uploads and stop the thread pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def metrics(self) -> dict[str, int]:
+        with self._lock:
+            return {**asdict(self.stats), "pending": len(self._pending)}
+
+    def _pool(self) -> futures.ThreadPoolExecutor:
+        # Called with the lock held
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="span-upload"
+            )
+        return self._executor
+
+    def _check_bucket(self) -> None:
+        try:
+            exists = self.bucket.exists()
+        except Exception as e:
+            logging.warning(f"Checking bucket {self.bucket.name} failed: {e!r}")
+            exists = False
+        with self._lock:
+            self._bucket_exists = exists
+        self._bucket_checked.set()
+
+    def _reset_after_fork(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = set()
+        self._executor = None
+        self.stats = UploadStats()
+        if self._bucket_exists is None:
+            # A check running in the parent will not answer here
+            self._bucket_checked = threading.Event()
+            self._bucket_checked_at = None
+
+    def _upload(self, blob_name: str, content: str | dict) -> None:
+        if self._bucket_exists is None:
+            # Queued before the first bucket check answered
+            self._bucket_checked.wait()
+        if not self._bucket_exists:
+            with self._lock:
+                self.stats.failed += 1
+            return
+        text = content if isinstance(content, str) else json.dumps(content)
+        data = gzip.compress(text.encode(), compresslevel=6)
+        blob = self.bucket.blob(blob_name)
+        # Served decompressed to clients that do not accept gzip
+        blob.content_encoding = "gzip"
+        try:
+            blob.upload_from_string(data, content_type="application/json")
+        except Exception as e:
+            logging.warning(f"Uploading span payload {blob_name} failed: {e!r}")
+            with self._lock:
+                self.stats.failed += 1
+            return
+        with self._lock:
+            self.stats.uploads += 1
+            self.stats.bytes_in += len(text)
+            self.stats.bytes_out += len(data)
+
+    def _done(self, future: futures.Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def _checked(self, future: futures.Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -39,6 +393,11 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         storage_client: storage.Client | None = None,
         bucket_name: str | None = None,
         debug: bool = False,
+        log_batch_size: int = 200,
+        log_flush_interval: float = 2.0,
+        log_queue_size: int = 4096,
+        upload_workers: int = 4,
+        max_pending_uploads: int = 64,
         **kwargs: Any,
     ) -> None:
         """
@@ -48,6 +407,11 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param log_batch_size: Span log entries per Cloud Logging write
+        :param log_flush_interval: Longest time in seconds an entry waits for its batch
+        :param log_queue_size: Entries waiting to be written before new ones are dropped
+        :param upload_workers: Threads uploading large payloads to GCS
+        :param max_pending_uploads: GCS uploads queued before new ones are dropped
         :param kwargs: Additional arguments to pass to the parent class
         """
         super().__init__(**kwargs)
@@ -56,11 +420,24 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             project=self.project_id
         )
         self.logger = self.logging_client.logger(__name__)
-        self.storage_client = storage_client or storage.Client(project=self.project_id)
-        self.bucket_name = (
-            bucket_name or f"{self.project_id}-agent-123-logs-data"
+        self.log_writer = BatchedLogWriter(
+            self.logger,
+            labels={
+                "type": "agent_telemetry",
+                "service_name": "agent-123",
+            },
+            batch_size=log_batch_size,
+            flush_interval=log_flush_interval,
+            max_queue_size=log_queue_size,
         )
+        self.storage_client = storage_client or storage.Client(project=self.project_id)
+        self.bucket_name = bucket_name or f"{self.project_id}-agent-123-logs-data"
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        self.uploader = GcsPayloadUploader(
+            self.bucket, max_workers=upload_workers, max_pending=max_pending_uploads
+        )
+        self._resource: Resource | None = None
+        self._resource_dict: dict | None = None
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -70,42 +447,44 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :return: The result of the export operation
         """
         for span in spans:
-            span_context = span.get_span_context()
-            trace_id = format(span_context.trace_id, "x")
-            span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
-
-            span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
-            span_dict["span_id"] = span_id
-
-            span_dict = self._process_large_attributes(
-                span_dict=span_dict, span_id=span_id
+            span_dict, size = self._span_entry(span)
+            span_dict, size = self._process_large_attributes(
+                span_dict=span_dict, span_id=span_dict["span_id"], size=size
             )
 
             if self.debug:
                 print(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
-                span_dict,
-                labels={
-                    "type": "agent_telemetry",
-                    "service_name": "agent-123",
-                },
-                severity="INFO",
-            )
+            # Log the span data to Google Cloud Logging in the background
+            self.log_writer.write(span_dict, size=size)
         # Export spans to Google Cloud Trace using the parent class method
         return super().export(spans)
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Finish the pending GCS uploads and write the queued span log entries."""
+        timeout = timeout_millis / 1000
+        uploaded = self.uploader.flush(timeout)
+        return self.log_writer.flush(timeout) and uploaded
+
+    def shutdown(self) -> None:
+        """Finish the pending uploads and log writes and stop their threads."""
+        self.uploader.shutdown()
+        self.log_writer.shutdown(timeout=30)
+        super().shutdown()
+
+    def metrics(self) -> dict[str, dict[str, int]]:
+        return {"log_writer": self.log_writer.metrics(), "gcs": self.uploader.metrics()}
+
+    def store_in_gcs(self, content: str | dict, span_id: str) -> str:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Initiate storing large content in Google Cloud Storage. The upload runs
+        in the background; the URI is known up front.
 
-        :param content: The content to store
+        :param content: JSON text, or an object serialized to JSON on upload
         :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        :return: The GCS URI of the stored content
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
+        if not self.uploader.bucket_exists():
             logging.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
@@ -113,39 +492,162 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             return "GCS bucket not found"
 
         blob_name = f"spans/{span_id}.json"
-        blob = self.bucket.blob(blob_name)
-
-        blob.upload_from_string(content, "application/json")
+        if not self.uploader.upload(blob_name, content):
+            logging.warning(f"GCS upload queue full, dropped payload of span {span_id}")
+            return "GCS upload queue full"
         return f"gs://{self.bucket_name}/{blob_name}"
 
-    def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
+    def _span_entry(self, span: ReadableSpan) -> tuple[dict, int]:
+        """
+        The log entry of a span, as ``json.loads(span.to_json())`` plus trace
+        and span ID but built directly, with its estimated size in bytes.
+
+        :param span: The span to log
+        :return: The entry and its estimated size
+        """
+        context = span.get_span_context() or INVALID_SPAN_CONTEXT
+        # All spans of a provider share one Resource; convert it once
+        if self._resource is not span.resource:
+            self._resource_dict = json.loads(span.resource.to_json())
+            self._resource = span.resource
+        status = {"status_code": span.status.status_code.name}
+        if span.status.description:
+            status["description"] = span.status.description
+        attributes, size = _json_attributes(span.attributes)
+        events = []
+        for event in span.events:
+            event_attributes, event_size = _json_attributes(event.attributes)
+            events.append(
+                {
+                    "name": event.name,
+                    "timestamp": ns_to_iso_str(event.timestamp),
+                    "attributes": event_attributes,
+                }
+            )
+            size += event_size + len(event.name) + 64
+        links = []
+        for link in span.links:
+            link_attributes, link_size = _json_attributes(link.attributes)
+            links.append(
+                {
+                    "context": _format_context(link.context),
+                    "attributes": link_attributes,
+                }
+            )
+            size += link_size + 128
+        span_dict = {
+            "name": span.name,
+            "context": _format_context(context),
+            "kind": str(span.kind),
+            "parent_id": (
+                f"0x{format_span_id(span.parent.span_id)}" if span.parent else None
+            ),
+            "start_time": ns_to_iso_str(span.start_time) if span.start_time else None,
+            "end_time": ns_to_iso_str(span.end_time) if span.end_time else None,
+            "status": status,
+            "attributes": attributes,
+            "events": events,
+            "links": links,
+            "resource": self._resource_dict,
+            "trace": f"projects/{self.project_id}/traces/{context.trace_id:x}",
+            "span_id": f"{context.span_id:x}",
+        }
+        return span_dict, size + len(span.name) + _ENTRY_OVERHEAD
+
+    def _process_large_attributes(
+        self, span_dict: dict, span_id: str, size: int
+    ) -> tuple[dict, int]:
         """
         Process large attribute values by storing them in GCS if they exceed the size
         limit of Google Cloud Logging.
 
+        All attributes are stored in one JSON object in GCS; the log entry keeps
+        only the attributes that fit, largest dropped first, plus the payload URI.
+        If the payload could not be queued for upload, the largest string values
+        are truncated instead of dropped, so the entry keeps what fits.
+
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
-        :return: The updated span dictionary
+        :param size: Estimated size of the entry in bytes
+        :return: The updated span dictionary and its estimated size
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
+        if size <= MAX_ENTRY_BYTES or not attributes:
+            return span_dict, size
+
+        # Serialized once, on the upload thread
+        gcs_uri = self.store_in_gcs(attributes, span_id)
+        stored = gcs_uri.startswith("gs://")
+        attributes_retain = dict(attributes)
+        for key in sorted(
+            attributes, key=lambda k: _estimate_size(attributes[k]), reverse=True
+        ):
+            if size <= MAX_ENTRY_BYTES:
+                break
+            value = attributes[key]
+            value_size = _estimate_size(value)
+            if not stored and isinstance(value, str):
+                truncated = _truncate(value, value_size - (size - MAX_ENTRY_BYTES))
+                attributes_retain[key] = truncated
+                size -= value_size - _estimate_size(truncated)
+                continue
+            del attributes_retain[key]
+            size -= value_size + len(key)
+        # Without an upload this says why, e.g. "GCS upload queue full"
+        attributes_retain["uri_payload"] = gcs_uri
+        if stored:
             attributes_retain["url_payload"] = (
                 f"https://storage.mtls.cloud.google.com/"
                 f"{self.bucket_name}/spans/{span_id}.json"
             )
 
-            span_dict["attributes"] = attributes_retain
-            logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
-            )
+        span_dict["attributes"] = attributes_retain
+        logging.info(
+            "Length of payload span above 250 KB, storing attributes in GCS "
+            "to avoid large log entry errors"
+        )
+        return span_dict, size + 256
+
+
+def _format_context(context: SpanContext) -> dict[str, str]:
+    return {
+        "trace_id": f"0x{format_trace_id(context.trace_id)}",
+        "span_id": f"0x{format_span_id(context.span_id)}",
+        "trace_state": repr(context.trace_state),
+    }
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    Bytes a JSON-like value takes in a log entry. Strings count as UTF-8, as
+    Cloud Logging stores them in a protobuf Struct, not as escaped JSON.
+    """
+    if isinstance(value, str):
+        return (len(value) if value.isascii() else len(value.encode())) + 2
+    if isinstance(value, list | tuple):
+        return sum(_estimate_size(v) + 1 for v in value) + 2
+    return 24
+
+
+def _truncate(value: str, max_bytes: int) -> str:
+    """
+    The head of ``value`` plus ``TRUNCATED_SUFFIX``, taking at most
+    ``max_bytes`` in a log entry as estimated by ``_estimate_size``.
+    """
+    keep = max(0, max_bytes - len(TRUNCATED_SUFFIX) - 2)
+    head = value.encode()[:keep].decode(errors="ignore")
+    return head + TRUNCATED_SUFFIX
+
 
-        return span_dict
+def _json_attributes(attributes: Any) -> tuple[dict[str, Any] | None, int]:
+    """Attributes as a JSON-compatible dict, with their estimated size."""
+    if attributes is None:
+        return None, 0
+    result = {}
+    size = 2
+    for key, value in attributes.items():
+        if isinstance(value, tuple):
+            value = list(value)
+        result[key] = value
+        size += len(key) + _estimate_size(value) + 4
+    return result, size
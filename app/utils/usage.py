@@ -0,0 +1,328 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Token and payload accounting per invocation and per session.
+
+The ADK callbacks at the bottom of this module record, for every model call,
+the prompt, cached and output tokens and the characters of the system
+instruction sent, and for every tool call the characters of its output. Each
+value is set as an attribute of the current ``call_llm`` / ``execute_tool``
+span, the invocation totals on the ``agent_run`` span of the root agent, and
+all of it is recorded as OpenTelemetry metrics. Totals per session are kept in
+memory, bounded to the most recently active ``max_sessions``.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+from opentelemetry import metrics, trace
+
+TOKEN_BOUNDS = tuple(256 * 2**i for i in range(12))
+CHAR_BOUNDS = tuple(256 * 4**i for i in range(9))
+
+ATTRIBUTE_PREFIX = "agent.usage."
+
+
+@dataclass
+class Usage:
+    """Tokens and characters sent to and received from the model."""
+
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    # Candidate and thinking tokens, both billed as output
+    output_tokens: int = 0
+    instruction_chars: int = 0
+    tool_calls: int = 0
+    tool_output_chars: dict[str, int] = field(default_factory=dict)
+
+    def add(self, other: "Usage") -> None:
+        self.llm_calls += other.llm_calls
+        self.prompt_tokens += other.prompt_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.instruction_chars += other.instruction_chars
+        self.tool_calls += other.tool_calls
+        for tool, chars in other.tool_output_chars.items():
+            self.tool_output_chars[tool] = self.tool_output_chars.get(tool, 0) + chars
+
+    def span_attributes(self) -> dict[str, int]:
+        return {
+            ATTRIBUTE_PREFIX + "llm_calls": self.llm_calls,
+            ATTRIBUTE_PREFIX + "prompt_tokens": self.prompt_tokens,
+            ATTRIBUTE_PREFIX + "cached_tokens": self.cached_tokens,
+            ATTRIBUTE_PREFIX + "output_tokens": self.output_tokens,
+            ATTRIBUTE_PREFIX + "instruction_chars": self.instruction_chars,
+            ATTRIBUTE_PREFIX + "tool_calls": self.tool_calls,
+            ATTRIBUTE_PREFIX + "tool_output_chars": sum(
+                self.tool_output_chars.values()
+            ),
+        }
+
+
+@dataclass
+class _Invocation:
+    session_id: str
+    usage: Usage = field(default_factory=Usage)
+    # Set before a model call, accounted with its response
+    pending_instruction_chars: int = 0
+
+
+class UsageAccountant:
+    """
+    Thread-safe token and payload totals per invocation and per session, also
+    recorded as OpenTelemetry metrics. Without a MeterProvider (see
+    ``app.utils.metrics``) the metrics are no-ops.
+
+    :param meter: Meter of the instruments, the global one by default
+    :param max_sessions: Sessions whose totals are kept
+    :param max_invocations: Unfinished invocations tracked; invocations that
+        never reach the root agent's after-agent callback (errors, cancelled
+        streams) are dropped when over this limit
+    """
+
+    def __init__(
+        self,
+        meter: metrics.Meter | None = None,
+        max_sessions: int = 10000,
+        max_invocations: int = 1000,
+    ) -> None:
+        meter = meter or metrics.get_meter(__name__)
+        self.tokens = meter.create_counter(
+            "agent.tokens",
+            unit="{token}",
+            description="Model tokens by type: prompt, cached or output",
+        )
+        self.invocation_tokens = meter.create_histogram(
+            "agent.invocation.tokens",
+            unit="{token}",
+            description="Model tokens of one invocation by type",
+            explicit_bucket_boundaries_advisory=TOKEN_BOUNDS,
+        )
+        self.instruction_size = meter.create_histogram(
+            "agent.instruction.size",
+            unit="{char}",
+            description="Characters of the system instruction of one model call",
+            explicit_bucket_boundaries_advisory=CHAR_BOUNDS,
+        )
+        self.tool_output_size = meter.create_histogram(
+            "agent.tool.output.size",
+            unit="{char}",
+            description="Characters of one tool output handed to the model",
+            explicit_bucket_boundaries_advisory=CHAR_BOUNDS,
+        )
+        self.max_sessions = max_sessions
+        self.max_invocations = max_invocations
+        self._invocations: OrderedDict[str, _Invocation] = OrderedDict()
+        self._sessions: OrderedDict[str, Usage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_instruction(
+        self, invocation_id: str, session_id: str, chars: int
+    ) -> None:
+        """Note the system instruction size of the model call about to start."""
+        with self._lock:
+            self._invocation(
+                invocation_id, session_id
+            ).pending_instruction_chars = chars
+        self.instruction_size.record(chars)
+
+    def record_model_response(
+        self,
+        invocation_id: str,
+        session_id: str,
+        usage_metadata: types.GenerateContentResponseUsageMetadata,
+    ) -> Usage:
+        """Account one model response; return its usage."""
+        with self._lock:
+            invocation = self._invocation(invocation_id, session_id)
+            usage = Usage(
+                llm_calls=1,
+                prompt_tokens=usage_metadata.prompt_token_count or 0,
+                cached_tokens=usage_metadata.cached_content_token_count or 0,
+                output_tokens=(usage_metadata.candidates_token_count or 0)
+                + (usage_metadata.thoughts_token_count or 0),
+                instruction_chars=invocation.pending_instruction_chars,
+            )
+            invocation.pending_instruction_chars = 0
+            self._add(invocation, usage)
+        self.tokens.add(usage.prompt_tokens, {"token.type": "prompt"})
+        self.tokens.add(usage.cached_tokens, {"token.type": "cached"})
+        self.tokens.add(usage.output_tokens, {"token.type": "output"})
+        return usage
+
+    def record_tool_output(
+        self, invocation_id: str, session_id: str, tool: str, chars: int
+    ) -> None:
+        with self._lock:
+            usage = Usage(tool_calls=1, tool_output_chars={tool: chars})
+            self._add(self._invocation(invocation_id, session_id), usage)
+        self.tool_output_size.record(chars, {"tool": tool})
+
+    def finish_invocation(self, invocation_id: str) -> Usage | None:
+        """Stop tracking an invocation; return its totals if it was tracked."""
+        with self._lock:
+            invocation = self._invocations.pop(invocation_id, None)
+        if invocation is None:
+            return None
+        usage = invocation.usage
+        self.invocation_tokens.record(usage.prompt_tokens, {"token.type": "prompt"})
+        self.invocation_tokens.record(usage.cached_tokens, {"token.type": "cached"})
+        self.invocation_tokens.record(usage.output_tokens, {"token.type": "output"})
+        return usage
+
+    def session_usage(self, session_id: str) -> Usage | None:
+        """Totals of all invocations of a session seen by this process."""
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            return Usage(**asdict(usage)) if usage is not None else None
+
+    def _invocation(self, invocation_id: str, session_id: str) -> _Invocation:
+        # Must be called with self._lock held
+        invocation = self._invocations.get(invocation_id)
+        if invocation is None:
+            invocation = self._invocations[invocation_id] = _Invocation(session_id)
+            while len(self._invocations) > self.max_invocations:
+                self._invocations.popitem(last=False)
+        return invocation
+
+    def _add(self, invocation: _Invocation, usage: Usage) -> None:
+        # Must be called with self._lock held
+        invocation.usage.add(usage)
+        session = self._sessions.pop(invocation.session_id, None) or Usage()
+        session.add(usage)
+        self._sessions[invocation.session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+_accountant: UsageAccountant | None = None
+_accountant_enabled = True
+_accountant_lock = threading.Lock()
+
+
+def get_usage_accountant() -> UsageAccountant | None:
+    """Return the process-wide usage accountant, created on first use."""
+    global _accountant
+    if _accountant is None and _accountant_enabled:
+        with _accountant_lock:
+            if _accountant is None and _accountant_enabled:
+                _accountant = UsageAccountant()
+    return _accountant
+
+
+def set_usage_accountant(accountant: UsageAccountant | None) -> None:
+    """Replace the process-wide usage accountant; None disables accounting."""
+    global _accountant, _accountant_enabled
+    with _accountant_lock:
+        _accountant = accountant
+        _accountant_enabled = accountant is not None
+
+
+def content_chars(content: Any) -> int:
+    """Characters of text in a system instruction or tool output."""
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return len(content)
+    if isinstance(content, types.Content):
+        return sum(len(part.text or "") for part in content.parts or ())
+    if isinstance(content, types.Part):
+        return len(content.text or "")
+    if isinstance(content, list):
+        return sum(content_chars(item) for item in content)
+    return len(json.dumps(content, default=str))
+
+
+def _session_id(context: CallbackContext | ToolContext) -> str:
+    # ADK 1.5 has no public accessor for the session of a callback
+    return context._invocation_context.session.id
+
+
+def account_model_request(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> None:
+    """``before_model_callback`` recording the system instruction size."""
+    accountant = get_usage_accountant()
+    if accountant is None:
+        return None
+    system_instruction = (
+        llm_request.config.system_instruction if llm_request.config else None
+    )
+    accountant.record_instruction(
+        callback_context.invocation_id,
+        _session_id(callback_context),
+        content_chars(system_instruction),
+    )
+    return None
+
+
+def account_model_response(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> None:
+    """``after_model_callback`` recording the tokens of a model response."""
+    accountant = get_usage_accountant()
+    # Streamed chunks are followed by one complete response
+    if accountant is None or llm_response.partial or not llm_response.usage_metadata:
+        return None
+    usage = accountant.record_model_response(
+        callback_context.invocation_id,
+        _session_id(callback_context),
+        llm_response.usage_metadata,
+    )
+    span = trace.get_current_span()
+    for key in ("prompt_tokens", "cached_tokens", "output_tokens"):
+        span.set_attribute(ATTRIBUTE_PREFIX + key, getattr(usage, key))
+    span.set_attribute(ATTRIBUTE_PREFIX + "instruction_chars", usage.instruction_chars)
+    return None
+
+
+def account_tool_output(
+    tool: BaseTool,
+    args: dict[str, Any],
+    tool_context: ToolContext,
+    tool_response: Any,
+) -> None:
+    """``after_tool_callback`` recording the size of a tool output."""
+    accountant = get_usage_accountant()
+    if accountant is None:
+        return None
+    chars = content_chars(tool_response)
+    accountant.record_tool_output(
+        tool_context.invocation_id, _session_id(tool_context), tool.name, chars
+    )
+    trace.get_current_span().set_attribute(
+        ATTRIBUTE_PREFIX + "tool_output_chars", chars
+    )
+    return None
+
+
+def account_invocation(callback_context: CallbackContext) -> None:
+    """``after_agent_callback`` of the root agent closing an invocation."""
+    accountant = get_usage_accountant()
+    if accountant is None:
+        return None
+    usage = accountant.finish_invocation(callback_context.invocation_id)
+    if usage is not None:
+        trace.get_current_span().set_attributes(usage.span_attributes())
+    return None
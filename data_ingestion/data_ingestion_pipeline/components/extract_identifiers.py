@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ruff: noqa
+
+from kfp.dsl import Artifact, Dataset, Input, Output, component
+
+
+@component(
+    base_image="us-docker.pkg.dev/production-ai-template/starter-pack/data_processing:0.2"
+)
+def extract_identifiers(
+    input_files: Input[Dataset],
+    identifier_index: Output[Artifact],
+    identifier_index_module: str,
+    embedding_column: str = "embedding",
+) -> None:
+    """Build the exact identifier lookup index of the exported chunks.
+
+    Frame numbers, customer bike IDs and work order numbers are found in the
+    text of every chunk and mapped to the chunks containing them. The extraction
+    and normalization are those of app/tools/identifier_index.py, which the agent
+    uses to look identifiers up; the pipeline passes that module's source in
+    ``identifier_index_module`` when it is compiled, so both always match.
+
+    Args:
+        input_files: JSONL export of the process_data step
+        identifier_index: Output JSON index file
+        identifier_index_module: Source of app/tools/identifier_index.py
+        embedding_column: Column dropped from the stored chunks
+    """
+    import logging
+    import os
+    import sys
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    module_dir = tempfile.mkdtemp()
+    with open(os.path.join(module_dir, "identifier_index.py"), "w") as f:
+        f.write(identifier_index_module)
+    sys.path.insert(0, module_dir)
+    from identifier_index import IdentifierIndex
+
+    # The export URI ends in "*.jsonl"; its local path is the GCS FUSE mount
+    index = IdentifierIndex.from_jsonl(
+        input_files.path, embedding_column=embedding_column
+    )
+    index.save(identifier_index.path)
+    identifier_index.metadata["identifiers"] = len(index)
+    identifier_index.metadata["chunks"] = len(index.chunks)
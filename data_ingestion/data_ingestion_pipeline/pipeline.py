@@ -12,10 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from pathlib import Path
+
+from data_ingestion_pipeline.components.extract_identifiers import (
+    extract_identifiers,
+)
 from data_ingestion_pipeline.components.ingest_data import ingest_data
 from data_ingestion_pipeline.components.process_data import process_data
 from kfp import dsl
 
+# The agent's identifier index module, run by the extract_identifiers step
+IDENTIFIER_INDEX_MODULE = (
+    Path(__file__).resolve().parents[2] / "app" / "tools" / "identifier_index.py"
+)
+
 
 @dsl.pipeline(description="A pipeline to run ingestion of new data into the datastore")
 def pipeline(
@@ -48,6 +58,13 @@ def pipeline(
         embedding_column="embedding",
     ).set_retry(num_retries=2)
 
+    # Build the exact identifier lookup index served by the agent
+    extract_identifiers(
+        input_files=processed_data.output,
+        identifier_index_module=IDENTIFIER_INDEX_MODULE.read_text(),
+        embedding_column="embedding",
+    ).set_retry(num_retries=2)
+
     # Ingest the processed data into Vertex AI Search datastore
     ingest_data(
         project_id=project_id,
@@ -0,0 +1,93 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-call latency of search_engine with a fresh client per call versus the
+shared SearchClientPool, against a local stand-in SearchService.
+
+    uv run python -m tests.benchmarks.bench_client_pool --iterations 500
+"""
+
+import argparse
+
+import grpc
+from google.cloud.discoveryengine_v1.services.search_service import SearchServiceClient
+from google.cloud.discoveryengine_v1.services.search_service.transports import (
+    SearchServiceGrpcTransport,
+)
+
+from app.tools import search
+from app.tools.client_pool import (
+    ChannelOptions,
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from tests.benchmarks.common import print_table, summarize, time_calls
+from tests.fakes.discovery_engine import FakeSearchService
+
+QUERY = "brake bleed Shimano MT200"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    with FakeSearchService() as service:
+        options = ChannelOptions().grpc_options()
+
+        def unpooled_call() -> None:
+            # What search_engine did before: a new client and channel per call
+            client = SearchServiceClient(
+                transport=SearchServiceGrpcTransport(
+                    channel=grpc.insecure_channel(service.address, options=options)
+                )
+            )
+            try:
+                list(client.search(_request()))
+            finally:
+                client.transport.close()
+
+        configure_search_client_pool(channel_factory=service.channel_factory)
+
+        def pooled_call() -> None:
+            search.search_engine(QUERY, search.DATA_STORES[0])
+
+        def pooled_raw_call() -> None:
+            with search.get_search_client_pool().client(search.API_ENDPOINT) as c:
+                list(c.search(_request()))
+
+        # Warm up both paths so the first pooled connect is not counted
+        unpooled_call()
+        pooled_call()
+
+        rows = {
+            "new client per call": summarize(
+                time_calls(unpooled_call, args.iterations)
+            ),
+            "pooled client": summarize(time_calls(pooled_raw_call, args.iterations)),
+            "pooled search_engine": summarize(time_calls(pooled_call, args.iterations)),
+        }
+        shutdown_search_client_pool()
+
+    print_table(rows)
+
+
+def _request() -> search.discoveryengine.SearchRequest:
+    return search.discoveryengine.SearchRequest(
+        serving_config=search.SERVING_CONFIG, query=QUERY, page_size=8
+    )
+
+
+if __name__ == "__main__":
+    main()
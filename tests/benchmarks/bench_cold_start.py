@@ -0,0 +1,328 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Cold start of an Agent Engine worker, from process start to the first streamed
+event, against local stand-ins (no credentials, Gemini or Discovery Engine).
+
+Every run uses fresh interpreters:
+
+* imports: ``python -X importtime`` of ``app.agent`` and then
+  ``app.agent_engine_app``, aggregated per target, per package and per module
+* startup: import, ``AgentEngineApp(...)``, ``set_up()`` (ADK runner, Cloud
+  Logging client, TracerProvider, span exporter) and the first ``stream_query``
+  with a scripted model calling ``search_all_sources``
+
+Writes a JSON report (medians over ``--runs``) for tracking regressions:
+
+    uv run python -m tests.benchmarks.bench_cold_start --runs 3 --output cold_start.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from typing import Any
+from unittest import mock
+
+from tests.benchmarks.common import print_table
+
+SCHEMA_VERSION = 1
+IMPORT_TARGETS = ("app.agent", "app.agent_engine_app")
+STAND_IN_PROJECT = "cold-start-local"
+QUERY = "Brake squeals after bleeding Shimano MT200"
+_MARK = "--cold-start-mark--"
+
+
+def stand_in_env() -> dict[str, str]:
+    """Environment of the measured interpreters; any real ADC lookup fails."""
+    env = {
+        **os.environ,
+        "GOOGLE_CLOUD_PROJECT": STAND_IN_PROJECT,
+        "GOOGLE_APPLICATION_CREDENTIALS": "/nonexistent/credentials.json",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    env.pop("GOOGLE_CLOUD_AGENT_ENGINE_ID", None)
+    return env
+
+
+def package_of(module: str) -> str:
+    """Group modules by distribution, e.g. ``google.cloud.aiplatform``."""
+    parts = module.split(".")
+    if parts[0] == "google":
+        return ".".join(parts[:3] if parts[1:2] == ["cloud"] else parts[:2])
+    return parts[0]
+
+
+def parse_importtime(stderr: str) -> dict[str, Any]:
+    """
+    Aggregate ``-X importtime`` output. Targets are separated by marker lines;
+    a target's time is the cumulative time of its top-level imports.
+    """
+    targets: dict[str, float] = defaultdict(float)
+    packages: dict[str, dict[str, float]] = defaultdict(
+        lambda: {"self_ms": 0.0, "modules": 0}
+    )
+    modules: list[tuple[str, float, float]] = []
+    target_index = 0
+    for line in stderr.splitlines():
+        if line.startswith(_MARK):
+            target_index += 1
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        module = name.strip()
+        self_ms = int(self_us) / 1000
+        cumulative_ms = int(cumulative_us) / 1000
+        # Top-level imports of the probe are indented by exactly one space
+        if name.startswith(" ") and not name.startswith("  "):
+            targets[IMPORT_TARGETS[target_index]] += cumulative_ms
+        packages[package_of(module)]["self_ms"] += self_ms
+        packages[package_of(module)]["modules"] += 1
+        modules.append((module, self_ms, cumulative_ms))
+    return {
+        "targets_ms": dict(targets),
+        "packages": dict(packages),
+        "modules": {m: {"self_ms": s, "cumulative_ms": c} for m, s, c in modules},
+    }
+
+
+def profile_imports() -> dict[str, Any]:
+    probe = f"import sys\nimport {IMPORT_TARGETS[0]}\n"
+    for target in IMPORT_TARGETS[1:]:
+        probe += f"print({_MARK!r}, file=sys.stderr, flush=True)\nimport {target}\n"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        text=True,
+        env=stand_in_env(),
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Import probe failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def profile_startup() -> dict[str, Any]:
+    spawned_at = time.time()
+    completed = subprocess.run(
+        [sys.executable, "-m", "tests.benchmarks.bench_cold_start", "--child"],
+        capture_output=True,
+        text=True,
+        env=stand_in_env(),
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr[-2000:]}")
+    child = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        "interpreter_start_s": child.pop("main_at") - spawned_at,
+        "process_start_to_first_event_s": child.pop("first_event_at") - spawned_at,
+        **child,
+    }
+
+
+@contextlib.contextmanager
+def timed(
+    owner: Any, attribute: str, totals: dict[str, float], key: str
+) -> Iterator[None]:
+    """Add the duration of every call of ``owner.attribute`` to ``totals[key]``."""
+    original = getattr(owner, attribute)
+
+    @functools.wraps(original)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            totals[key] = totals.get(key, 0.0) + time.perf_counter() - start
+
+    with mock.patch.object(owner, attribute, wrapper):
+        yield
+
+
+def run_child() -> None:
+    """One cold start in this interpreter; prints its phases as JSON."""
+    main_at = time.time()
+    phases: dict[str, float] = {}
+
+    import google.auth
+    from google.auth.credentials import AnonymousCredentials
+
+    # Cloud clients find stand-in credentials instead of ADC
+    google.auth.default = lambda *args, **kwargs: (
+        AnonymousCredentials(),
+        STAND_IN_PROJECT,
+    )
+
+    start = time.perf_counter()
+    import app.agent_engine_app as agent_engine_app
+
+    phases["import_s"] = time.perf_counter() - start
+
+    import vertexai
+    from google.cloud import logging as google_cloud_logging
+    from opentelemetry.sdk.trace import TracerProvider
+    from vertexai.preview.reasoning_engines import AdkApp
+
+    from app.agent import root_agent
+    from app.tools.client_pool import configure_search_client_pool
+    from app.utils.tracing import CloudTraceLoggingSpanExporter
+    from tests.fakes.discovery_engine import FakeSearchService
+    from tests.fakes.llm import ScriptedLlm
+    from tests.fakes.recorded_results import recorded_documents
+
+    service = FakeSearchService(documents=recorded_documents).start()
+    configure_search_client_pool(
+        channel_factory=service.channel_factory,
+        async_channel_factory=service.async_channel_factory,
+    )
+    root_agent.model = ScriptedLlm()
+
+    # Without an explicit project, AdkApp() asks Resource Manager to turn
+    # GOOGLE_CLOUD_PROJECT into a project ID, which cannot succeed offline.
+    start = time.perf_counter()
+    vertexai.init(
+        project=STAND_IN_PROJECT,
+        location="europe-west1",
+        credentials=AnonymousCredentials(),
+    )
+    phases["vertexai_init_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    agent_app = agent_engine_app.AgentEngineApp(agent=root_agent)
+    phases["construct_s"] = time.perf_counter() - start
+
+    with contextlib.ExitStack() as stack:
+        for owner, attribute, key in (
+            (AdkApp, "set_up", "set_up.adk_s"),
+            (google_cloud_logging.Client, "__init__", "set_up.logging_client_s"),
+            (TracerProvider, "__init__", "set_up.tracer_provider_s"),
+            (CloudTraceLoggingSpanExporter, "__init__", "set_up.span_exporter_s"),
+        ):
+            stack.enter_context(timed(owner, attribute, phases, key))
+        start = time.perf_counter()
+        agent_app.set_up()
+        phases["set_up_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    events = iter(agent_app.stream_query(message=QUERY, user_id="cold-start"))
+    next(events)
+    first_event_at = time.time()
+    phases["first_event_s"] = time.perf_counter() - start
+    event_count = 1 + sum(1 for _ in events)
+    phases["stream_query_s"] = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                **phases,
+                "events": event_count,
+                "search_requests": service.request_count,
+                "main_at": main_at,
+                "first_event_at": first_event_at,
+            }
+        ),
+        flush=True,
+    )
+    # Skip interpreter shutdown: the batch span processor would try to export
+    # the spans of this run to Cloud Trace with stand-in credentials.
+    os._exit(0)
+
+
+def median_of(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """Element-wise median of (nested) numeric reports."""
+    merged: dict[str, Any] = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if key in run]
+        if isinstance(values[0], dict):
+            merged[key] = median_of(values)
+        else:
+            merged[key] = statistics.median(values)
+    return merged
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25, help="Modules to report")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child()
+        return
+
+    imports = median_of([profile_imports() for _ in range(args.runs)])
+    startup = median_of([profile_startup() for _ in range(args.runs)])
+    slowest = sorted(
+        imports["modules"].items(), key=lambda m: m[1]["self_ms"], reverse=True
+    )
+    imports["modules"] = dict(slowest[: args.top])
+    imports["packages"] = dict(
+        sorted(imports["packages"].items(), key=lambda p: p[1]["self_ms"], reverse=True)
+    )
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "imports": imports,
+        "startup": startup,
+    }
+
+    if not args.output:
+        print(json.dumps(report, indent=2))
+        return
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_table({k: {"ms": v} for k, v in imports["targets_ms"].items()})
+    print_table(
+        {
+            k: {"self_ms": v["self_ms"], "modules": v["modules"]}
+            for k, v in list(imports["packages"].items())[:10]
+        }
+    )
+    print_table(
+        {
+            k.removesuffix("_s"): {"ms": v * 1000}
+            for k, v in startup.items()
+            if k.endswith("_s")
+        }
+    )
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
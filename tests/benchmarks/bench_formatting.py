@@ -0,0 +1,68 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tokens per search result and per tool call with the previous ``str(dict)``
+formatting versus the per-data-store ResultFormatter, on recorded responses.
+
+    uv run python -m tests.benchmarks.bench_formatting
+"""
+
+import argparse
+
+from google.protobuf import struct_pb2
+from google.protobuf.json_format import MessageToDict
+
+from app.tools.formatting import estimate_tokens
+from app.tools.search import DATA_STORES
+from tests.benchmarks.common import print_table
+from tests.fakes.recorded_results import RECORDED_RESULTS
+
+
+def legacy_format(struct_data: struct_pb2.Struct) -> str:
+    """format_search_result_for_llm before the ResultFormatter."""
+    return f"**Data:**\n{MessageToDict(struct_data)!s}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results-per-call", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = {}
+    for data_store in DATA_STORES:
+        structs = []
+        for document in RECORDED_RESULTS[data_store.key][: args.results_per_call]:
+            struct = struct_pb2.Struct()
+            struct.update(document)
+            structs.append(struct)
+
+        before = [estimate_tokens(legacy_format(s)) for s in structs]
+        after = [
+            estimate_tokens(text)
+            for text in data_store.formatter.format_results(
+                [MessageToDict(s) for s in structs]
+            )
+        ]
+        rows[data_store.key] = {
+            "before/result": sum(before) / len(before),
+            "after/result": sum(after) / len(after),
+            "before/call": float(sum(before)),
+            "after/call": float(sum(after)),
+            "reduction": 1 - sum(after) / sum(before),
+        }
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
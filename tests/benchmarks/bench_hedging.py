@@ -0,0 +1,84 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tail latency of ``fetch_search_results`` without and with hedged requests,
+against the local stand-in answering with a heavy-tailed delay: most requests
+take ``--base-ms``, ``--slow-share`` of them stall for ``--slow-ms``.
+
+    uv run python -m tests.benchmarks.bench_hedging --iterations 400
+"""
+
+import argparse
+import random
+import threading
+
+from app.tools import search
+from app.tools.cache import set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.hedging import HedgePolicy, Hedger, set_hedger
+from app.tools.search_metrics import get_latency_recorder
+from tests.benchmarks.common import print_table, summarize, time_calls
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.recorded_results import recorded_documents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=400)
+    parser.add_argument("--base-ms", type=float, default=60.0)
+    parser.add_argument("--slow-ms", type=float, default=1500.0)
+    parser.add_argument("--slow-share", type=float, default=0.03)
+    parser.add_argument("--max-extra-load", type=float, default=0.1)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+
+    def delay(request: object) -> float:
+        with rng_lock:
+            slow = rng.random() < args.slow_share
+            jitter = rng.uniform(0.8, 1.2)
+        return (args.slow_ms if slow else args.base_ms * jitter) / 1000
+
+    data_store = search.DATA_STORES[0]
+    # Every call has to reach the service
+    set_search_cache(None)
+    rows = {}
+    with FakeSearchService(documents=recorded_documents, delay=delay) as service:
+        configure_search_client_pool(channel_factory=service.channel_factory)
+        policy = HedgePolicy(max_extra_load=args.max_extra_load)
+        for name, hedger in (("no hedging", None), ("hedged", Hedger(policy))):
+            set_hedger(hedger)
+            get_latency_recorder().clear()
+            before = service.request_count
+            latencies = time_calls(
+                lambda: search.fetch_search_results("brakes", data_store),
+                args.iterations,
+            )
+            metrics = get_latency_recorder().metrics()[data_store.id]
+            rows[name] = {
+                **summarize(latencies),
+                "extra_load": (service.request_count - before) / args.iterations - 1,
+                "hedge_wins": metrics["hedge_wins"],
+            }
+        set_hedger(None)
+        shutdown_search_client_pool()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
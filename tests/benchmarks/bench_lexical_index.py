@@ -0,0 +1,128 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Build time, memory and query latency of the in-process BM25 index on synthetic
+chunk exports in the ingestion pipeline's JSONL format.
+
+    uv run python -m tests.benchmarks.bench_lexical_index --sizes 1000,10000,50000
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.tools.lexical_index import LexicalIndex
+from tests.benchmarks.common import print_table, summarize, time_calls
+
+WORDS = (
+    "brake bleed caliper rotor pad lever hose shimano sram bosch motor battery "
+    "display error code firmware update chain cassette derailleur wheel spoke "
+    "tyre tube valve frame fork shock bearing bottom bracket crank pedal saddle "
+    "seatpost stem handlebar grip light charger warranty customer order repair "
+    "replace adjust torque check clean lubricate inspect noise squeal vibration"
+).split()
+
+
+def identifier(rng: random.Random) -> str:
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"SM-BB{rng.randrange(10, 999)}"
+    if kind == 1:
+        return f"E-{rng.randrange(1, 99)}"
+    return f"WBK{rng.randrange(100000, 999999)}"
+
+
+def write_export(path: Path, size: int, embedding_dim: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    with path.open("w") as f:
+        for i in range(size):
+            words = rng.choices(WORDS, k=rng.randrange(120, 260))
+            for _ in range(rng.randrange(1, 4)):
+                words.insert(rng.randrange(len(words)), identifier(rng))
+            document = {
+                "id": f"q{i // 4}__{i % 4}",
+                "embedding": [
+                    round(rng.uniform(-1, 1), 5) for _ in range(embedding_dim)
+                ],
+                "content": " ".join(words),
+                "question_id": i // 4,
+            }
+            f.write(
+                json.dumps({"id": document["id"], "json_data": json.dumps(document)})
+            )
+            f.write("\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, args.sizes.split(",")):
+            path = Path(tmp) / f"export-{size}.jsonl"
+            write_export(path, size, args.embedding_dim)
+
+            start = time.perf_counter()
+            index = LexicalIndex.from_jsonl(str(path))
+            build_s = time.perf_counter() - start
+            # Separate build, tracemalloc slows allocation-heavy code down a lot
+            tracemalloc.start()
+            traced = LexicalIndex.from_jsonl(str(path))
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del traced
+
+            rng = random.Random(size)
+            identifier_queries = [
+                f"{identifier(rng)} {rng.choice(WORDS)}" for _ in range(args.queries)
+            ]
+            text_queries = [
+                " ".join(rng.choices(WORDS, k=4)) for _ in range(args.queries)
+            ]
+            queries = iter(identifier_queries)
+            confident = summarize(
+                time_calls(
+                    lambda i=index, q=queries: i.confident_search(next(q)),
+                    args.queries,
+                )
+            )
+            texts = iter(text_queries)
+            full = summarize(
+                time_calls(lambda i=index, q=texts: i.search(next(q)), args.queries)
+            )
+            answered = sum(bool(index.confident_search(q)) for q in identifier_queries)
+            rows[f"{size} chunks"] = {
+                "build_s": build_s,
+                "arrays_mb": index.nbytes / 2**20,
+                "retained_mb": retained / 2**20,
+                "peak_mb": peak / 2**20,
+                "ident_p50_us": confident["p50_ms"] * 1000,
+                "ident_p99_us": confident["p99_ms"] * 1000,
+                "answered": answered / len(identifier_queries),
+                "text_p50_us": full["p50_ms"] * 1000,
+                "text_p99_us": full["p99_ms"] * 1000,
+            }
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
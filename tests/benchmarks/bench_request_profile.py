@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+SearchResponse bytes and latency per call with the previous request (page size
+8, one snippet per result) versus each data store's SearchProfile, against the
+local stand-in answering with recorded documents.
+
+    uv run python -m tests.benchmarks.bench_request_profile --iterations 200
+"""
+
+import argparse
+import dataclasses
+
+from app.tools import search
+from app.tools.cache import set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.search_metrics import get_response_size_recorder
+from tests.benchmarks.common import print_table, summarize, time_calls
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.recorded_results import recorded_documents
+
+LEGACY_PROFILE = search.SearchProfile(page_size=8, max_snippet_count=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    # Every call has to reach the service
+    set_search_cache(None)
+    rows = {}
+    with FakeSearchService(documents=recorded_documents) as service:
+        configure_search_client_pool(channel_factory=service.channel_factory)
+        for data_store in search.DATA_STORES:
+            legacy = dataclasses.replace(data_store, profile=LEGACY_PROFILE)
+            for name, ds in (("legacy", legacy), ("profile", data_store)):
+                recorder = get_response_size_recorder()
+                recorder.clear()
+                latency = summarize(
+                    time_calls(
+                        lambda ds=ds: search.fetch_search_results("brakes", ds),
+                        args.iterations,
+                    )
+                )
+                sizes = recorder.metrics()[ds.id]
+                rows[f"{data_store.key} {name}"] = {
+                    "bytes/call": sizes["mean_response_bytes"],
+                    "p50_ms": latency["p50_ms"],
+                    "p99_ms": latency["p99_ms"],
+                }
+        shutdown_search_client_pool()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Prompt tokens and time to first token per ``search_all_sources`` turn with the
+merged results of all data stores versus the cross-source re-ranker keeping
+the top N, against the local search and ranking stand-ins.
+
+Time to first token is modeled as the measured tool latency plus prefill of
+the tool output at ``--prefill-ms-per-1k-tokens``; the ranking stand-in waits
+``--rank-latency-ms`` per call like the ranking API round trip.
+
+    uv run python -m tests.benchmarks.bench_rerank --iterations 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.tools import search_async
+from app.tools.cache import set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.formatting import estimate_tokens
+from app.tools.rerank import SearchReranker, set_search_reranker
+from tests.benchmarks.common import percentile, print_table
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.recorded_results import recorded_documents
+from tests.fakes.reranker import OverlapReranker
+
+QUERIES = [
+    "bleed Shimano MT200 front brake",
+    "Bosch E-10 speed sensor error",
+    "how to report sickness",
+    "create a work order in Vantool",
+    "front brake pads squeaking",
+]
+
+
+async def run_turns(iterations: int) -> tuple[list[float], list[int]]:
+    latencies: list[float] = []
+    tokens: list[int] = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        output = await search_async.search_all_sources(QUERIES[i % len(QUERIES)])
+        latencies.append(time.perf_counter() - start)
+        tokens.append(estimate_tokens(output))
+    return latencies, tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--search-latency-ms", type=float, default=80.0)
+    parser.add_argument("--rank-latency-ms", type=float, default=40.0)
+    parser.add_argument("--prefill-ms-per-1k-tokens", type=float, default=20.0)
+    parser.add_argument("--top-n", default="3,5,8")
+    args = parser.parse_args()
+
+    # Every turn has to reach the services
+    set_search_cache(None)
+    scenarios: dict[str, SearchReranker | None] = {"merged": None}
+    for top_n in map(int, args.top_n.split(",")):
+        compressor = OverlapReranker(top_n=top_n, delay=args.rank_latency_ms / 1000)
+        scenarios[f"rerank top {top_n}"] = SearchReranker(compressor, top_n=top_n)
+
+    rows = {}
+    with FakeSearchService(
+        documents=recorded_documents,
+        delay=lambda request: args.search_latency_ms / 1000,
+    ) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        for name, reranker in scenarios.items():
+            set_search_reranker(reranker)
+            latencies, tokens = asyncio.run(run_turns(args.iterations))
+            ttft = [
+                latency + tokens / 1000 * args.prefill_ms_per_1k_tokens / 1000
+                for latency, tokens in zip(latencies, tokens, strict=True)
+            ]
+            rows[name] = {
+                "tokens/turn": statistics.fmean(tokens),
+                "tool_p50_ms": percentile(latencies, 50) * 1000,
+                "ttft_p50_ms": percentile(ttft, 50) * 1000,
+                "ttft_p95_ms": percentile(ttft, 95) * 1000,
+            }
+        set_search_reranker(None)
+        shutdown_search_client_pool()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
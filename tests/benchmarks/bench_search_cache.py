@@ -0,0 +1,123 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Hit rate and latency of the search result cache on a replayed query log.
+
+The log has one ``<data store key>\\t<query>`` per line. Without --query-log a
+synthetic, Zipf-distributed log of typical mechanic questions is replayed.
+
+    uv run python -m tests.benchmarks.bench_search_cache --queries 2000
+"""
+
+import argparse
+import random
+
+from app.tools import search
+from app.tools.cache import SearchResultCache, set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from tests.benchmarks.common import print_table, summarize, time_calls
+from tests.fakes.discovery_engine import FakeSearchService
+
+BASE_QUERIES = [
+    ("technical-docs", "brake bleed Shimano MT200"),
+    ("erp-software-system", "how to create work order in Vantool"),
+    ("technical-docs", "E-10 error Bosch Performance Line"),
+    ("technical-docs", "SM-BB72 bottom bracket torque"),
+    ("yeplypedia", "sickness reporting SOP"),
+    ("slack-messages", "Gates belt tension Babboe"),
+    ("bike-histories", "frame number WBK123456 work orders"),
+    ("erp-software-system", "My-Business damage report status"),
+    ("yeplypedia", "van inventory checklist"),
+    ("technical-docs", "Magura MT5 pad replacement"),
+]
+
+
+def synthetic_log(size: int, distinct: int, seed: int = 7) -> list[tuple[str, str]]:
+    """Zipf-like mix of popular questions with casing/spacing variations."""
+    rng = random.Random(seed)
+    queries = [
+        (key, f"{query} {n}" if n else query)
+        for n in range(distinct // len(BASE_QUERIES) + 1)
+        for key, query in BASE_QUERIES
+    ][:distinct]
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    log = []
+    for key, query in rng.choices(queries, weights=weights, k=size):
+        if rng.random() < 0.3:
+            query = query.upper() if rng.random() < 0.5 else f"  {query.lower()} "
+        log.append((key, query))
+    return log
+
+
+def read_query_log(path: str) -> list[tuple[str, str]]:
+    """The ``(data store key, query)`` pairs of a query log file."""
+    log = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                key, query = line.rstrip("\n").split("\t", 1)
+                log.append((key, query))
+    return log
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--query-log", help="File with <data store key>\\t<query>")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--backend-latency-ms", type=float, default=40.0)
+    parser.add_argument("--max-entries", type=int, default=1024)
+    parser.add_argument("--ttl-seconds", type=float, default=300.0)
+    args = parser.parse_args()
+
+    if args.query_log:
+        log = read_query_log(args.query_log)
+    else:
+        log = synthetic_log(args.queries, args.distinct)
+    data_stores = {ds.key: ds for ds in search.DATA_STORES}
+
+    with FakeSearchService(delay=args.backend_latency_ms / 1000) as service:
+        configure_search_client_pool(channel_factory=service.channel_factory)
+
+        def replay(cache: SearchResultCache | None) -> list[float]:
+            set_search_cache(cache)
+            calls = iter(log)
+
+            def call() -> None:
+                key, query = next(calls)
+                search.search_engine(query, data_stores[key])
+
+            return time_calls(call, len(log))
+
+        rows = {"no cache": summarize(replay(None))}
+        cache = SearchResultCache(
+            max_entries=args.max_entries, ttl_seconds=args.ttl_seconds
+        )
+        rows["ttl+lru cache"] = summarize(replay(cache))
+        shutdown_search_client_pool()
+
+    print_table(rows)
+    metrics = cache.metrics()
+    print(
+        f"\nhit rate {metrics['hit_rate']:.1%}, "
+        f"{metrics['evictions']} evictions, {metrics['size']} entries, "
+        f"{service.request_count} backend requests for {2 * len(log)} searches"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Hit rate of the exact vs. semantic search cache on paraphrased queries, and
+semantic lookup latency as the number of cached queries grows. Uses the
+deterministic HashingEmbeddings stand-in, so absolute similarities differ from
+the production embedding model.
+
+    uv run python -m tests.benchmarks.bench_semantic_cache --threshold 0.8
+"""
+
+import argparse
+
+from app.tools.cache import SearchResultCache
+from app.tools.semantic_cache import HashingEmbeddings, SemanticQueryCache
+from tests.benchmarks.common import print_table, summarize, time_calls
+
+DATA_STORE = "technical-docs_1751366705621"
+
+PARAPHRASES = [
+    ("brake bleed Shimano MT200", "Shimano MT200 brake bleed"),
+    ("bleed MT200 brakes", "MT200 brake bleeding procedure"),
+    ("E-10 error Bosch Performance Line", "Bosch Performance Line error E-10"),
+    ("SM-BB72 bottom bracket torque", "torque SM-BB72 bottom bracket"),
+    ("Gates belt tension Babboe", "belt tension on Babboe with Gates belt"),
+    ("replace Magura MT5 pads", "Magura MT5 pad replacement"),
+    ("tubeless tire sealant amount", "how much sealant for tubeless tires"),
+    ("derailleur hanger alignment", "align derailleur hanger"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    exact = SearchResultCache()
+    semantic = SemanticQueryCache(
+        HashingEmbeddings(), threshold=args.threshold, max_entries_per_data_store=8192
+    )
+    for original, _ in PARAPHRASES:
+        exact.put(DATA_STORE, original, [original])
+        semantic.add(DATA_STORE, original, [original])
+    exact_hits = sum(exact.get(DATA_STORE, p) is not None for _, p in PARAPHRASES)
+    semantic_hits = sum(
+        semantic.lookup(DATA_STORE, p) is not None for _, p in PARAPHRASES
+    )
+    print(
+        f"paraphrase hit rate: exact {exact_hits}/{len(PARAPHRASES)}, "
+        f"semantic {semantic_hits}/{len(PARAPHRASES)} (threshold {args.threshold})\n"
+    )
+
+    rows = {}
+    for entries in [256, 1024, 4096, 8192]:
+        cache = SemanticQueryCache(
+            HashingEmbeddings(),
+            threshold=args.threshold,
+            max_entries_per_data_store=8192,
+        )
+        for i in range(entries):
+            cache.add(DATA_STORE, f"cached question number {i}", [str(i)])
+        # The probe's embedding is memoized after the first call, so this times
+        # the vectorized similarity search only
+        rows[f"{entries} entries"] = summarize(
+            time_calls(
+                lambda c=cache: c.lookup(DATA_STORE, "cached question 17"),
+                args.iterations,
+            )
+        )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
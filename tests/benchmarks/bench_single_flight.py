@@ -0,0 +1,103 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Backend requests and latency of a burst of concurrent searches without and
+with single-flight coalescing: ``--callers`` threads (sync) or tasks (async)
+each send one of ``--distinct`` queries at the same moment, ``--bursts`` times.
+
+    uv run python -m tests.benchmarks.bench_single_flight --callers 32
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+from app.tools import search, search_async
+from app.tools.cache import set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.single_flight import SingleFlight, set_single_flight
+from tests.benchmarks.common import print_table, summarize
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.recorded_results import recorded_documents
+
+
+def sync_burst(queries: list[str], data_store: search.DataStore) -> list[float]:
+    barrier = threading.Barrier(len(queries))
+
+    def ask(query: str) -> float:
+        barrier.wait()
+        start = time.perf_counter()
+        search.fetch_search_results(query, data_store)
+        return time.perf_counter() - start
+
+    with futures.ThreadPoolExecutor(len(queries)) as executor:
+        return list(executor.map(ask, queries))
+
+
+async def async_burst(queries: list[str], data_store: search.DataStore) -> list[float]:
+    async def ask(query: str) -> float:
+        start = time.perf_counter()
+        await search_async.fetch_search_results_async(query, data_store)
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(ask(q) for q in queries)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=2)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=80.0)
+    args = parser.parse_args()
+
+    data_store = search.DATA_STORES[0]
+    queries = [f"brake pads {i % args.distinct}" for i in range(args.callers)]
+    # Every burst has to reach the service
+    set_search_cache(None)
+    rows = {}
+    with FakeSearchService(
+        documents=recorded_documents, delay=args.delay_ms / 1000
+    ) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        for mode in ("sync", "async"):
+            for name, single_flight in (("", None), (" coalesced", SingleFlight())):
+                set_single_flight(single_flight)
+                before = service.request_count
+                latencies: list[float] = []
+                for _ in range(args.bursts):
+                    if mode == "sync":
+                        latencies += sync_burst(queries, data_store)
+                    else:
+                        latencies += asyncio.run(async_burst(queries, data_store))
+                rows[mode + name] = {
+                    **summarize(latencies),
+                    "requests_per_burst": (service.request_count - before)
+                    / args.bursts,
+                }
+        set_single_flight(None)
+        shutdown_search_client_pool()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
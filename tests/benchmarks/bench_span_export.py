@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Spans per second exported by ``CloudTraceLoggingSpanExporter`` with one
+synchronous Cloud Logging write per span (the previous exporter) vs. batched
+background writes, against local stand-in logging and trace sinks with
+``--rpc-ms`` latency per RPC.
+
+``export_spans_per_s`` is what the BatchSpanProcessor thread sees;
+``end_to_end_spans_per_s`` also waits until every log entry is written.
+
+    uv run python -m tests.benchmarks.bench_span_export --spans 5000
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Sequence
+from typing import cast
+
+from google.cloud import logging as google_cloud_logging
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SpanExportResult
+
+from app.utils.tracing import CloudTraceLoggingSpanExporter
+from tests.benchmarks.common import print_table
+from tests.fakes.telemetry_sinks import (
+    FakeLoggingClient,
+    FakeStorageClient,
+    FakeTraceClient,
+)
+
+
+class PerSpanLoggingExporter(CloudTraceLoggingSpanExporter):
+    """The exporter before batching: one blocking log_struct call per span."""
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        for span in spans:
+            span_context = span.get_span_context()
+            assert span_context is not None
+            span_dict = json.loads(span.to_json())
+            span_dict["trace"] = (
+                f"projects/{self.project_id}/traces/"
+                f"{format(span_context.trace_id, 'x')}"
+            )
+            span_dict["span_id"] = format(span_context.span_id, "x")
+            self.logger.log_struct(
+                span_dict, labels=self.log_writer.labels, severity="INFO"
+            )
+        return super(CloudTraceLoggingSpanExporter, self).export(spans)
+
+
+def make_spans(count: int) -> list[ReadableSpan]:
+    tracer = TracerProvider().get_tracer(__name__)
+    spans = []
+    for i in range(count):
+        span = tracer.start_span(
+            "call_llm",
+            attributes={
+                "gen_ai.request.model": "gemini-2.5-flash",
+                "gcp.vertex.agent.llm_request": "x" * 2000,
+                "turn": i,
+            },
+        )
+        span.end()
+        spans.append(cast(ReadableSpan, span))
+    return spans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spans", type=int, default=5000)
+    # BatchSpanProcessor's default max_export_batch_size
+    parser.add_argument("--export-batch", type=int, default=512)
+    parser.add_argument("--rpc-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    spans = make_spans(args.spans)
+    rows = {}
+    for name, exporter_class in (
+        ("per-span log_struct", PerSpanLoggingExporter),
+        ("batched background", CloudTraceLoggingSpanExporter),
+    ):
+        logging_client = FakeLoggingClient(rpc_latency=args.rpc_ms / 1000)
+        exporter = exporter_class(
+            project_id="bench-project",
+            client=FakeTraceClient(rpc_latency=args.rpc_ms / 1000),
+            logging_client=cast(google_cloud_logging.Client, logging_client),
+            storage_client=FakeStorageClient(),
+        )
+        start = time.perf_counter()
+        for i in range(0, len(spans), args.export_batch):
+            exporter.export(spans[i : i + args.export_batch])
+        exported = time.perf_counter() - start
+        exporter.force_flush()
+        flushed = time.perf_counter() - start
+        logger = logging_client.logger("bench")
+        rows[name] = {
+            "export_spans_per_s": len(spans) / exported,
+            "end_to_end_spans_per_s": len(spans) / flushed,
+            "logging_rpcs": logger.rpcs,
+            "entries": len(logger.entries),
+        }
+        exporter.shutdown()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
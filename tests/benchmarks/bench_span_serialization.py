@@ -0,0 +1,151 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-span cost of turning ADK spans into Cloud Logging entries: the previous
+``json.loads(span.to_json())`` round trip with ``json.dumps`` size checks vs.
+the exporter's direct conversion with incremental size estimates.
+
+Spans mimic an ADK turn: ``call_llm`` spans carrying the serialized LLM
+request (growing with the conversation, ``--large-share`` of them above the
+250 KB entry limit) and response, ``execute_tool`` spans with search results,
+and small agent spans.
+
+    uv run python -m tests.benchmarks.bench_span_serialization --spans 300
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import cast
+
+from google.cloud import logging as google_cloud_logging
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+
+from app.utils.tracing import CloudTraceLoggingSpanExporter
+from tests.benchmarks.common import print_table, summarize
+from tests.fakes.recorded_results import RECORDED_RESULTS
+from tests.fakes.telemetry_sinks import (
+    FakeLoggingClient,
+    FakeStorageClient,
+    FakeTraceClient,
+)
+
+
+def adk_spans(count: int, large_share: float, seed: int = 0) -> list[ReadableSpan]:
+    rng = random.Random(seed)
+    tracer = TracerProvider().get_tracer("gcp.vertex.agent")
+    results = json.dumps(RECORDED_RESULTS, default=str)
+    spans = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            history = rng.randint(5_000, 120_000)
+            if rng.random() < large_share:
+                history = rng.randint(260_000, 600_000)
+            attributes = {
+                "gen_ai.system": "gcp.vertex.agent",
+                "gen_ai.request.model": "gemini-2.5-flash",
+                "gcp.vertex.agent.invocation_id": f"e-{i}",
+                "gcp.vertex.agent.llm_request": json.dumps(
+                    {"contents": [{"role": "user", "text": "ä" * 64 + "x" * history}]}
+                ),
+                "gcp.vertex.agent.llm_response": json.dumps(
+                    {"content": {"parts": [{"text": "Check the brake pads. " * 80}]}}
+                ),
+            }
+            name = "call_llm"
+        elif kind == 1:
+            attributes = {
+                "gen_ai.operation.name": "execute_tool",
+                "gcp.vertex.agent.tool_call_args": '{"search_query": "brake pads"}',
+                "gcp.vertex.agent.tool_response": results,
+            }
+            name = "execute_tool search_all_sources"
+        else:
+            attributes = {"gen_ai.operation.name": "invoke_agent"}
+            name = "invoke_agent root_agent"
+        span = tracer.start_span(name, attributes=attributes)
+        span.end()
+        spans.append(cast(ReadableSpan, span))
+    return spans
+
+
+def round_trip_entry(
+    exporter: CloudTraceLoggingSpanExporter, span: ReadableSpan
+) -> dict:
+    """The exporter before this change, without the GCS upload."""
+    span_context = span.get_span_context()
+    assert span_context is not None
+    span_dict = json.loads(span.to_json())
+    span_dict["trace"] = (
+        f"projects/{exporter.project_id}/traces/{format(span_context.trace_id, 'x')}"
+    )
+    span_dict["span_id"] = format(span_context.span_id, "x")
+    attributes = span_dict["attributes"]
+    if len(json.dumps(attributes).encode()) > 255 * 1024:
+        attributes_payload = dict(attributes.items())
+        attributes_retain = dict(attributes.items())
+        json.dumps(attributes_payload)
+        attributes_retain["uri_payload"] = "gs://bucket/spans/id.json"
+        span_dict["attributes"] = attributes_retain
+    return span_dict
+
+
+def direct_entry(exporter: CloudTraceLoggingSpanExporter, span: ReadableSpan) -> dict:
+    span_dict, size = exporter._span_entry(span)
+    span_dict, _ = exporter._process_large_attributes(
+        span_dict, span_dict["span_id"], size
+    )
+    return span_dict
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spans", type=int, default=300)
+    parser.add_argument("--large-share", type=float, default=0.05)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    spans = adk_spans(args.spans, args.large_share)
+    exporter = CloudTraceLoggingSpanExporter(
+        project_id="bench-project",
+        client=FakeTraceClient(),
+        logging_client=cast(google_cloud_logging.Client, FakeLoggingClient()),
+        storage_client=FakeStorageClient(),
+    )
+    rows = {}
+    for name, entry in (
+        ("json round trip", round_trip_entry),
+        ("direct", direct_entry),
+    ):
+        latencies = []
+        for _ in range(args.rounds):
+            for span in spans:
+                start = time.perf_counter()
+                entry(exporter, span)
+                latencies.append(time.perf_counter() - start)
+        summary = summarize(latencies)
+        rows[name] = {
+            "spans": summary["calls"],
+            "mean_us": summary["mean_ms"] * 1000,
+            "p50_us": summary["p50_ms"] * 1000,
+            "p99_us": summary["p99_ms"] * 1000,
+        }
+    exporter.shutdown()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Decoding cost of search results: ``struct_data_to_dict`` on the proto-plus
+``response.document.struct_data`` versus the projected, lazy decoder, alone and
+followed by the data store's formatter.
+
+    uv run python -m tests.benchmarks.bench_struct_decoding [--iterations 2000]
+"""
+
+import argparse
+
+from google.cloud import discoveryengine_v1 as discoveryengine
+from google.protobuf import struct_pb2
+from google.protobuf.json_format import MessageToDict
+from proto.marshal.collections.maps import MapComposite
+
+from app.tools.search import DATA_STORES
+from app.tools.struct_decoding import decode_struct_data, result_struct_data
+from tests.benchmarks.common import print_table, summarize, time_calls
+from tests.fakes.recorded_results import RECORDED_RESULTS
+
+
+def struct_data_to_dict(struct_data: struct_pb2.Struct | MapComposite) -> dict:
+    """The full decode search results had before the lazy decoder."""
+    if isinstance(struct_data, MapComposite):
+        return dict(struct_data)
+    if isinstance(struct_data, struct_pb2.Struct):
+        return MessageToDict(struct_data)
+    raise ValueError(f"Unsupported type: {type(struct_data)}")
+
+
+def search_results(documents: list[dict]) -> list:
+    """Results as the client returns them, parsed from the wire format."""
+    response = discoveryengine.SearchResponse(
+        results=[
+            discoveryengine.SearchResponse.SearchResult(
+                id=str(i), document=discoveryengine.Document(id=str(i), struct_data=d)
+            )
+            for i, d in enumerate(documents)
+        ]
+    )
+    wire = discoveryengine.SearchResponse.serialize(response)
+    return list(discoveryengine.SearchResponse.deserialize(wire).results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--results-per-call", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = {}
+    for data_store in DATA_STORES:
+        results = search_results(
+            RECORDED_RESULTS[data_store.key][: args.results_per_call]
+        )
+        formatter = data_store.formatter
+
+        def legacy_decode(results: list = results) -> list:
+            return [
+                struct_data_to_dict(r.document.struct_data)
+                for r in results
+                if r.document.struct_data
+            ]
+
+        def fast_decode(
+            results: list = results, fields: tuple[str, ...] = formatter.fields
+        ) -> list:
+            return [
+                decode_struct_data(s, fields)
+                for s in map(result_struct_data, results)
+                if s is not None
+            ]
+
+        for name, decode in (("legacy", legacy_decode), ("fast", fast_decode)):
+            decode_only = summarize(time_calls(decode, args.iterations))
+            with_format = summarize(
+                time_calls(
+                    lambda d=decode, f=formatter: f.format_results(d()),
+                    args.iterations,
+                )
+            )
+            rows[f"{data_store.key} {name}"] = {
+                "decode_p50_ms": decode_only["p50_ms"],
+                "decode_p99_ms": decode_only["p99_ms"],
+                "+format_p50_ms": with_format["p50_ms"],
+                "+format_p99_ms": with_format["p99_ms"],
+            }
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
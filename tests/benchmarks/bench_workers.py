@@ -0,0 +1,194 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Throughput and latency of one Agent Engine replica by worker processes
+(NUM_WORKERS) and concurrent queries per worker (AGENT_MAX_CONCURRENT_QUERIES),
+against local stand-ins: a scripted model taking ``--llm-ms`` per call and the
+Discovery Engine stand-in taking ``--search-ms`` per search.
+
+Every worker is a fresh interpreter with a set-up ``AgentEngineApp`` (stand-in
+Cloud Logging, trace and storage clients) serving its share of ``--queries``
+through ``stream_query`` from as many threads as its concurrency. Start-up is
+not measured; the clock starts once every worker is ready.
+
+    uv run python -m tests.benchmarks.bench_workers --workers 1,2,4 --concurrency 1,8
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import time
+from concurrent import futures
+from typing import Any, cast
+from unittest import mock
+
+from tests.benchmarks.common import print_table, summarize
+
+STAND_IN_PROJECT = "bench-workers-local"
+QUERY = "Brake squeals after bleeding Shimano MT200"
+
+
+def stand_in_channel(address: str, factory: Any, *args: Any, **kwargs: Any) -> Any:
+    _, options, compression = args
+    return factory(address, options=options, compression=compression)
+
+
+def serve(
+    address: str,
+    queries: int,
+    concurrency: int,
+    llm_seconds: float,
+    ready: Any,
+    start: Any,
+    results: Any,
+) -> None:
+    """One worker: set up the app, wait for the start, serve ``queries``."""
+    os.environ["GOOGLE_CLOUD_PROJECT"] = STAND_IN_PROJECT
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/nonexistent/credentials.json"
+    os.environ["AGENT_MAX_CONCURRENT_QUERIES"] = str(concurrency)
+
+    import google.auth
+    import grpc
+    from google.auth.credentials import AnonymousCredentials
+
+    # Cloud clients find stand-in credentials instead of ADC
+    google.auth.default = lambda *args, **kwargs: (
+        AnonymousCredentials(),
+        STAND_IN_PROJECT,
+    )
+
+    import vertexai
+    from google.cloud import logging as google_cloud_logging
+
+    from app import agent_engine_app
+    from app.agent import root_agent
+    from app.tools.client_pool import configure_search_client_pool
+    from app.utils.tracing import CloudTraceLoggingSpanExporter
+    from tests.fakes.llm import ScriptedLlm
+    from tests.fakes.telemetry_sinks import (
+        FakeLoggingClient,
+        FakeStorageClient,
+        FakeTraceClient,
+    )
+
+    configure_search_client_pool(
+        channel_factory=functools.partial(
+            stand_in_channel, address, grpc.insecure_channel
+        ),
+        async_channel_factory=functools.partial(
+            stand_in_channel, address, grpc.aio.insecure_channel
+        ),
+    )
+    root_agent.model = ScriptedLlm(delay=llm_seconds)
+    vertexai.init(
+        project=STAND_IN_PROJECT,
+        location="europe-west1",
+        credentials=AnonymousCredentials(),
+    )
+    exporter = functools.partial(
+        CloudTraceLoggingSpanExporter,
+        client=FakeTraceClient(),
+        logging_client=cast(google_cloud_logging.Client, FakeLoggingClient()),
+        storage_client=FakeStorageClient(),
+    )
+    with (
+        mock.patch.object(google_cloud_logging, "Client", FakeLoggingClient),
+        mock.patch.object(agent_engine_app, "CloudTraceLoggingSpanExporter", exporter),
+    ):
+        app = agent_engine_app.AgentEngineApp(agent=root_agent)
+        app.set_up()
+
+    def query(i: int) -> float:
+        query_start = time.perf_counter()
+        for _ in app.stream_query(message=f"{QUERY} #{i}", user_id=f"bench-{i}"):
+            pass
+        return time.perf_counter() - query_start
+
+    ready.put(os.getpid())
+    start.wait()
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(query, range(queries)))
+    results.put(latencies)
+
+
+def run(
+    address: str, workers: int, concurrency: int, queries: int, llm_seconds: float
+) -> dict[str, float]:
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Queue(), context.Queue()
+    start = context.Event()
+    # Spread the queries over the workers like the runtime's load balancing
+    shares = [queries // workers + (i < queries % workers) for i in range(workers)]
+    processes = [
+        context.Process(
+            target=serve,
+            args=(address, share, concurrency, llm_seconds, ready, start, results),
+        )
+        for share in shares
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=300)
+
+    started = time.perf_counter()
+    start.set()
+    latencies = [latency for _ in processes for latency in results.get(timeout=600)]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join(timeout=60)
+
+    summary = summarize(latencies)
+    return {
+        "queries": len(latencies),
+        "queries_per_s": len(latencies) / elapsed,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4", help="Worker counts to sweep")
+    parser.add_argument(
+        "--concurrency", default="1,8", help="Concurrent queries per worker to sweep"
+    )
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--search-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    from tests.fakes.discovery_engine import FakeSearchService
+    from tests.fakes.recorded_results import recorded_documents
+
+    rows = {}
+    with FakeSearchService(
+        documents=recorded_documents, delay=args.search_ms / 1000, max_workers=256
+    ) as service:
+        for workers in (int(w) for w in args.workers.split(",")):
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                rows[f"workers={workers} concurrency={concurrency}"] = run(
+                    service.address,
+                    workers,
+                    concurrency,
+                    args.queries,
+                    args.llm_ms / 1000,
+                )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
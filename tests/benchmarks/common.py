@@ -0,0 +1,63 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helpers shared by the benchmark scripts."""
+
+import statistics
+import time
+from collections.abc import Callable, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_s: Sequence[float]) -> dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "calls": len(latencies_s),
+        "mean_ms": statistics.fmean(latencies_s) * 1000,
+        "p50_ms": percentile(latencies_s, 50) * 1000,
+        "p95_ms": percentile(latencies_s, 95) * 1000,
+        "p99_ms": percentile(latencies_s, 99) * 1000,
+    }
+
+
+def time_calls(fn: Callable[[], object], iterations: int) -> list[float]:
+    """Run ``fn`` ``iterations`` times and return the duration of each call."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def print_table(rows: dict[str, dict[str, float]]) -> None:
+    """Print one row per scenario with the columns of the first summary."""
+    columns = list(next(iter(rows.values())))
+    widths = [max(12, len(c) + 2) for c in columns]
+    width = max(len(name) for name in rows) + 2
+    print(
+        "".ljust(width)
+        + "".join(f"{c:>{w}}" for c, w in zip(columns, widths, strict=True))
+    )
+    for name, summary in rows.items():
+        cells = "".join(
+            f"{v:>{w}.3f}" if isinstance(v, float) else f"{v:>{w}}"
+            for v, w in zip(summary.values(), widths, strict=True)
+        )
+        print(name.ljust(width) + cells)
@@ -0,0 +1,176 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Local stand-in for the Discovery Engine SearchService.
+
+Serves the real ``google.cloud.discoveryengine.v1.SearchService/Search`` RPC on
+an insecure localhost port so the production client code can be exercised in
+tests and benchmarks without network access or credentials. Hits are served
+``page_size`` at a time with a ``next_page_token`` while more remain, like the
+real service, so a client reading past the first page sends another RPC.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from concurrent import futures
+from typing import Any
+
+import grpc
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+DocumentFactory = Callable[[discoveryengine.SearchRequest], list[dict[str, Any]]]
+ErrorFactory = Callable[[discoveryengine.SearchRequest], grpc.StatusCode | None]
+
+
+def default_documents(request: discoveryengine.SearchRequest) -> list[dict[str, Any]]:
+    """Deterministic synthetic documents derived from the query, three pages."""
+    return [
+        {
+            "title": f"{request.query} ({i})",
+            "link": f"https://docs.example.com/{i}",
+            "content": f"Result {i} for {request.query}. " * 20,
+        }
+        for i in range(3 * (request.page_size or 10))
+    ]
+
+
+def _derived_struct_data(
+    request: discoveryengine.SearchRequest, data: dict[str, Any]
+) -> dict[str, Any]:
+    """Snippets and extractive segments like unstructured data stores return."""
+    spec = request.content_search_spec
+    text = " ".join(str(v) for v in data.values() if isinstance(v, str))
+    derived: dict[str, Any] = {}
+    if spec.snippet_spec.return_snippet:
+        derived["snippets"] = [
+            {"snippet": text[:300], "snippet_status": "SUCCESS"}
+        ] * max(1, spec.snippet_spec.max_snippet_count)
+    if spec.extractive_content_spec.max_extractive_segment_count:
+        derived["extractive_segments"] = [
+            {"content": text[:1000], "pageNumber": "1"}
+        ] * spec.extractive_content_spec.max_extractive_segment_count
+    return derived
+
+
+class FakeSearchService:
+    """
+    In-process gRPC server answering Search requests.
+
+    :param documents: Builds the ``struct_data`` of every hit of a request,
+        served one page at a time
+    :param delay: Seconds to sleep per request, or a callable returning them
+    :param errors: Status code to fail a request with, or None to answer it
+    """
+
+    def __init__(
+        self,
+        documents: DocumentFactory = default_documents,
+        delay: float | Callable[[discoveryengine.SearchRequest], float] = 0.0,
+        max_workers: int = 32,
+        errors: ErrorFactory | None = None,
+    ) -> None:
+        self.documents = documents
+        self.delay = delay
+        self.errors = errors
+        self.requests: list[discoveryengine.SearchRequest] = []
+        self._lock = threading.Lock()
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+        self._server.add_generic_rpc_handlers(
+            (
+                grpc.method_handlers_generic_handler(
+                    "google.cloud.discoveryengine.v1.SearchService",
+                    {
+                        "Search": grpc.unary_unary_rpc_method_handler(
+                            self._search,
+                            request_deserializer=discoveryengine.SearchRequest.deserialize,
+                            response_serializer=discoveryengine.SearchResponse.serialize,
+                        )
+                    },
+                ),
+            )
+        )
+        self.port = self._server.add_insecure_port("127.0.0.1:0")
+        self.address = f"127.0.0.1:{self.port}"
+
+    @property
+    def request_count(self) -> int:
+        with self._lock:
+            return len(self.requests)
+
+    def _search(
+        self, request: discoveryengine.SearchRequest, context: grpc.ServicerContext
+    ) -> discoveryengine.SearchResponse:
+        with self._lock:
+            self.requests.append(request)
+        delay = self.delay(request) if callable(self.delay) else self.delay
+        if delay:
+            time.sleep(delay)
+        code = self.errors(request) if self.errors else None
+        if code is not None:
+            context.abort(code, f"Injected {code.name}")
+        hits = self.documents(request)
+        page_size = request.page_size or 10
+        offset = int(request.page_token or 0)
+        end = offset + page_size
+        return discoveryengine.SearchResponse(
+            results=[
+                discoveryengine.SearchResponse.SearchResult(
+                    id=str(i),
+                    document=discoveryengine.Document(
+                        id=str(i),
+                        struct_data=data,
+                        derived_struct_data=_derived_struct_data(request, data),
+                    ),
+                )
+                for i, data in enumerate(hits[offset:end], offset)
+            ],
+            total_size=len(hits),
+            next_page_token=str(end) if end < len(hits) else "",
+        )
+
+    def channel_factory(
+        self,
+        api_endpoint: str,
+        options: list[tuple[str, Any]],
+        compression: grpc.Compression | None,
+    ) -> grpc.Channel:
+        """Channel factory for SearchClientPool that ignores the real endpoint."""
+        return grpc.insecure_channel(
+            self.address, options=options, compression=compression
+        )
+
+    def async_channel_factory(
+        self,
+        api_endpoint: str,
+        options: list[tuple[str, Any]],
+        compression: grpc.Compression | None,
+    ) -> grpc.aio.Channel:
+        """Async channel factory for SearchClientPool that ignores the endpoint."""
+        return grpc.aio.insecure_channel(
+            self.address, options=options, compression=compression
+        )
+
+    def start(self) -> "FakeSearchService":
+        self._server.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.stop(grace=None)
+
+    def __enter__(self) -> "FakeSearchService":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
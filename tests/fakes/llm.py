@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Scripted stand-in for the Gemini model.
+
+Plays one tool-using turn the way the agent usually does: the first model call
+asks for ``search_all_sources`` with the user's message as query, the second
+answers in text once the tool response is in the request. Lets the agent run
+end to end through ADK without network access or credentials.
+
+Responses carry usage metadata counting four characters per token.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+class ScriptedLlm(BaseLlm):
+    model: str = "scripted-llm"
+    tool: str = "search_all_sources"
+    # Seconds per model call, to mimic time to first token
+    delay: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        last = llm_request.contents[-1] if llm_request.contents else None
+        tool_response = next(
+            (
+                part.function_response
+                for part in (last.parts if last and last.parts else [])
+                if part.function_response
+            ),
+            None,
+        )
+        if tool_response is None:
+            query = "".join(
+                part.text or "" for part in (last.parts if last and last.parts else [])
+            )
+            part = types.Part(
+                function_call=types.FunctionCall(
+                    name=self.tool, args={"search_query": query}
+                )
+            )
+        else:
+            result = str(tool_response.response)
+            part = types.Part(text=f"Based on the search results: {result[:200]}")
+        config = llm_request.config
+        system_instruction = config.system_instruction if config else None
+        prompt_chars = len(str(system_instruction or "")) + sum(
+            len(str(content.model_dump(exclude_none=True)))
+            for content in llm_request.contents
+        )
+        output_chars = len(str(part.model_dump(exclude_none=True)))
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4,
+                candidates_token_count=output_chars // 4,
+                total_token_count=(prompt_chars + output_chars) // 4,
+            ),
+        )
@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Anonymized ``struct_data`` of Discovery Engine results as they come back from
+each data store, including the 768-dimensional embedding column the ingestion
+pipeline adds. Used by the formatter and decoder benchmarks and tests.
+"""
+
+import random
+from typing import Any
+
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+_STEPS = (
+    "1. Remove the wheel and brake pads.\n"
+    "2. Fit the bleed block and attach the syringe with mineral oil.\n"
+    "3. Push oil up from the caliper until no air bubbles appear in the funnel.\n"
+    "4. Close the bleed port, clean the caliper and refit the pads.\n"
+)
+
+
+def _embedding(seed: int) -> list[float]:
+    rng = random.Random(seed)
+    return [round(rng.uniform(-0.1, 0.1), 6) for _ in range(768)]
+
+
+def _technical_docs(i: int) -> dict[str, Any]:
+    return {
+        "id": f"shimano-mt200-{i}",
+        "title": f"Shimano BR-MT200 dealer manual, section {i}",
+        "link": f"https://drive.google.com/file/d/mt200-{i}",
+        "content": (
+            f"Section {i}. Bleeding procedure for hydraulic disc brakes.\n\n"
+            + _STEPS * 3
+        ),
+        "brand": "Shimano",
+        "models": ["BR-MT200", "BL-MT200", "BR-MT201"],
+        "language": "en",
+        "page_count": 42.0,
+        "source_uri": f"gs://yeply-docs/shimano/mt200-{i}.pdf",
+        "ingested_at": "2025-06-30T12:00:00Z",
+        "embedding": _embedding(i),
+    }
+
+
+def _bike_histories(i: int) -> dict[str, Any]:
+    return {
+        "id": f"wo-2025-{1000 + i}",
+        "frame_number": f"WBK{123456 + i}",
+        "customer_bike_id": f"CB-{9000 + i}",
+        "work_order_number": f"WO-2025-{1000 + i}",
+        "date": f"2025-05-{10 + i:02d}",
+        "work_description": (
+            "Replaced front brake pads, bled front brake, adjusted rear "
+            "derailleur and checked chain wear (0.5%). " * 2
+        ),
+        "damage_report": "Customer reports squeaking front brake.",
+        "customer": {"name": "Fleet customer", "segment": "B2B", "city": "Utrecht"},
+        "mechanic": {"id": f"M-{i}", "van": "VAN-07"},
+        "parts": [
+            {"sku": "Y8NA98010", "name": "Resin pads B01S", "quantity": 1.0},
+            {"sku": "SM-MT200-OIL", "name": "Mineral oil 50ml", "quantity": 1.0},
+        ],
+        "status": "completed",
+        "embedding": _embedding(100 + i),
+    }
+
+
+def _slack_messages(i: int) -> dict[str, Any]:
+    return {
+        "id": f"slack-{i}",
+        "channel": "#tech-benelux",
+        "date": f"2025-04-{1 + i:02d}",
+        "text": (
+            "Anyone seen E-10 on a Bosch Performance Line? Turned out to be a "
+            "loose speed sensor magnet, re-seat it and clear with the diagnostic "
+            "tool. " * 2
+        ),
+        "link": f"https://yeply.slack.com/archives/C123/p{1700000000 + i}",
+        "user_id": f"U{i:08d}",
+        "reactions": [{"name": "+1", "count": 3.0}],
+        "thread_ts": f"{1700000000 + i}.000100",
+        "embedding": _embedding(200 + i),
+    }
+
+
+def _yeplypedia(i: int) -> dict[str, Any]:
+    return {
+        "id": f"wiki-{i}",
+        "title": f"Sickness reporting SOP (rev {i})",
+        "link": f"https://yeply.atlassian.net/wiki/spaces/OPS/pages/{5000 + i}",
+        "body": (
+            "Report sickness to your team lead before 07:00 via phone, then log "
+            "it in the Ops tool under Absences. " * 6
+        ),
+        "space": "OPS",
+        "labels": ["hr", "sop", "benelux"],
+        "last_editor": "ops-team",
+        "version": float(i + 1),
+        "embedding": _embedding(300 + i),
+    }
+
+
+def _erp_software_system(i: int) -> dict[str, Any]:
+    return {
+        "id": f"erp-{i}",
+        "title": "Create a work order in Vantool",
+        "link": f"https://docs.yeply.internal/vantool/work-orders/{i}",
+        "content": (
+            "Open the stop, select the bike, tap 'New work order', add the "
+            "services and parts, then let the customer sign. " * 5
+        ),
+        "application": "Vantool",
+        "audience": ["mechanic"],
+        "updated_at": "2025-06-01",
+        "embedding": _embedding(400 + i),
+    }
+
+
+RECORDED_RESULTS: dict[str, list[dict[str, Any]]] = {
+    "technical-docs": [_technical_docs(i) for i in range(8)],
+    "bike-histories": [_bike_histories(i) for i in range(8)],
+    "slack-messages": [_slack_messages(i) for i in range(8)],
+    "yeplypedia": [_yeplypedia(i) for i in range(8)],
+    "erp-software-system": [_erp_software_system(i) for i in range(8)],
+}
+
+
+def recorded_documents(request: discoveryengine.SearchRequest) -> list[dict[str, Any]]:
+    """FakeSearchService document factory answering from RECORDED_RESULTS."""
+    data_store = request.data_store_specs[0].data_store.rsplit("/", 1)[-1]
+    return RECORDED_RESULTS[data_store.rsplit("_", 1)[0]]
@@ -0,0 +1,66 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Deterministic, offline stand-in for the Vertex AI ranking API.
+
+Scores each document by the share of query words it contains, with ties kept
+in input order, and answers in the shape ``VertexAIRank`` does: the ``top_n``
+best documents, carrying their ``id`` and a ``relevance_score``.
+"""
+
+import re
+import time
+from collections.abc import Sequence
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"\w+", text.casefold()))
+
+
+class OverlapReranker(BaseDocumentCompressor):
+    top_n: int = 5
+    # Seconds per call, to mimic the ranking API round trip
+    delay: float = 0.0
+    calls: int = 0
+    last_batch_size: int = 0
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Callbacks | None = None,
+    ) -> Sequence[Document]:
+        if self.delay:
+            time.sleep(self.delay)
+        self.calls += 1
+        self.last_batch_size = len(documents)
+        query_words = _words(query)
+        scored = [
+            (len(query_words & _words(d.page_content)) / max(1, len(query_words)), i)
+            for i, d in enumerate(documents)
+        ]
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [
+            Document(
+                page_content=documents[i].page_content,
+                metadata={
+                    "id": documents[i].metadata.get("id", str(i)),
+                    "relevance_score": score,
+                },
+            )
+            for score, i in scored[: self.top_n]
+        ]
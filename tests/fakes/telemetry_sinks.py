@@ -0,0 +1,139 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Local stand-ins for the Cloud Logging, Cloud Trace and Cloud Storage clients
+used by ``CloudTraceLoggingSpanExporter``.
+
+Each RPC sleeps ``rpc_latency`` seconds, plus ``per_entry_latency`` per log
+entry it carries, and records what it was sent, so span export can be tested
+and benchmarked without network access or credentials.
+"""
+
+import threading
+import time
+from typing import Any
+
+
+class _Recorder:
+    def __init__(self, rpc_latency: float = 0.0) -> None:
+        self.rpc_latency = rpc_latency
+        self.rpcs = 0
+        self._lock = threading.Lock()
+
+    def _rpc(self, extra_latency: float = 0.0) -> None:
+        if self.rpc_latency or extra_latency:
+            time.sleep(self.rpc_latency + extra_latency)
+        with self._lock:
+            self.rpcs += 1
+
+
+class FakeLogBatch:
+    def __init__(self, logger: "FakeLogger") -> None:
+        self.logger = logger
+        self.entries: list[dict[str, Any]] = []
+
+    def log_struct(self, info: dict[str, Any], **kwargs: Any) -> None:
+        self.entries.append({"json_payload": info, **kwargs})
+
+    def commit(self, **kwargs: Any) -> None:
+        self.logger._write(self.entries)
+
+
+class FakeLogger(_Recorder):
+    """Cloud Logging logger keeping every written entry in ``entries``."""
+
+    def __init__(
+        self, rpc_latency: float = 0.0, per_entry_latency: float = 0.0
+    ) -> None:
+        super().__init__(rpc_latency)
+        self.per_entry_latency = per_entry_latency
+        self.entries: list[dict[str, Any]] = []
+
+    def log_struct(self, info: dict[str, Any], **kwargs: Any) -> None:
+        self._write([{"json_payload": info, **kwargs}])
+
+    def batch(self, **kwargs: Any) -> FakeLogBatch:
+        return FakeLogBatch(self)
+
+    def _write(self, entries: list[dict[str, Any]]) -> None:
+        self._rpc(self.per_entry_latency * len(entries))
+        with self._lock:
+            self.entries.extend(entries)
+
+
+class FakeLoggingClient:
+    def __init__(
+        self, rpc_latency: float = 0.0, per_entry_latency: float = 0.0
+    ) -> None:
+        self._logger = FakeLogger(rpc_latency, per_entry_latency)
+
+    def logger(self, name: str) -> FakeLogger:
+        return self._logger
+
+
+class FakeTraceClient(_Recorder):
+    """TraceServiceClient counting the spans of ``batch_write_spans``."""
+
+    def __init__(self, rpc_latency: float = 0.0) -> None:
+        super().__init__(rpc_latency)
+        self.spans = 0
+
+    def batch_write_spans(self, request: Any, **kwargs: Any) -> None:
+        self._rpc()
+        with self._lock:
+            self.spans += len(request.spans)
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str) -> None:
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding: str | None = None
+
+    def upload_from_string(self, data: str | bytes, *args: Any, **kwargs: Any) -> None:
+        self.bucket.storage._rpc()
+        with self.bucket.storage._lock:
+            self.bucket.storage.uploads[f"{self.bucket.name}/{self.name}"] = data
+            self.bucket.storage.encodings[f"{self.bucket.name}/{self.name}"] = (
+                self.content_encoding
+            )
+
+
+class FakeBucket:
+    def __init__(self, storage: "FakeStorageClient", name: str) -> None:
+        self.storage = storage
+        self.name = name
+
+    def exists(self, *args: Any, **kwargs: Any) -> bool:
+        self.storage._rpc()
+        with self.storage._lock:
+            self.storage.exists_calls += 1
+        return self.storage.bucket_exists
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+class FakeStorageClient(_Recorder):
+    """Cloud Storage client keeping uploads by ``bucket/blob`` in ``uploads``."""
+
+    def __init__(self, rpc_latency: float = 0.0, bucket_exists: bool = True) -> None:
+        super().__init__(rpc_latency)
+        self.bucket_exists = bucket_exists
+        self.exists_calls = 0
+        self.uploads: dict[str, str | bytes] = {}
+        self.encodings: dict[str, str | None] = {}
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self, name)
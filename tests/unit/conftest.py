@@ -0,0 +1,48 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+
+import pytest
+
+from app.tools.cache import set_search_cache
+from app.tools.hedging import set_hedger
+from app.tools.identifier_index import reset_identifier_indexes
+from app.tools.lexical_index import reset_lexical_indexes
+from app.tools.rate_limit import set_search_guard
+from app.tools.rerank import set_search_reranker
+from app.tools.semantic_cache import set_semantic_cache
+from app.tools.single_flight import set_single_flight
+
+
+@pytest.fixture(autouse=True)
+def isolate_search_state() -> Iterator[None]:
+    """Run every test without the process-wide search caches unless it sets them."""
+    set_search_cache(None)
+    set_semantic_cache(None)
+    set_search_reranker(None)
+    set_hedger(None)
+    set_search_guard(None)
+    set_single_flight(None)
+    reset_lexical_indexes()
+    reset_identifier_indexes()
+    yield
+    set_search_cache(None)
+    set_semantic_cache(None)
+    set_search_reranker(None)
+    set_hedger(None)
+    set_search_guard(None)
+    set_single_flight(None)
+    reset_lexical_indexes()
+    reset_identifier_indexes()
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+from typing import Any
+
+import grpc
+import pytest
+
+from app.tools import search
+from app.tools.client_pool import (
+    ChannelOptions,
+    SearchClientPool,
+    configure_search_client_pool,
+    get_search_client_pool,
+    shutdown_search_client_pool,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+
+
+@pytest.fixture
+def fake_service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(channel_factory=service.channel_factory)
+        yield service
+    shutdown_search_client_pool()
+
+
+def test_search_engine_reuses_pooled_channel(fake_service: FakeSearchService) -> None:
+    """Repeated tool calls share one channel to the endpoint."""
+    for _ in range(3):
+        output = search.search_technical_docs("brake bleed Shimano MT200")
+        assert "## Result 5" in output
+        assert "## Result 6" not in output
+
+    assert fake_service.request_count == 3
+    request = fake_service.requests[0]
+    assert request.serving_config == search.SERVING_CONFIG
+    assert request.data_store_specs[0].data_store == search.data_store_path(
+        search.DATA_STORES[0].id
+    )
+    assert get_search_client_pool().channel_count(search.API_ENDPOINT) == 1
+
+
+def test_pool_opens_channels_only_when_saturated() -> None:
+    created: list[str] = []
+
+    def channel_factory(
+        endpoint: str,
+        options: list[tuple[str, Any]],
+        compression: grpc.Compression | None,
+    ) -> grpc.Channel:
+        created.append(endpoint)
+        return grpc.insecure_channel("127.0.0.1:1", options=options)
+
+    pool = SearchClientPool(
+        channel_options=ChannelOptions(
+            max_concurrent_streams=2, max_channels_per_endpoint=2
+        ),
+        channel_factory=channel_factory,
+    )
+    with pool.client("a"), pool.client("a"):
+        assert pool.channel_count("a") == 1
+        with pool.client("a"), pool.client("a"), pool.client("a"):
+            # Capped at two channels even though both are saturated
+            assert pool.channel_count("a") == 2
+    with pool.client("b"):
+        pass
+    assert created == ["a", "a", "b"]
+
+    pool.close()
+    assert pool.channel_count() == 0
+    with pytest.raises(RuntimeError), pool.client("a"):
+        pass
+
+
+def test_channel_options_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SEARCH_GRPC_KEEPALIVE_TIME_MS", "5000")
+    monkeypatch.setenv("SEARCH_GRPC_COMPRESSION", "gzip")
+    options = ChannelOptions.from_env()
+    assert options.compression == grpc.Compression.Gzip
+    assert ("grpc.keepalive_time_ms", 5000) in options.grpc_options()
+
+    monkeypatch.setenv("SEARCH_GRPC_COMPRESSION", "brotli")
+    with pytest.raises(ValueError):
+        ChannelOptions.from_env()
@@ -0,0 +1,142 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+from concurrent import futures
+
+import pytest
+
+from app.utils.concurrency import QueryLimiter, WorkerConcurrency
+
+
+def test_threads_beyond_the_limit_wait_for_a_slot() -> None:
+    limiter = QueryLimiter(limit=2)
+
+    def query() -> None:
+        with limiter.slot():
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=query) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics = limiter.metrics()
+    assert metrics["admitted"] == 6
+    assert metrics["max_in_flight"] == 2
+    assert metrics["waited"] >= 4
+    assert metrics["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_async_waiter_does_not_leak_its_slot() -> None:
+    limiter = QueryLimiter(limit=1)
+    release = asyncio.Event()
+
+    async def query() -> None:
+        async with limiter.aslot():
+            await release.wait()
+
+    holder = asyncio.create_task(query())
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(query())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    release.set()
+    await holder
+
+    # The only slot is free again, for threads and tasks alike
+    await asyncio.wait_for(query(), timeout=2)
+    with limiter.slot():
+        pass
+    assert limiter.metrics()["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_waiting_tasks_leave_the_default_executor_to_admitted_ones() -> None:
+    loop = asyncio.get_running_loop()
+    executor = futures.ThreadPoolExecutor(max_workers=2)
+    loop.set_default_executor(executor)
+    limiter = QueryLimiter(limit=1)
+
+    async def query() -> None:
+        async with limiter.aslot():
+            # Like reranking or a Redis cache lookup of an admitted query
+            await asyncio.to_thread(time.sleep, 0.01)
+
+    # More waiters than executor threads
+    await asyncio.wait_for(asyncio.gather(*(query() for _ in range(8))), timeout=5)
+
+    metrics = limiter.metrics()
+    assert metrics["admitted"] == 8 and metrics["max_in_flight"] == 1
+    assert metrics["waited"] == 7
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_threads_and_tasks_hand_slots_to_each_other() -> None:
+    limiter = QueryLimiter(limit=1)
+    order: list[str] = []
+
+    def thread_query(i: int) -> None:
+        with limiter.slot():
+            order.append(f"thread {i}")
+            time.sleep(0.01)
+
+    async def task_query(i: int) -> None:
+        async with limiter.aslot():
+            order.append(f"task {i}")
+            await asyncio.sleep(0.01)
+
+    threads = [threading.Thread(target=thread_query, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    await asyncio.wait_for(
+        asyncio.gather(*(task_query(i) for i in range(3))), timeout=5
+    )
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(order) == 6
+    assert (
+        limiter.metrics()["in_flight"] == 0 and limiter.metrics()["max_in_flight"] == 1
+    )
+
+
+def test_unlimited_limiter_never_waits() -> None:
+    limiter = QueryLimiter()
+    with limiter.slot(), limiter.slot(), limiter.slot():
+        assert limiter.metrics()["in_flight"] == 3
+    assert limiter.metrics()["waited"] == 0
+
+
+def test_worker_layout_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("NUM_WORKERS", "4")
+    monkeypatch.setenv("AGENT_MAX_CONCURRENT_QUERIES", "16")
+
+    concurrency = WorkerConcurrency.from_env()
+
+    assert concurrency == WorkerConcurrency(num_workers=4, max_concurrent_queries=16)
+    assert concurrency.env_vars() == {
+        "NUM_WORKERS": "4",
+        "AGENT_MAX_CONCURRENT_QUERIES": "16",
+    }
+    monkeypatch.setenv("NUM_WORKERS", "0")
+    with pytest.raises(ValueError, match="NUM_WORKERS"):
+        WorkerConcurrency.from_env()
@@ -0,0 +1,54 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from app.tools.config import env_mapping, parse_mapping
+from app.tools.rate_limit import search_guard_from_env
+
+
+def test_mapping_ignores_whitespace_and_empty_items() -> None:
+    value = " bike-histories = 4 ,, slack-messages=2.5, "
+
+    assert parse_mapping("X", value, float) == {
+        "bike-histories": 4.0,
+        "slack-messages": 2.5,
+    }
+    assert parse_mapping("X", "", float) == {}
+
+
+@pytest.mark.parametrize("value", ["bike-histories", "=4", "bike-histories="])
+def test_items_without_key_or_value_are_rejected(value: str) -> None:
+    with pytest.raises(ValueError, match="SEARCH_DEADLINE_OVERRIDES: expected"):
+        parse_mapping("SEARCH_DEADLINE_OVERRIDES", value, float)
+
+
+def test_unconvertible_values_name_the_variable_and_key(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("SEARCH_CACHE_TTL_OVERRIDES", "bike-histories=soon")
+
+    with pytest.raises(
+        ValueError, match=r"SEARCH_CACHE_TTL_OVERRIDES.*'bike-histories'"
+    ):
+        env_mapping("SEARCH_CACHE_TTL_OVERRIDES", float)
+
+
+def test_rate_limits_take_an_optional_burst(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SEARCH_RATE_LIMITS", "default=10, bike-histories=5:8")
+
+    buckets = search_guard_from_env().buckets
+
+    assert (buckets["default"].rate, buckets["default"].burst) == (10, 10)
+    assert (buckets["bike-histories"].rate, buckets["bike-histories"].burst) == (5, 8)
@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.tools.formatting import ResultFormatter, estimate_tokens
+from app.tools.search import DATA_STORES
+from tests.fakes.recorded_results import RECORDED_RESULTS
+
+
+def test_projection_keeps_only_configured_fields_in_order() -> None:
+    formatter = ResultFormatter(fields=("title", "link", "body"))
+    document = RECORDED_RESULTS["yeplypedia"][0]
+
+    text = formatter.format_document(document)
+
+    lines = text.splitlines()
+    assert lines[0] == "title: Sickness reporting SOP (rev 0)"
+    assert lines[1].startswith("link: https://")
+    assert lines[2].startswith("body: Report sickness")
+    assert "embedding" not in text and "labels" not in text
+
+
+def test_unknown_schema_falls_back_to_all_fields_without_vectors() -> None:
+    formatter = ResultFormatter(fields=("does_not_exist",))
+    document = RECORDED_RESULTS["bike-histories"][0]
+
+    text = formatter.format_document(document)
+
+    assert "frame_number: WBK123456" in text
+    assert "parts: sku: Y8NA98010; name: Resin pads B01S; quantity: 1" in text
+    assert "embedding" not in text
+
+
+def test_budget_is_shared_across_results() -> None:
+    formatter = ResultFormatter(fields=("title", "link", "content"), max_tokens=300)
+    documents = RECORDED_RESULTS["technical-docs"][:5]
+
+    results = formatter.format_results(documents)
+
+    assert len(results) == 5
+    assert sum(estimate_tokens(r) for r in results) <= 300
+    for result in results:
+        # Short fields survive whole; the long body is cut at a word boundary
+        assert result.startswith("title: Shimano BR-MT200 dealer manual")
+        assert "\nlink: https://drive.google.com/" in result
+        assert result.endswith("…")
+
+
+def test_data_store_formatters_shrink_recorded_results() -> None:
+    for data_store in DATA_STORES:
+        document = RECORDED_RESULTS[data_store.key][0]
+        (formatted,) = data_store.formatter.format_results([document])
+        assert formatted
+        assert len(formatted) < len(str(document)) / 4
@@ -0,0 +1,159 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import dataclasses
+import itertools
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+from app.tools import search, search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.hedging import HedgeBudget, HedgePolicy, Hedger, set_hedger
+from app.tools.search_metrics import LatencyHistogram, get_latency_recorder
+from tests.fakes.discovery_engine import FakeSearchService
+
+DATA_STORE = search.DATA_STORES[1]
+
+
+class FirstRequestSlow:
+    """Delay of the stand-in: the first request stalls, later ones are fast."""
+
+    def __init__(self, slow: float = 1.0, fast: float = 0.01) -> None:
+        self.slow = slow
+        self.fast = fast
+        self._counter = itertools.count()
+
+    def __call__(self, request: discoveryengine.SearchRequest) -> float:
+        return self.slow if next(self._counter) == 0 else self.fast
+
+
+@pytest.fixture(autouse=True)
+def isolate_latencies() -> Iterator[None]:
+    get_latency_recorder().clear()
+    yield
+    get_latency_recorder().clear()
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService(delay=FirstRequestSlow()) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+def test_histogram_quantiles_are_bucket_bounds() -> None:
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000)
+
+    assert histogram.count == 100
+    p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+    assert p50 is not None and 0.05 <= p50 < 0.05 * 1.25
+    assert p95 is not None and 0.095 <= p95 < 0.095 * 1.25
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_deadline_bounds_a_stalled_search(service: FakeSearchService) -> None:
+    data_store = dataclasses.replace(
+        DATA_STORE,
+        profile=dataclasses.replace(DATA_STORE.profile, deadline_seconds=0.2),
+    )
+
+    start = time.perf_counter()
+    output = search.search_engine("WBK123456", data_store)
+
+    assert time.perf_counter() - start < 0.6
+    assert output == f"Search in '{DATA_STORE.name}' timed out. Please try again."
+    assert get_latency_recorder().metrics()[DATA_STORE.id]["deadline_exceeded"] == 1
+
+
+def test_deadline_overrides_take_precedence(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(search, "DEADLINE_OVERRIDES", {"bike-histories": 2.5})
+
+    assert search.deadline_for(DATA_STORE) == 2.5
+    assert search.deadline_for(search.DATA_STORES[0]) == 10.0
+
+
+def test_hedge_answers_when_the_first_request_stalls(
+    service: FakeSearchService,
+) -> None:
+    set_hedger(Hedger(HedgePolicy(initial_delay_seconds=0.1)))
+
+    start = time.perf_counter()
+    output = search.search_engine("WBK123456", DATA_STORE)
+
+    assert time.perf_counter() - start < 0.6
+    assert "## Result 1" in output
+    assert service.request_count == 2
+    metrics = get_latency_recorder().metrics()[DATA_STORE.id]
+    assert (metrics["calls"], metrics["hedges"], metrics["hedge_wins"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_async_hedge_answers_when_the_first_request_stalls(
+    service: FakeSearchService,
+) -> None:
+    set_hedger(Hedger(HedgePolicy(initial_delay_seconds=0.1)))
+
+    start = time.perf_counter()
+    output = await search_async.search_engine_async("WBK123456", DATA_STORE)
+
+    assert time.perf_counter() - start < 0.6
+    assert "## Result 1" in output
+    assert service.request_count == 2
+    assert get_latency_recorder().metrics()[DATA_STORE.id]["hedge_wins"] == 1
+
+
+def test_primary_attempt_does_not_queue_behind_busy_hedges() -> None:
+    hedger = Hedger(HedgePolicy(initial_delay_seconds=5.0), max_workers=1)
+    release = threading.Event()
+    hedger._executor.submit(release.wait)
+    threading.Timer(2.0, release.set).start()
+
+    start = time.perf_counter()
+    assert hedger.call(DATA_STORE.id, lambda: "answer") == "answer"
+    assert time.perf_counter() - start < 1.0
+    release.set()
+
+
+def test_hedge_delay_follows_observed_p95() -> None:
+    hedger = Hedger(HedgePolicy(min_samples=10, initial_delay_seconds=1.0))
+    assert hedger.delay_for(DATA_STORE.id) == 1.0
+
+    for _ in range(10):
+        get_latency_recorder().record_attempt(DATA_STORE.id, 0.2)
+    assert 0.2 <= hedger.delay_for(DATA_STORE.id) < 0.25
+
+
+def test_budget_caps_extra_load() -> None:
+    budget = HedgeBudget(max_extra_load=0.1, burst=1.0)
+
+    hedges = 0
+    for _ in range(100):
+        budget.on_call()
+        hedges += budget.try_spend()
+
+    # The burst plus one hedge per ten calls
+    assert hedges <= 11
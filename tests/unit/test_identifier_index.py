@@ -0,0 +1,180 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from app.tools import identifier_index, search
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.identifier_index import (
+    IdentifierIndex,
+    extract_identifiers,
+    get_identifier_index,
+    query_identifier_candidates,
+    set_identifier_index,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+
+HISTORIES = [
+    {
+        "frame_number": "WAV-12345",
+        "customer_bike_id": "CB-0042",
+        "work_order_number": "WO-2024/0815",
+        "date": "2024-08-15",
+        "work_description": "Replaced brake pads",
+    },
+    {
+        "frame_number": "WAV-12345",
+        "customer_bike_id": "CB-0042",
+        "work_order_number": "WO-2025/0102",
+        "date": "2025-01-02",
+        "work_description": "Bled rear brake",
+    },
+    {
+        "frame_number": "WAV-99999",
+        "customer_bike_id": "CB-0077",
+        "work_order_number": "WO-2025/0103",
+        "date": "2025-01-03",
+        "work_description": "New chain",
+    },
+    {"work_description": "General inspection checklist"},
+]
+
+
+@pytest.fixture
+def index() -> IdentifierIndex:
+    return IdentifierIndex.from_documents(HISTORIES)
+
+
+def test_query_candidates_are_normalized_tokens_and_pairs() -> None:
+    assert query_identifier_candidates("Frame WAV-12345, order WO 2024/0815") == [
+        "wav12345",
+        "20240815",
+        "framewav12345",
+        "wo20240815",
+    ]
+    # Short numbers and plain words are not identifiers
+    assert query_identifier_candidates("brakes after 2 days") == []
+
+
+def test_lookup_finds_chunks_of_any_spelling(index: IdentifierIndex) -> None:
+    hits = index.lookup("history of frame wav12345")
+
+    # Newest work order first
+    assert [h.document["work_order_number"] for h in hits] == [
+        "WO-2025/0102",
+        "WO-2024/0815",
+    ]
+    assert [h.document["date"] for h in index.lookup("WO 2024-0815")] == ["2024-08-15"]
+    assert index.lookup("brake pads") == []
+    assert index.lookup("frame WAV-00000") == []
+
+
+def test_lookup_ranks_chunks_matching_more_identifiers_first(
+    index: IdentifierIndex,
+) -> None:
+    hits = index.lookup("CB-0042 WO-2024/0815", k=1)
+
+    assert hits[0].document["date"] == "2024-08-15"
+    assert sorted(hits[0].identifiers) == ["cb0042", "wo20240815"]
+
+
+def test_index_is_loaded_from_environment(
+    index: IdentifierIndex, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index.save(tmp_path / "identifiers.json")
+    monkeypatch.setenv(
+        "SEARCH_IDENTIFIER_INDEX", f"bike-histories={tmp_path / 'identifiers.json'}"
+    )
+
+    loaded = get_identifier_index("bike-histories")
+    assert loaded is not None
+    assert len(loaded) == len(index) == 7
+    assert "cb-0077" in loaded
+    assert get_identifier_index("technical-docs") is None
+
+
+def test_identifiers_are_found_in_chunk_text() -> None:
+    chunk = {
+        "content": (
+            "Work order WO-2024/0815 for frame WAV-12345 (customer bike CB-0042) "
+            "on 2024-08-15: replaced SM-MT200 pads, chain wear 0.5%."
+        )
+    }
+
+    assert extract_identifiers(chunk) == {"wo20240815", "wav12345", "cb0042"}
+
+
+def test_pipeline_step_builds_index_from_export(tmp_path: Path) -> None:
+    chunks = [
+        {"id": "c1", "content": "Frame WAV-12345: bled rear brake (WO 2025-0102)"},
+        {"id": "c2", "content": "How to bleed hydraulic brakes"},
+    ]
+    (tmp_path / "export-000.jsonl").write_text(
+        "\n".join(
+            json.dumps(
+                {"id": c["id"], "json_data": json.dumps({**c, "embedding": [0.1]})}
+            )
+            for c in chunks
+        )
+    )
+    # The pipeline step runs the module on its own, outside the app package
+    subprocess.run(
+        [
+            sys.executable,
+            identifier_index.__file__,
+            str(tmp_path / "*.jsonl"),
+            str(tmp_path / "identifiers.json"),
+        ],
+        check=True,
+        cwd=tmp_path,
+    )
+
+    index = IdentifierIndex.load(tmp_path / "identifiers.json")
+    assert [h.document for h in index.lookup("WO-2025/0102")] == [
+        {"id": "c1", "content": chunks[0]["content"]}
+    ]
+    assert "wav12345" in index
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+def test_bike_histories_answers_identifier_queries_locally(
+    index: IdentifierIndex, service: FakeSearchService
+) -> None:
+    set_identifier_index(search.DATA_STORES[1].key, index)
+
+    local = search.search_bike_histories("What was done on WAV-99999?")
+    remote = search.search_bike_histories("recurring brake problems")
+
+    assert "work_description: New chain" in local
+    assert service.request_count == 1
+    assert "Result 0 for recurring brake problems" in remote
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Import-time budget for app.agent.
+
+Importing the agent must not resolve credentials or build Vertex AI clients,
+and its own import cost (on top of the ADK framework, which every agent pays)
+must stay within APP_IMPORT_BUDGET_SECONDS.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.agent import set_up_search_extensions
+from app.tools.rerank import get_search_reranker
+from app.tools.semantic_cache import get_semantic_cache
+
+IMPORT_BUDGET_SECONDS = float(os.environ.get("APP_IMPORT_BUDGET_SECONDS", "1.5"))
+
+_PROBE = """
+import json, sys, time
+import google.adk.agents
+before = set(sys.modules)
+start = time.perf_counter()
+import app.agent
+elapsed = time.perf_counter() - start
+from app.tools.rerank import get_search_reranker
+from app.tools.semantic_cache import get_semantic_cache
+lazy = ["vertexai", "langchain_google_vertexai", "langchain_google_community"]
+print(json.dumps({
+    "seconds": elapsed,
+    "loaded": [m for m in lazy if m in sys.modules and m not in before],
+    "installed": [get_semantic_cache() is not None, get_search_reranker() is not None],
+}))
+"""
+
+
+def _import_agent() -> dict:
+    env = {
+        **os.environ,
+        # Any credential lookup during import fails loudly
+        "GOOGLE_APPLICATION_CREDENTIALS": "/nonexistent/credentials.json",
+        "SEARCH_SEMANTIC_CACHE": "true",
+        "SEARCH_RERANK": "true",
+    }
+    env.pop("GOOGLE_CLOUD_PROJECT", None)
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_import_agent_is_lazy_and_within_budget() -> None:
+    result = _import_agent()
+
+    assert result["loaded"] == []
+    # Installed by set_up_search_extensions, not as a side effect of the import
+    assert result["installed"] == [False, False]
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS, (
+        f"import app.agent took {result['seconds']:.2f}s on top of ADK, "
+        f"budget is {IMPORT_BUDGET_SECONDS}s (APP_IMPORT_BUDGET_SECONDS)"
+    )
+
+
+def test_search_extensions_are_installed_from_env(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_up_search_extensions()
+    assert get_semantic_cache() is None and get_search_reranker() is None
+
+    monkeypatch.setenv("SEARCH_SEMANTIC_CACHE", "true")
+    monkeypatch.setenv("SEARCH_RERANK", "true")
+    set_up_search_extensions()
+
+    assert get_semantic_cache() is not None
+    assert get_search_reranker() is not None
@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import warnings
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from app.tools import search, search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.lexical_index import (
+    LexicalIndex,
+    get_lexical_index,
+    set_lexical_index,
+    tokenize,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+
+CHUNKS = [
+    ("c1", {"title": "Bottom brackets", "content": "Shimano SM-BB72 press fit tool"}),
+    ("c2", {"title": "Error codes", "content": "E-10 error Bosch Performance Line"}),
+    ("c3", {"title": "Error codes", "content": "E-12 error Bosch Performance Line"}),
+    ("c4", {"title": "Brakes", "content": "Bleeding brakes brakes brakes"}),
+    ("c5", {"title": "Brakes", "content": "Brake pads and brake rotors wear"}),
+]
+
+
+@pytest.fixture
+def index() -> LexicalIndex:
+    return LexicalIndex.from_documents(CHUNKS)
+
+
+def test_tokenize_keeps_identifiers_whole_and_in_parts() -> None:
+    assert sorted(tokenize("Shimano SM-BB72 E-10")) == sorted(
+        ["shimano", "sm-bb72", "sm", "bb72", "e-10", "e", "10"]
+    )
+
+
+def test_bm25_ranks_by_term_weight(index: LexicalIndex) -> None:
+    hits = index.search("bosch e-10 error", k=2)
+
+    assert [h.id for h in hits] == ["c2", "c3"]
+    assert hits[0].score > hits[1].score
+    assert hits[0].document["content"] == "E-10 error Bosch Performance Line"
+    assert index.search("derailleur") == []
+
+
+def test_confident_only_when_all_identifiers_match(index: LexicalIndex) -> None:
+    assert [h.id for h in index.confident_search("E-12 error")] == ["c3"]
+    assert [h.id for h in index.confident_search("sm-bb72 tool")] == ["c1"]
+    # No identifiers, or one nobody has: leave it to the semantic search
+    assert index.confident_search("bleeding brakes") == []
+    assert index.confident_search("E-10 SM-BB72") == []
+
+
+def test_numbers_and_common_identifiers_are_not_confident() -> None:
+    chunks = [
+        (f"c{i}", {"content": f"Shimano MT200 brake, serviced in 2024, {i} bar"})
+        for i in range(6)
+    ]
+    index = LexicalIndex.from_documents([*chunks, ("x", {"content": "SM-BB72 tool"})])
+
+    assert index.confident_search("brake 2024") == []
+    assert index.confident_search("2 bar") == []
+    # In most documents, so it does not single any out
+    assert index.confident_search("MT200 brake") == []
+    assert [h.id for h in index.confident_search("SM-BB72")] == ["x"]
+
+
+def test_index_of_empty_documents() -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        index = LexicalIndex.from_documents([("c1", {"content": ""})])
+
+    assert index.search("brakes") == []
+
+
+def test_from_jsonl_reads_pipeline_export_without_vectors(tmp_path: Path) -> None:
+    lines = [
+        {"id": doc_id, "json_data": json.dumps({**doc, "embedding": [0.1] * 8})}
+        for doc_id, doc in CHUNKS
+    ]
+    (tmp_path / "export-000.jsonl").write_text(
+        "\n".join(json.dumps(line) for line in lines)
+    )
+
+    index = LexicalIndex.from_jsonl(str(tmp_path / "*.jsonl"))
+
+    assert len(index) == 5
+    hit = index.confident_search("SM-BB72")[0]
+    assert hit.id == "c1"
+    assert "embedding" not in hit.document
+
+
+def test_index_is_loaded_from_environment(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "docs.jsonl").write_text(
+        "\n".join(json.dumps({"id": i, **d}) for i, d in CHUNKS)
+    )
+    monkeypatch.setenv(
+        "SEARCH_LEXICAL_INDEX", f"technical-docs={tmp_path / 'docs.jsonl'}"
+    )
+
+    index = get_lexical_index("technical-docs")
+    assert index is not None and len(index) == 5
+    assert get_lexical_index("slack-messages") is None
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+def test_search_engine_answers_identifier_queries_locally(
+    index: LexicalIndex, service: FakeSearchService
+) -> None:
+    data_store = search.DATA_STORES[0]
+    set_lexical_index(data_store.key, index)
+
+    local = search.search_engine("SM-BB72 press fit", data_store)
+    remote = search.search_engine("press fit tools", data_store)
+
+    assert "content: Shimano SM-BB72 press fit tool" in local
+    assert service.request_count == 1
+    assert "press fit tools (0)" in remote
+
+
+@pytest.mark.asyncio
+async def test_async_search_builds_index_from_environment(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, service: FakeSearchService
+) -> None:
+    (tmp_path / "docs.jsonl").write_text(
+        "\n".join(json.dumps({"id": i, **d}) for i, d in CHUNKS)
+    )
+    monkeypatch.setenv(
+        "SEARCH_LEXICAL_INDEX", f"technical-docs={tmp_path / 'docs.jsonl'}"
+    )
+
+    results = await search_async.fetch_search_results_async(
+        "E-12 error", search.DATA_STORES[0]
+    )
+
+    assert "E-12 error Bosch Performance Line" in results[0]
+    assert service.request_count == 0
@@ -0,0 +1,198 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import itertools
+import random
+from collections.abc import Iterator
+
+import grpc
+import pytest
+from google.api_core import exceptions
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+from app.tools import search, search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.rate_limit import (
+    CircuitBreaker,
+    RateLimited,
+    RetryPolicy,
+    SearchGuard,
+    TokenBucket,
+    set_search_guard,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+
+DATA_STORE = search.DATA_STORES[1]
+
+# Tests run the real backoff sleeps, so keep them short
+FAST_RETRY = RetryPolicy(base_delay_seconds=0.001, max_delay_seconds=0.01)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FailFirst:
+    """Errors of the stand-in: the first ``count`` requests fail with ``code``."""
+
+    def __init__(self, count: int, code: grpc.StatusCode) -> None:
+        self.count = count
+        self.code = code
+        self._counter = itertools.count()
+
+    def __call__(
+        self, request: discoveryengine.SearchRequest
+    ) -> grpc.StatusCode | None:
+        return self.code if next(self._counter) < self.count else None
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+def test_token_bucket_paces_beyond_the_burst() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.reserve(max_wait=0) == 0
+    # The third and fourth callers queue behind each other
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.1)
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.2)
+    assert bucket.reserve(max_wait=0.1) is None
+
+    clock.now = 1.0
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.metrics()["acquired"] == 5
+    assert bucket.metrics()["rejected"] == 1
+
+
+def test_token_bucket_needs_a_positive_rate() -> None:
+    with pytest.raises(ValueError, match="positive"):
+        TokenBucket(rate=0, burst=1)
+
+
+def test_decorrelated_jitter_stays_within_bounds() -> None:
+    policy = RetryPolicy(base_delay_seconds=0.1, max_delay_seconds=2.0)
+    rng = random.Random(0)
+    delays = [0.0]
+    for _ in range(50):
+        delays.append(policy.next_delay(delays[-1], rng))
+
+    assert all(0.1 <= d <= 2.0 for d in delays[1:])
+    # Jittered, not a fixed exponential sequence shared by all clients
+    assert len(set(delays[1:7])) == 6
+    assert not policy.is_retryable(RateLimited("local"))
+    assert not policy.is_retryable(exceptions.InvalidArgument("bad"))
+
+
+def test_circuit_breaker_opens_and_probes() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=5, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 5.0
+    assert breaker.allow()
+    assert not breaker.allow(), "only one probe at a time"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.opens == 1
+
+
+def test_search_retries_overload_errors(service: FakeSearchService) -> None:
+    service.errors = FailFirst(2, grpc.StatusCode.UNAVAILABLE)
+    guard = SearchGuard(retry=FAST_RETRY, seed=0)
+    set_search_guard(guard)
+    try:
+        results = search.fetch_search_results("brake pads", DATA_STORE)
+    finally:
+        set_search_guard(None)
+
+    assert results and service.request_count == 3
+    assert guard.metrics()[DATA_STORE.key]["retries"] == 2
+
+
+def test_persistent_overload_opens_the_circuit(service: FakeSearchService) -> None:
+    service.errors = FailFirst(100, grpc.StatusCode.RESOURCE_EXHAUSTED)
+    set_search_guard(SearchGuard(retry=FAST_RETRY, failure_threshold=3, seed=0))
+    try:
+        first = search.search_engine("brake pads", DATA_STORE)
+        second = asyncio.run(search_async.search_engine_async("chains", DATA_STORE))
+    finally:
+        set_search_guard(None)
+
+    assert "Rate limit exceeded" in first
+    assert "temporarily unavailable" in second
+    # The open circuit kept the second search off the service
+    assert service.request_count == 3
+
+
+def test_rate_limit_rejects_searches_over_the_quota(
+    service: FakeSearchService,
+) -> None:
+    clock = FakeClock()
+    guard = SearchGuard(
+        buckets={"default": TokenBucket(rate=1, burst=1, clock=clock)},
+        max_wait_seconds=0,
+        clock=clock,
+    )
+    set_search_guard(guard)
+    try:
+        search.fetch_search_results("brake pads", DATA_STORE)
+        with pytest.raises(RateLimited):
+            search.fetch_search_results("chains", DATA_STORE)
+    finally:
+        set_search_guard(None)
+
+    assert service.request_count == 1
+    metrics = guard.metrics()[DATA_STORE.key]
+    assert metrics["bucket_rejected"] == 1 and metrics["retries"] == 0
+
+
+@pytest.mark.parametrize("code", [grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.ABORTED])
+def test_exhausted_retries_become_a_tool_message(
+    service: FakeSearchService, code: grpc.StatusCode
+) -> None:
+    service.errors = FailFirst(100, code)
+    set_search_guard(SearchGuard(retry=FAST_RETRY, failure_threshold=100, seed=0))
+
+    sync = search.search_engine("brake pads", DATA_STORE)
+    async_ = asyncio.run(search_async.search_engine_async("chains", DATA_STORE))
+
+    assert "failed. Do not retry this search right away" in sync
+    assert "failed. Do not retry this search right away" in async_
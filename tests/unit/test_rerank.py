@@ -0,0 +1,133 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+import pytest
+from google.cloud import discoveryengine_v1 as discoveryengine
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+from app.tools import search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.rerank import (
+    SearchReranker,
+    search_reranker_from_env,
+    set_search_reranker,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.reranker import OverlapReranker
+
+CANDIDATES = [
+    ("technical-docs", "Shimano MT200 bleeding procedure with mineral oil"),
+    ("slack-messages", "Bosch E-10 error, re-seat the speed sensor magnet"),
+    ("yeplypedia", "Sickness reporting SOP"),
+    ("technical-docs", "Bleeding Shimano brakes: the funnel and bleed block"),
+]
+
+
+class FailingCompressor(BaseDocumentCompressor):
+    def compress_documents(
+        self, documents: Sequence[Document], query: str, callbacks: Any = None
+    ) -> Sequence[Document]:
+        raise RuntimeError("Error in Vertex AI Ranking API call")
+
+
+def test_rerank_keeps_best_candidates_across_sources() -> None:
+    reranker = SearchReranker(OverlapReranker(top_n=10), top_n=2)
+
+    ranked = reranker.rerank("bleeding shimano brakes", CANDIDATES)
+
+    assert [(r.source, r.text) for r in ranked] == [CANDIDATES[3], CANDIDATES[0]]
+    assert ranked[0].score == 1.0
+    assert reranker.metrics() == {
+        "calls": 1,
+        "candidates": 4,
+        "kept": 2,
+        "failures": 0,
+    }
+
+
+def test_compressor_factory_is_called_once_on_first_rerank() -> None:
+    built = []
+
+    def factory() -> OverlapReranker:
+        built.append(True)
+        return OverlapReranker()
+
+    reranker = SearchReranker(factory, top_n=3)
+    assert built == []
+
+    reranker.rerank("bosch e-10", CANDIDATES)
+    reranker.rerank("sickness", CANDIDATES)
+    assert len(built) == 1
+
+
+def test_failed_ranking_keeps_the_given_order() -> None:
+    reranker = SearchReranker(FailingCompressor(), top_n=3)
+
+    ranked = reranker.rerank("bleeding", CANDIDATES)
+
+    assert [(r.source, r.text) for r in ranked] == CANDIDATES[:3]
+    assert reranker.metrics()["failures"] == 1
+
+
+def test_reranker_is_opt_in(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert search_reranker_from_env(lambda top_n: OverlapReranker()) is None
+
+    monkeypatch.setenv("SEARCH_RERANK", "true")
+    monkeypatch.setenv("SEARCH_RERANK_TOP_N", "3")
+    reranker = search_reranker_from_env(lambda top_n: OverlapReranker(top_n=top_n))
+    assert reranker is not None
+    assert isinstance(reranker.compressor, OverlapReranker)
+    assert reranker.top_n == reranker.compressor.top_n == 3
+
+
+def _documents(request: discoveryengine.SearchRequest) -> list[dict[str, Any]]:
+    key = request.data_store_specs[0].data_store.rsplit("/", 1)[-1].rsplit("_", 1)[0]
+    relevant = {"title": f"{key} brake bleed", "content": f"{key} brake bleed"}
+    return [relevant] + [
+        {"title": f"{key} {i}", "content": f"{key} {i} " + "unrelated " * 40}
+        for i in range(4)
+    ]
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService(documents=_documents) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+@pytest.mark.asyncio
+async def test_search_all_sources_sends_only_the_top_results(
+    service: FakeSearchService,
+) -> None:
+    compressor = OverlapReranker(top_n=3)
+    set_search_reranker(SearchReranker(compressor, top_n=3))
+
+    output = await search_async.search_all_sources("brake bleed")
+
+    # One ranking call over the candidates of all five stores
+    assert compressor.calls == 1
+    assert compressor.last_batch_size == 25
+    assert output.count("## Result") == 3
+    assert "unrelated" not in output
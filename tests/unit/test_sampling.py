@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Status, StatusCode
+
+from app.utils.sampling import (
+    INVOCATION_ID_ATTRIBUTE,
+    TailSamplingPolicy,
+    TailSamplingSpanProcessor,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_sampler(
+    clock: FakeClock | None = None, **policy: Any
+) -> tuple[TailSamplingSpanProcessor, InMemorySpanExporter, trace.Tracer]:
+    exporter = InMemorySpanExporter()
+    sampler = TailSamplingSpanProcessor(
+        SimpleSpanProcessor(exporter),
+        TailSamplingPolicy(**{"sample_ratio": 0.0, **policy}),
+        clock=clock or FakeClock(),
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    return sampler, exporter, provider.get_tracer(__name__)
+
+
+def run_turn(
+    tracer: trace.Tracer,
+    invocation_id: str = "e-1",
+    children: int = 2,
+    error: bool = False,
+    seconds: float = 1.0,
+) -> None:
+    start = 1_000_000_000
+    root = tracer.start_span("invocation", start_time=start)
+    context = trace.set_span_in_context(root)
+    for i in range(children):
+        child = tracer.start_span(
+            f"call_llm {i}",
+            context=context,
+            attributes={INVOCATION_ID_ATTRIBUTE: invocation_id},
+        )
+        if error and i == 0:
+            child.set_status(Status(StatusCode.ERROR))
+        child.end()
+    root.end(end_time=start + int(seconds * 1e9))
+
+
+def names(spans: tuple[ReadableSpan, ...]) -> list[str]:
+    return sorted(span.name for span in spans)
+
+
+def test_keeps_whole_traces_that_are_slow_or_failed() -> None:
+    sampler, exporter, tracer = make_sampler(slow_seconds=5)
+
+    run_turn(tracer, "normal")
+    assert exporter.get_finished_spans() == ()
+
+    run_turn(tracer, "slow", seconds=6)
+    run_turn(tracer, "failed", error=True)
+
+    assert len(exporter.get_finished_spans()) == 6
+    metrics = sampler.metrics()
+    assert (metrics["kept_slow"], metrics["kept_error"], metrics["dropped"]) == (
+        1,
+        1,
+        1,
+    )
+
+
+def test_sample_ratio_keeps_a_fraction_of_normal_traces() -> None:
+    sampler, _, tracer = make_sampler(sample_ratio=0.25, max_held_spans=0)
+
+    for i in range(400):
+        run_turn(tracer, f"e-{i}", children=0)
+
+    kept = sampler.stats.kept_sampled
+    assert 60 < kept < 140 and kept + sampler.stats.dropped == 400
+
+
+def test_negative_feedback_releases_a_sampled_out_trace() -> None:
+    sampler, exporter, tracer = make_sampler()
+    run_turn(tracer, "e-1")
+    run_turn(tracer, "e-2")
+
+    assert not sampler.record_feedback("e-1", score=1)
+    assert sampler.record_feedback("e-1", score=-1)
+
+    assert names(exporter.get_finished_spans()) == [
+        "call_llm 0",
+        "call_llm 1",
+        "invocation",
+    ]
+    # Feedback before the turn ends keeps it as well
+    sampler.record_feedback("e-3", score=-1)
+    run_turn(tracer, "e-3")
+    assert sampler.stats.kept_feedback == 1
+
+
+def test_buffer_limits_are_enforced() -> None:
+    sampler, exporter, tracer = make_sampler(
+        max_traces=3, max_spans_per_trace=5, max_buffered_spans=8, max_held_spans=6
+    )
+    # Roots that never end: only the limits bound the buffer
+    for i in range(10):
+        root = tracer.start_span(f"root {i}")
+        context = trace.set_span_in_context(root)
+        for j in range(7):
+            tracer.start_span(
+                f"child {j}",
+                context=context,
+                attributes={INVOCATION_ID_ATTRIBUTE: f"e-{i}"},
+            ).end()
+        metrics = sampler.metrics()
+        assert metrics["waiting_traces"] <= 3
+        assert metrics["buffered_spans"] <= 8
+        assert metrics["held_spans"] <= 6
+
+    assert sampler.stats.spans_over_limit == 10 * 2
+    # All but the last trace, which still waits for its root
+    assert sampler.stats.decided_early == 9
+    # Only the most recent sampled-out trace fits in the held spans
+    assert not sampler.record_feedback("e-0", score=-1)
+    assert sampler.record_feedback("e-8", score=-1)
+    assert len(exporter.get_finished_spans()) == 5
+
+
+def test_traces_waiting_too_long_are_decided() -> None:
+    clock = FakeClock()
+    sampler, _, tracer = make_sampler(clock, decision_wait_seconds=30)
+    tracer.start_span("orphan").end()
+    root = tracer.start_span("root")
+    tracer.start_span("child", context=trace.set_span_in_context(root)).end()
+    assert sampler.metrics()["waiting_traces"] == 1
+
+    clock.now = 31
+    run_turn(tracer)
+
+    assert sampler.metrics()["waiting_traces"] == 0
+    assert sampler.stats.decided_early == 1
@@ -0,0 +1,117 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+from app.tools import search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.search import DATA_STORES
+from tests.fakes.discovery_engine import FakeSearchService
+
+
+def _data_store_key(request: discoveryengine.SearchRequest) -> str:
+    return request.data_store_specs[0].data_store.rsplit("/", 1)[-1].rsplit("_", 1)[0]
+
+
+def _documents(request: discoveryengine.SearchRequest) -> list[dict[str, Any]]:
+    # Every store returns the same shared FAQ entry plus its own hits
+    shared = {"title": "Shared FAQ", "content": "Bleed brakes with mineral oil."}
+    own = [
+        {"title": f"{_data_store_key(request)} {i}", "content": "x" * 200}
+        for i in range(3)
+    ]
+    return [shared, *own]
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    def delay(request: discoveryengine.SearchRequest) -> float:
+        return 2.0 if _data_store_key(request) == "slack-messages" else 0.05
+
+    with FakeSearchService(documents=_documents, delay=delay) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+@pytest.mark.asyncio
+async def test_fanout_returns_what_finished_before_deadline(
+    service: FakeSearchService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(search_async, "FANOUT_DEADLINE_SECONDS", 0.5)
+
+    start = time.perf_counter()
+    output = await search_async.search_all_sources("brake bleed")
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.5
+    assert service.request_count == len(DATA_STORES)
+    assert "Slack messages from internal technical channels: timed out" in output
+    assert "technical-docs 0" in output and "erp-software-system 2" in output
+    assert "slack-messages 0" not in output
+    # The FAQ entry every store returned is only listed once
+    assert output.count("Shared FAQ") == 1
+
+
+@pytest.mark.asyncio
+async def test_fanout_limits_sources_and_budget(
+    service: FakeSearchService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(search_async, "FANOUT_MAX_CHARS", 800)
+
+    output = await search_async.search_all_sources(
+        "brake bleed", sources=["technical-docs", "yeplypedia"]
+    )
+
+    assert service.request_count == 2
+    assert len(output) < 900
+    # Results are interleaved by rank, so both sources make it into the budget
+    assert "technical-docs 0" in output and "yeplypedia 0" in output
+
+    unknown = await search_async.search_all_sources("x", sources=["nope"])
+    assert unknown.startswith("Unknown sources")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_source_is_reported_as_failed(
+    service: FakeSearchService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fetch = search_async.fetch_search_results_async
+
+    async def cancelled_for_docs(search_query: str, data_store: Any) -> list[str]:
+        if data_store.key == "technical-docs":
+            raise asyncio.CancelledError
+        return await fetch(search_query, data_store)
+
+    monkeypatch.setattr(search_async, "fetch_search_results_async", cancelled_for_docs)
+
+    output = await search_async.search_all_sources(
+        "brake bleed", sources=["technical-docs", "yeplypedia"]
+    )
+
+    docs = next(ds for ds in DATA_STORES if ds.key == "technical-docs")
+    assert f"{docs.name}: failed" in output
+    assert "yeplypedia 0" in output
@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from app.tools import search, search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    get_search_client_pool,
+    shutdown_search_client_pool,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+
+
+@pytest.fixture
+def slow_service() -> Iterator[FakeSearchService]:
+    with FakeSearchService(delay=0.2) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+@pytest.mark.asyncio
+async def test_async_tools_overlap_round_trips(slow_service: FakeSearchService) -> None:
+    """Five concurrent searches take about one round trip, not five."""
+    tools = [
+        search_async.search_technical_docs,
+        search_async.search_bike_histories,
+        search_async.search_slack_messages,
+        search_async.search_yeplypedia,
+        search_async.search_erp_software_system,
+    ]
+    start = time.perf_counter()
+    outputs = await asyncio.gather(*(tool("SM-BB72") for tool in tools))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6
+    assert slow_service.request_count == 5
+    for output, data_store in zip(outputs, search.DATA_STORES, strict=True):
+        assert output.startswith(f"# Search Results for '{data_store.name}'")
+        assert "## Result 5" in output
+    # All five calls shared the loop's single channel
+    assert get_search_client_pool().channel_count(search.API_ENDPOINT) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_matches_sync_output(slow_service: FakeSearchService) -> None:
+    data_store = search.DATA_STORES[3]
+    async_output = await search_async.search_engine_async("Vantool", data_store)
+    sync_output = await asyncio.to_thread(search.search_engine, "Vantool", data_store)
+    assert async_output == sync_output
+
+
+def test_async_tools_keep_tool_names() -> None:
+    for name in ["search_technical_docs", "search_erp_software_system"]:
+        sync_tool = getattr(search, name)
+        async_tool = getattr(search_async, name)
+        assert async_tool.__name__ == sync_tool.__name__
+        assert async_tool.__doc__ == sync_tool.__doc__
+        assert asyncio.iscoroutinefunction(async_tool)
@@ -0,0 +1,131 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+
+import pytest
+
+from app.tools import search, search_async
+from app.tools.cache import SearchResultCache, search_cache_from_env, set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DictBackend:
+    """Shared backend stand-in; ignores TTLs."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+
+    def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self.data[key] = value
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+def test_ttl_lru_and_overrides() -> None:
+    clock = FakeClock()
+    cache = SearchResultCache(
+        max_entries=2,
+        ttl_seconds=100,
+        ttl_overrides={"bike-histories": 10},
+        clock=clock,
+    )
+    cache.put("technical-docs_1", "Brake bleed  MT200", ["a"])
+    cache.put("bike-histories_2", "frame 123", ["b"])
+
+    assert cache.get("technical-docs_1", "brake bleed mt200") == ["a"]
+    clock.now = 11
+    assert cache.get("bike-histories_2", "frame 123") is None  # expired
+    cache.put("yeplypedia_3", "sick leave", ["c"])
+    cache.put("slack-messages_4", "e-10 error", ["d"])  # evicts technical-docs
+    assert cache.get("technical-docs_1", "brake bleed mt200") is None
+
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+    assert cache.stats.expirations == 1
+    assert cache.stats.evictions == 1
+    assert len(cache) == 2
+
+
+def test_shared_backend_is_shared_between_workers() -> None:
+    backend = DictBackend()
+    worker_a = SearchResultCache(backend=backend)
+    worker_b = SearchResultCache(backend=backend)
+
+    worker_a.put("technical-docs_1", "SM-BB72", ["a"])
+    assert worker_b.get("technical-docs_1", "sm-bb72") == ["a"]
+    assert worker_b.stats.shared_hits == 1
+    # Promoted into the local tier of worker b
+    assert worker_b.get("technical-docs_1", "sm-bb72") == ["a"]
+    assert worker_b.stats.hits == 1
+
+
+def test_search_engine_serves_repeats_from_cache(service: FakeSearchService) -> None:
+    cache = SearchResultCache()
+    set_search_cache(cache)
+    data_store = search.DATA_STORES[4]
+
+    first = search.search_engine("How to create work order in Vantool", data_store)
+    second = search.search_engine("how to create work order in vantool ", data_store)
+
+    assert first == second
+    assert service.request_count == 1
+    assert cache.metrics()["hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_async_path_shares_cache(service: FakeSearchService) -> None:
+    set_search_cache(SearchResultCache())
+    data_store = search.DATA_STORES[0]
+
+    sync_output = search.search_engine("E-10 error", data_store)
+    async_output = await search_async.search_engine_async("e-10 error", data_store)
+
+    assert sync_output == async_output
+    assert service.request_count == 1
+
+
+def test_cache_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SEARCH_CACHE_TTL_OVERRIDES", "bike-histories=60, slack=5")
+    cache = search_cache_from_env()
+    assert cache is not None
+    assert cache.ttl_for("bike-histories_1751381211957") == 60
+    assert cache.ttl_for("technical-docs_1751366705621") == 300
+
+    monkeypatch.setenv("SEARCH_CACHE_MAX_ENTRIES", "0")
+    assert search_cache_from_env() is None
@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+
+import pytest
+
+from app.tools import search, search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.search_metrics import get_response_size_recorder
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.recorded_results import recorded_documents
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    get_response_size_recorder().clear()
+    with FakeSearchService(documents=recorded_documents) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+    get_response_size_recorder().clear()
+
+
+def test_default_profile_requests_only_formatted_results() -> None:
+    request = search.build_search_request("brake bleed", search.DATA_STORES[0])
+
+    assert request.page_size == 5
+    assert "content_search_spec" not in request
+
+
+def test_profile_requests_snippets_and_segments() -> None:
+    data_store = search.DataStore(
+        id="technical-docs_1",
+        name="Docs",
+        profile=search.SearchProfile(
+            page_size=3, max_snippet_count=1, max_extractive_segment_count=2
+        ),
+    )
+
+    request = search.build_search_request("brake bleed", data_store)
+
+    spec = request.content_search_spec
+    assert request.page_size == 3
+    assert spec.snippet_spec.return_snippet
+    assert spec.snippet_spec.max_snippet_count == 1
+    assert spec.extractive_content_spec.max_extractive_segment_count == 2
+
+
+def test_response_bytes_are_recorded_per_data_store(service: FakeSearchService) -> None:
+    lean = search.DATA_STORES[1]
+    heavy = search.DataStore(
+        id=lean.id,
+        name=lean.name,
+        formatter=lean.formatter,
+        profile=search.SearchProfile(page_size=8, max_snippet_count=1),
+    )
+
+    lean_results = search.fetch_search_results("WBK123456", lean)
+    lean_bytes = get_response_size_recorder().metrics()[lean.id]["response_bytes"]
+    heavy_results = search.fetch_search_results("WBK123456", heavy)
+    metrics = get_response_size_recorder().metrics()[lean.id]
+
+    assert lean_results == heavy_results
+    assert metrics["calls"] == 2
+    assert metrics["results"] == 10
+    assert metrics["pages"] == 2
+    assert metrics["response_bytes"] - lean_bytes > 1.5 * lean_bytes
+
+
+def test_search_stops_at_max_results_without_fetching_the_next_page(
+    service: FakeSearchService,
+) -> None:
+    # 8 recorded hits, 5 per page: the service offers a second page
+    data_store = search.DATA_STORES[0]
+
+    results = search.fetch_search_results("brake bleed", data_store)
+
+    metrics = get_response_size_recorder().metrics()[data_store.id]
+    assert len(results) == 5
+    assert service.request_count == 1
+    assert metrics["pages"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_search_records_response_bytes(service: FakeSearchService) -> None:
+    data_store = search.DATA_STORES[2]
+
+    results = await search_async.fetch_search_results_async("brakes", data_store)
+
+    metrics = get_response_size_recorder().metrics()[data_store.id]
+    assert len(results) == 5
+    assert metrics["calls"] == 1
+    assert metrics["response_bytes"] == metrics["max_response_bytes"] > 0
+
+
+def test_every_page_is_fetched_on_a_leased_client(service: FakeSearchService) -> None:
+    data_store = search.DataStore(
+        id="technical-docs_1",
+        name="Docs",
+        profile=search.SearchProfile(page_size=3, max_results=8),
+    )
+    request = search.build_search_request("brake bleed", data_store)
+
+    pages = search.search_pages(request, data_store)
+    first = next(pages)
+    # Closes the channel the first page came from
+    configure_search_client_pool(channel_factory=service.channel_factory)
+    rest = list(pages)
+
+    assert [len(page.results) for page in [first, *rest]] == [3, 3, 2]
+    assert service.request_count == 3
+
+
+@pytest.mark.asyncio
+async def test_async_pages_are_fetched_on_a_leased_client(
+    service: FakeSearchService,
+) -> None:
+    data_store = search.DataStore(
+        id="technical-docs_1",
+        name="Docs",
+        profile=search.SearchProfile(page_size=3, max_results=8),
+    )
+
+    results = await search_async.search_remote_async("brake bleed", data_store)
+
+    assert len(results) == 8
+    assert service.request_count == 3
@@ -0,0 +1,189 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+from typing import Any
+
+import grpc
+import pytest
+from google.api_core import exceptions
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from app.tools import search, search_metrics
+from app.tools.cache import SearchResultCache, set_search_cache
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.rate_limit import (
+    RateLimited,
+    RetryPolicy,
+    SearchGuard,
+    TokenBucket,
+    set_search_guard,
+)
+from app.tools.search_metrics import SearchInstruments, set_search_instruments
+from app.utils.metrics import metric_reader_from_env
+from tests.fakes.discovery_engine import FakeSearchService
+
+DATA_STORE = search.DATA_STORES[1]
+
+
+@pytest.fixture
+def reader() -> Iterator[InMemoryMetricReader]:
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(metric_readers=[reader])
+    set_search_instruments(SearchInstruments(provider.get_meter(__name__)))
+    yield reader
+    set_search_instruments(None)
+    provider.shutdown()
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(channel_factory=service.channel_factory)
+        yield service
+    shutdown_search_client_pool()
+
+
+def points(reader: InMemoryMetricReader) -> dict[str, list[Any]]:
+    data = reader.get_metrics_data()
+    assert data is not None
+    return {
+        metric.name: list(metric.data.data_points)
+        for resource_metrics in data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+def test_searches_record_latency_sizes_and_sources(
+    reader: InMemoryMetricReader, service: FakeSearchService
+) -> None:
+    set_search_cache(SearchResultCache())
+    search.search_engine("brake pads", DATA_STORE)
+    search.search_engine("brake pads", DATA_STORE)
+
+    recorded = points(reader)
+    durations = {p.attributes["source"]: p for p in recorded["search.duration"]}
+    assert durations.keys() == {"remote", "cache"}
+    assert all(p.attributes["data_store"] == DATA_STORE.id for p in durations.values())
+    assert durations["remote"].count == durations["cache"].count == 1
+    (response_size,) = recorded["search.response.size"]
+    assert response_size.count == 1 and response_size.sum > 0
+    (output_size,) = recorded["search.output.size"]
+    assert output_size.count == 2
+    (results,) = [
+        p for p in recorded["search.results"] if p.attributes["source"] == "remote"
+    ]
+    assert results.sum == DATA_STORE.profile.max_results
+
+
+def test_failed_searches_are_counted_by_error_type(
+    reader: InMemoryMetricReader, service: FakeSearchService
+) -> None:
+    service.errors = lambda request: grpc.StatusCode.RESOURCE_EXHAUSTED
+
+    assert "Rate limit exceeded" in search.search_engine("brake pads", DATA_STORE)
+    with pytest.raises(exceptions.ResourceExhausted):
+        search.fetch_search_results("chains", DATA_STORE)
+
+    (errors,) = points(reader)["search.errors"]
+    assert errors.value == 2
+    assert errors.attributes == {
+        "data_store": DATA_STORE.id,
+        "error.type": "rate_limited",
+    }
+
+
+def test_search_guard_state_is_observed(
+    reader: InMemoryMetricReader, service: FakeSearchService
+) -> None:
+    service.errors = lambda request: grpc.StatusCode.UNAVAILABLE
+    docs = search.DATA_STORES[0]
+    set_search_guard(
+        SearchGuard(
+            buckets={
+                "default": TokenBucket(rate=0.01, burst=2),
+                docs.key: TokenBucket(rate=0.01, burst=1),
+            },
+            retry=RetryPolicy(max_attempts=1),
+            failure_threshold=2,
+            max_wait_seconds=0,
+        )
+    )
+    # Two failures open the circuit of DATA_STORE, the third is short-circuited
+    for query in ("brake pads", "chains", "tyres"):
+        with pytest.raises(exceptions.ServiceUnavailable):
+            search.fetch_search_results(query, DATA_STORE)
+    # The second search of docs finds its bucket empty
+    with pytest.raises(exceptions.ServiceUnavailable):
+        search.fetch_search_results("brake pads", docs)
+    with pytest.raises(RateLimited):
+        search.fetch_search_results("chains", docs)
+
+    recorded = points(reader)
+
+    def values(name: str, attribute: str) -> dict[str, float]:
+        return {p.attributes[attribute]: p.value for p in recorded[name]}
+
+    tokens = values("search.rate_limit.tokens", "bucket")
+    assert tokens.keys() == {"default", docs.key}
+    assert all(value < 0.1 for value in tokens.values())
+    assert values("search.rate_limit.throttled", "bucket") == {
+        "default": 0,
+        docs.key: 1,
+    }
+    assert values("search.circuit.state", "data_store_key") == {
+        DATA_STORE.key: 2,
+        docs.key: 0,
+    }
+    assert values("search.circuit.short_circuits", "data_store_key") == {
+        DATA_STORE.key: 1,
+        docs.key: 0,
+    }
+
+
+def test_each_data_store_search_gets_a_span(
+    monkeypatch: pytest.MonkeyPatch, service: FakeSearchService
+) -> None:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(search_metrics, "tracer", provider.get_tracer(__name__))
+
+    search.search_engine("brake pads", DATA_STORE)
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == f"search {DATA_STORE.id}"
+    assert span.attributes == {
+        "search.data_store": DATA_STORE.id,
+        "search.source": "remote",
+        "search.results": DATA_STORE.profile.max_results,
+    }
+
+
+def test_exporter_is_selected_by_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert metric_reader_from_env() is None
+    monkeypatch.setenv("OTEL_METRICS_EXPORTER", "memory")
+    assert isinstance(metric_reader_from_env(), InMemoryMetricReader)
+    monkeypatch.setenv("OTEL_METRICS_EXPORTER", "no-such-exporter")
+    assert metric_reader_from_env() is None
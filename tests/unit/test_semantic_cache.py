@@ -0,0 +1,127 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.tools.semantic_cache import HashingEmbeddings, SemanticQueryCache
+
+DOCS = "technical-docs_1"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_hashing_embeddings_are_deterministic_unit_vectors() -> None:
+    a = HashingEmbeddings().embed_query("Shimano MT200 brake bleed")
+    b = HashingEmbeddings().embed_query("brake bleed shimano mt200")
+    assert a == b
+    assert np.isclose(np.linalg.norm(a), 1.0)
+
+
+def test_near_duplicate_query_hits() -> None:
+    cache = SemanticQueryCache(HashingEmbeddings(), threshold=0.8)
+    cache.add(DOCS, "brake bleed Shimano MT200", ["bleed kit steps"])
+
+    assert cache.lookup(DOCS, "Shimano MT200 brake bleed") == ["bleed kit steps"]
+    assert cache.lookup(DOCS, "how to create work order in Vantool") is None
+    # Other data stores never share entries
+    assert cache.lookup("yeplypedia_1", "Shimano MT200 brake bleed") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+
+
+def test_different_identifiers_never_match() -> None:
+    cache = SemanticQueryCache(HashingEmbeddings(), threshold=0.5)
+    cache.add(DOCS, "E-10 error Bosch Performance Line", ["e-10"])
+
+    assert cache.lookup(DOCS, "E-12 error Bosch Performance Line") is None
+    assert cache.lookup(DOCS, "Bosch Performance Line E-10 error") == ["e-10"]
+
+
+def test_embedding_factory_is_called_on_first_lookup_only() -> None:
+    built = []
+
+    def factory() -> HashingEmbeddings:
+        built.append(True)
+        return HashingEmbeddings()
+
+    cache = SemanticQueryCache(factory, threshold=0.8)
+    assert built == []
+
+    cache.add(DOCS, "brake bleed Shimano MT200", ["bleed kit steps"])
+    assert cache.lookup(DOCS, "Shimano MT200 brake bleed") == ["bleed kit steps"]
+    assert built == [True]
+
+
+def test_memory_is_bounded_and_expired_entries_go_first() -> None:
+    clock = FakeClock()
+    cache = SemanticQueryCache(
+        HashingEmbeddings(),
+        threshold=0.99,
+        max_entries_per_data_store=2,
+        ttl_seconds=10,
+        clock=clock,
+    )
+    cache.add(DOCS, "query one", ["1"])
+    clock.now = 5
+    cache.add(DOCS, "query two", ["2"])
+    clock.now = 12  # "query one" expired
+    cache.add(DOCS, "query three", ["3"])
+
+    assert cache.metrics()["size"] == 2
+    assert cache.stats.evictions == 1
+    assert cache.lookup(DOCS, "query two") == ["2"]
+    assert cache.lookup(DOCS, "query one") is None
+
+    clock.now = 13
+    cache.lookup(DOCS, "query three")
+    cache.add(DOCS, "query four", ["4"])  # evicts least recently used "query two"
+    assert cache.lookup(DOCS, "query two") is None
+    assert cache.lookup(DOCS, "query three") == ["3"]
+
+
+@pytest.mark.asyncio
+async def test_async_lookup_embeds_once_per_query() -> None:
+    cache = SemanticQueryCache(HashingEmbeddings(), threshold=0.9)
+    assert await cache.alookup(DOCS, "SM-BB72 torque") is None
+    await cache.aadd(DOCS, "SM-BB72 torque", ["40 Nm"])
+    assert await cache.alookup(DOCS, "sm-bb72  torque") == ["40 Nm"]
+    assert cache.stats.embedding_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_embedding_model_is_built_off_the_loop_and_the_cache_lock() -> None:
+    def build() -> HashingEmbeddings:
+        time.sleep(0.3)
+        return HashingEmbeddings()
+
+    cache = SemanticQueryCache(build)
+    start = time.perf_counter()
+    lookup = asyncio.create_task(cache.alookup(DOCS, "chain wear"))
+    await asyncio.sleep(0.01)
+    cache.metrics()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.2
+    assert await lookup is None
+    assert isinstance(cache.embeddings, HashingEmbeddings)
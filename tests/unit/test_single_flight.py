@@ -0,0 +1,210 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from collections.abc import Iterator
+from concurrent import futures
+
+import pytest
+
+from app.tools import search, search_async
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.tools.single_flight import SingleFlight, set_single_flight
+from tests.fakes.discovery_engine import FakeSearchService
+
+DATA_STORE = search.DATA_STORES[1]
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService(delay=0.2) as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+@pytest.fixture
+def single_flight() -> SingleFlight:
+    single_flight = SingleFlight()
+    set_single_flight(single_flight)
+    return single_flight
+
+
+def test_concurrent_threads_share_one_request(
+    service: FakeSearchService, single_flight: SingleFlight
+) -> None:
+    barrier = threading.Barrier(8)
+
+    def ask(query: str) -> list[str]:
+        barrier.wait()
+        return search.fetch_search_results(query, DATA_STORE)
+
+    queries = ["Brake pads"] * 6 + ["brake  PADS", "chain wear"]
+    with futures.ThreadPoolExecutor(len(queries)) as executor:
+        results = list(executor.map(ask, queries))
+
+    assert service.request_count == 2
+    assert results[0] == results[6] != results[7]
+    assert single_flight.metrics() == {"leaders": 2, "coalesced": 6, "in_flight": 0}
+
+
+def test_concurrent_tasks_share_one_request(
+    service: FakeSearchService, single_flight: SingleFlight
+) -> None:
+    async def burst() -> list[list[str]]:
+        return await asyncio.gather(
+            *(
+                search_async.fetch_search_results_async("brake pads", DATA_STORE)
+                for _ in range(10)
+            )
+        )
+
+    results = asyncio.run(burst())
+
+    assert service.request_count == 1
+    assert all(r == results[0] for r in results)
+    assert single_flight.stats.coalesced == 9
+
+
+def test_async_search_joins_a_sync_search_in_flight(
+    service: FakeSearchService, single_flight: SingleFlight
+) -> None:
+    with futures.ThreadPoolExecutor(1) as executor:
+        sync = executor.submit(search.fetch_search_results, "brake pads", DATA_STORE)
+        while len(single_flight) == 0:
+            pass
+        results = asyncio.run(
+            search_async.fetch_search_results_async("Brake pads", DATA_STORE)
+        )
+
+    assert results == sync.result()
+    assert service.request_count == 1
+    assert single_flight.stats.coalesced == 1
+
+
+def test_followers_receive_the_leaders_error() -> None:
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail() -> str:
+        started.set()
+        release.wait()
+        raise RuntimeError("backend down")
+
+    with futures.ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(single_flight.do, "key", fail)
+        started.wait()
+        follower = executor.submit(single_flight.do, "key", lambda: "unused")
+        while single_flight.stats.coalesced == 0:
+            pass
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="backend down"):
+                future.result()
+    assert len(single_flight) == 0
+
+
+def test_request_is_cancelled_only_with_its_last_waiter() -> None:
+    single_flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def slow() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    async def run() -> None:
+        first = asyncio.create_task(single_flight.ado("key", slow))
+        second = asyncio.create_task(single_flight.ado("key", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(run())
+    assert len(single_flight) == 0
+
+
+def test_caller_after_the_last_waiter_cancels_starts_a_new_request() -> None:
+    single_flight = SingleFlight()
+
+    async def slow() -> str:
+        await asyncio.sleep(10)
+        return "stale"
+
+    async def fast() -> str:
+        return "fresh"
+
+    async def run() -> None:
+        only = asyncio.create_task(single_flight.ado("key", slow))
+        await asyncio.sleep(0.01)
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        assert await single_flight.ado("key", fast) == "fresh"
+
+    asyncio.run(run())
+    assert len(single_flight) == 0
+
+
+def test_last_waiter_on_another_loop_cancels_the_request() -> None:
+    single_flight = SingleFlight()
+    cancelled = threading.Event()
+    leader_loop = asyncio.new_event_loop()
+
+    async def slow() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    thread = threading.Thread(target=leader_loop.run_forever)
+    thread.start()
+    try:
+        leader = asyncio.run_coroutine_threadsafe(
+            single_flight.ado("key", slow), leader_loop
+        )
+
+        async def follow() -> None:
+            while len(single_flight) == 0:
+                await asyncio.sleep(0.001)
+            follower = asyncio.create_task(single_flight.ado("key", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            await asyncio.sleep(0.01)
+            assert not cancelled.is_set()
+            follower.cancel()
+
+        asyncio.run(follow())
+        assert cancelled.wait(2)
+    finally:
+        leader_loop.call_soon_threadsafe(leader_loop.stop)
+        thread.join()
+        leader_loop.close()
+    assert len(single_flight) == 0
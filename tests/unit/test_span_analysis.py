@@ -0,0 +1,169 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any, cast
+
+import pytest
+from google.cloud import logging as google_cloud_logging
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+
+from app.utils.span_analysis import (
+    SpanRecord,
+    TraceAssembler,
+    analyze,
+    main,
+    trace_turns,
+)
+from app.utils.tracing import CloudTraceLoggingSpanExporter
+from tests.fakes.telemetry_sinks import (
+    FakeLoggingClient,
+    FakeStorageClient,
+    FakeTraceClient,
+)
+
+SECOND = 1_000_000_000
+# 2025-06-15, as spans starting at the epoch have no start time
+BASE = 1_750_000_000
+
+
+def turn_spans(tracer: trace.Tracer, offset: float = BASE) -> list[ReadableSpan]:
+    """One ADK turn: LLM call, a tool searching two data stores, LLM call."""
+    ended: list[ReadableSpan] = []
+
+    def span(
+        name: str, start: float, end: float, parent: Any = None, **attributes: Any
+    ) -> trace.Span:
+        context = trace.set_span_in_context(parent) if parent else None
+        started = tracer.start_span(
+            name,
+            context=context,
+            attributes=attributes,
+            start_time=int((offset + start) * SECOND),
+        )
+        started.end(end_time=int((offset + end) * SECOND))
+        ended.append(cast(ReadableSpan, started))
+        return started
+
+    root = tracer.start_span("invocation", start_time=int(offset * SECOND))
+    agent = tracer.start_span(
+        "agent_run [mechanic]",
+        context=trace.set_span_in_context(root),
+        start_time=int((offset + 0.1) * SECOND),
+    )
+    span("call_llm", 0.2, 3.0, agent, **{"gcp.vertex.agent.invocation_id": "e-1"})
+    tool = tracer.start_span(
+        "execute_tool search_all_sources",
+        context=trace.set_span_in_context(agent),
+        attributes={"gen_ai.tool.name": "search_all_sources"},
+        start_time=int((offset + 3.0) * SECOND),
+    )
+    span("search slack-messages", 3.1, 4.0, tool)
+    span(
+        "search bike-histories",
+        3.1,
+        5.0,
+        tool,
+        **{"search.data_store": "bike-histories"},
+    )
+    tool.end(end_time=int((offset + 6.0) * SECOND))
+    ended.append(cast(ReadableSpan, tool))
+    span("call_llm", 6.5, 9.5, agent)
+    agent.end(end_time=int((offset + 9.9) * SECOND))
+    root.end(end_time=int((offset + 10) * SECOND))
+    return [*ended, cast(ReadableSpan, agent), cast(ReadableSpan, root)]
+
+
+def exported_entries(spans: list[ReadableSpan]) -> list[dict[str, Any]]:
+    exporter = CloudTraceLoggingSpanExporter(
+        project_id="test-project",
+        client=FakeTraceClient(),
+        logging_client=cast(google_cloud_logging.Client, FakeLoggingClient()),
+        storage_client=FakeStorageClient(),
+    )
+    exporter.export(spans)
+    exporter.force_flush()
+    entries = [entry["json_payload"] for entry in exporter.logger.entries]
+    exporter.shutdown()
+    return entries
+
+
+def test_turn_wall_time_is_split_by_phase_with_its_critical_path() -> None:
+    tracer = TracerProvider().get_tracer(__name__)
+    report, _ = analyze(exported_entries(turn_spans(tracer)), slowest=1)
+
+    (turn,) = report.slowest_turns()
+    assert turn.invocation_id == "e-1"
+    assert turn.wall == pytest.approx(10)
+    assert turn.llm == pytest.approx(5.8)
+    assert turn.tools == pytest.approx(3.0)
+    assert turn.searches == pytest.approx(1.9)
+    assert turn.formatting == pytest.approx(1.1)
+    assert turn.idle == pytest.approx(1.2)
+    assert sorted(turn.search_calls) == [
+        ("bike-histories", pytest.approx(1.9)),
+        ("slack-messages", pytest.approx(0.9)),
+    ]
+    labels = [label for label, _ in turn.critical_path]
+    assert labels == [
+        "invocation",
+        "agent_run [mechanic]",
+        "llm",
+        "tool search_all_sources",
+        "search bike-histories",
+        "tool search_all_sources",
+        "agent_run [mechanic]",
+        "llm",
+        "agent_run [mechanic]",
+        "invocation",
+    ]
+    assert sum(s for _, s in turn.critical_path) == pytest.approx(10)
+
+
+def test_cli_reads_gzipped_logging_exports(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    tracer = TracerProvider().get_tracer(__name__)
+    spans = [s for i in range(3) for s in turn_spans(tracer, offset=BASE + i * 20)]
+    with gzip.open(tmp_path / "spans.jsonl.gz", "wt") as f:
+        for entry in exported_entries(spans):
+            f.write(json.dumps({"jsonPayload": entry, "severity": "INFO"}) + "\n")
+
+    main([str(tmp_path / "*.jsonl.gz"), "--slowest", "1"])
+
+    out = capsys.readouterr().out
+    assert out.startswith("3 turns")
+    assert "Per tool call (ms)" in out
+    assert "search_all_sources" in out
+    assert "bike-histories" in out and "slack-messages" in out
+    assert "Critical path share" in out
+    assert "Turn e-1 (10000ms)" in out
+
+
+def test_open_traces_are_bounded() -> None:
+    def record(trace_id: str, span_id: str, parent_id: str | None) -> SpanRecord:
+        return SpanRecord(trace_id, span_id, parent_id, "call_llm", 0.0, 1.0)
+
+    assembler = TraceAssembler(max_open_traces=1)
+    # Roots with remote parents never complete a trace on arrival
+    assert assembler.add(record("a", "a1", "caller")) == []
+    (evicted,) = assembler.add(record("b", "b1", "caller"))
+    assert [s.span_id for s in evicted] == ["a1"]
+    assert len(list(trace_turns(evicted))) == 1
+    assert assembler.add(record("a", "a2", "a1")) == []
+    assert assembler.late_spans == 1
+    assert [[s.span_id for s in t] for t in assembler.flush()] == [["b1"]]
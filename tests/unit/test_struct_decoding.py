@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from google.cloud import discoveryengine_v1 as discoveryengine
+from google.protobuf import struct_pb2
+from google.protobuf.json_format import MessageToDict
+
+from app.tools.formatting import ResultFormatter
+from app.tools.search import DATA_STORES
+from app.tools.struct_decoding import (
+    ListView,
+    StructView,
+    decode_struct_data,
+    result_struct_data,
+)
+from tests.fakes.recorded_results import RECORDED_RESULTS
+
+
+def _struct(document: dict) -> struct_pb2.Struct:
+    struct = struct_pb2.Struct()
+    struct.update(document)
+    return struct
+
+
+def test_decodes_only_requested_fields_in_order() -> None:
+    struct = _struct(RECORDED_RESULTS["bike-histories"][0])
+
+    decoded = decode_struct_data(struct, ("work_order_number", "frame_number", "nope"))
+
+    assert list(decoded) == ["work_order_number", "frame_number"]
+    assert decoded["frame_number"] == "WBK123456"
+
+
+def test_nested_values_are_lazy_views() -> None:
+    struct = _struct(RECORDED_RESULTS["bike-histories"][0])
+
+    decoded = decode_struct_data(struct)
+
+    assert isinstance(decoded["parts"], ListView)
+    assert isinstance(decoded["parts"][0], StructView)
+    assert decoded["parts"][0]["sku"] == "Y8NA98010"
+    assert (
+        decoded["embedding"][:3]
+        == RECORDED_RESULTS["bike-histories"][0]["embedding"][:3]
+    )
+    with pytest.raises(KeyError):
+        decoded["parts"][0]["missing"]
+
+
+def test_falls_back_to_all_fields_when_projection_is_empty() -> None:
+    struct = _struct({"title": "", "text": "hello", "score": 1.0, "gone": None})
+
+    decoded = decode_struct_data(struct, ("title", "link"))
+
+    assert decoded == {"title": "", "text": "hello", "score": 1.0, "gone": None}
+
+
+def test_accepts_proto_plus_map_composite() -> None:
+    document = discoveryengine.Document(struct_data={"title": "x", "n": [1, 2]})
+
+    decoded = decode_struct_data(document.struct_data, ("n",))
+
+    assert decoded == {"n": [1.0, 2.0]}
+
+
+def test_result_struct_data_skips_documents_without_data() -> None:
+    empty = discoveryengine.SearchResponse.SearchResult(
+        document=discoveryengine.Document(id="1")
+    )
+    full = discoveryengine.SearchResponse.SearchResult(
+        document=discoveryengine.Document(id="2", struct_data={"title": "x"})
+    )
+
+    assert result_struct_data(empty) is None
+    data = result_struct_data(full)
+    assert data is not None
+    assert data.fields["title"].string_value == "x"
+
+
+def test_formatted_output_matches_full_decode() -> None:
+    for data_store in DATA_STORES:
+        formatter = ResultFormatter(fields=data_store.formatter.fields, max_tokens=800)
+        structs = [_struct(d) for d in RECORDED_RESULTS[data_store.key][:5]]
+
+        fast = formatter.format_results(
+            [decode_struct_data(s, formatter.fields) for s in structs]
+        )
+        full = formatter.format_results([MessageToDict(s) for s in structs])
+
+        assert fast == full
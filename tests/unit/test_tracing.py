@@ -0,0 +1,341 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import os
+import signal
+import threading
+import time
+from typing import Any, cast
+
+import pytest
+from google.cloud import logging as google_cloud_logging
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+
+from app.utils.tracing import (
+    MAX_ENTRY_BYTES,
+    TRUNCATED_SUFFIX,
+    BatchedLogWriter,
+    CloudTraceLoggingSpanExporter,
+)
+from tests.fakes.telemetry_sinks import (
+    FakeLogger,
+    FakeLoggingClient,
+    FakeStorageClient,
+    FakeTraceClient,
+)
+
+
+def make_spans(count: int) -> list[ReadableSpan]:
+    tracer = TracerProvider().get_tracer(__name__)
+    spans = []
+    for i in range(count):
+        span = tracer.start_span(f"span {i}", attributes={"turn": i})
+        span.end()
+        spans.append(cast(ReadableSpan, span))
+    return spans
+
+
+def make_exporter(
+    storage_client: FakeStorageClient | None = None, **kwargs: Any
+) -> CloudTraceLoggingSpanExporter:
+    return CloudTraceLoggingSpanExporter(
+        project_id="test-project",
+        client=FakeTraceClient(),
+        logging_client=cast(google_cloud_logging.Client, FakeLoggingClient()),
+        storage_client=storage_client or FakeStorageClient(),
+        **kwargs,
+    )
+
+
+def make_writer(logger: FakeLogger, **kwargs: Any) -> BatchedLogWriter:
+    return BatchedLogWriter(cast(google_cloud_logging.Logger, logger), **kwargs)
+
+
+def test_export_writes_span_logs_in_batches() -> None:
+    exporter = make_exporter(log_batch_size=4, log_flush_interval=60)
+    logger = exporter.logger
+
+    exporter.export(make_spans(10))
+    assert exporter.force_flush()
+
+    assert len(logger.entries) == 10
+    # Two full batches and the rest on flush
+    assert logger.rpcs == 3
+    entry = logger.entries[0]
+    assert entry["json_payload"]["trace"].startswith("projects/test-project/traces/")
+    assert entry["labels"]["type"] == "agent_telemetry"
+    assert cast(FakeTraceClient, exporter.client).spans == 10
+    exporter.shutdown()
+
+
+def test_partial_batch_is_written_after_the_flush_interval() -> None:
+    logger = FakeLogger()
+    writer = make_writer(logger, batch_size=100, flush_interval=0.05)
+
+    writer.write({"n": 1})
+    deadline = time.monotonic() + 2
+    while not logger.entries and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert logger.entries == [
+        {"json_payload": {"n": 1}, "labels": None, "severity": "INFO"}
+    ]
+    writer.shutdown()
+
+
+def test_full_queue_drops_entries_without_blocking() -> None:
+    logger = FakeLogger()
+    release = threading.Event()
+    write = logger._write
+
+    def stalled_write(entries: list[dict[str, Any]]) -> None:
+        release.wait()
+        write(entries)
+
+    logger._write = stalled_write  # type: ignore[method-assign]
+    writer = make_writer(logger, batch_size=1, max_queue_size=2)
+
+    start = time.perf_counter()
+    accepted = [writer.write({"n": i}) for i in range(10)]
+    elapsed = time.perf_counter() - start
+    release.set()
+    writer.shutdown(timeout=5)
+
+    assert elapsed < 0.5
+    assert not all(accepted)
+    metrics = writer.metrics()
+    assert metrics["dropped"] == accepted.count(False)
+    assert metrics["written"] == metrics["enqueued"] == len(logger.entries)
+
+
+def test_shutdown_with_a_full_queue_does_not_raise() -> None:
+    logger = FakeLogger()
+    release = threading.Event()
+    write = logger._write
+
+    def stalled_write(entries: list[dict[str, Any]]) -> None:
+        release.wait()
+        write(entries)
+
+    logger._write = stalled_write  # type: ignore[method-assign]
+    writer = make_writer(logger, batch_size=1, max_queue_size=1)
+    writer.write({"n": 0})
+    deadline = time.monotonic() + 2
+    while writer.metrics()["queued"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.write({"n": 1})
+
+    writer.shutdown(timeout=0.05)
+    release.set()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_writes_with_its_own_thread() -> None:
+    logger = FakeLogger()
+    writer = make_writer(logger, batch_size=100, flush_interval=60)
+    writer.write({"n": "parent"})
+
+    pid = os.fork()
+    if pid == 0:
+        # The parent's writer thread and queued entry did not come along
+        writer.write({"n": "child"})
+        ok = writer.flush(timeout=5) and [
+            e["json_payload"] for e in logger.entries
+        ] == [{"n": "child"}]
+        os._exit(0 if ok else 1)
+    deadline = time.monotonic() + 10
+    while (status := os.waitpid(pid, os.WNOHANG))[0] == 0:
+        if time.monotonic() > deadline:
+            os.kill(pid, signal.SIGKILL)
+            pytest.fail("Forked writer hung")
+        time.sleep(0.01)
+    assert os.waitstatus_to_exitcode(status[1]) == 0
+    assert writer.flush(timeout=5)
+    assert [e["json_payload"] for e in logger.entries] == [{"n": "parent"}]
+    writer.shutdown()
+
+
+def test_span_entry_matches_the_json_round_trip() -> None:
+    exporter = make_exporter()
+    tracer = TracerProvider().get_tracer(__name__)
+    with tracer.start_as_current_span("parent"):
+        span = tracer.start_span(
+            "call_llm", attributes={"model": "gemini", "tokens": (1, 2)}
+        )
+        span.add_event("retry", {"attempt": 2})
+        span.end()
+    assert isinstance(span, ReadableSpan)
+
+    entry, size = exporter._span_entry(span)
+
+    expected = json.loads(span.to_json())
+    expected["trace"] = f"projects/test-project/traces/{span.context.trace_id:x}"
+    expected["span_id"] = f"{span.context.span_id:x}"
+    assert entry == expected
+    assert size >= len(json.dumps(expected["attributes"]))
+    exporter.shutdown()
+
+
+def test_large_attributes_move_to_gcs_and_the_entry_fits() -> None:
+    exporter = make_exporter()
+    tracer = TracerProvider().get_tracer(__name__)
+    request = "é" * 200_000
+    span = tracer.start_span(
+        "call_llm", attributes={"llm_request": request, "model": "gemini"}
+    )
+    span.end()
+
+    exporter.export([cast(ReadableSpan, span)])
+    exporter.force_flush()
+
+    (entry,) = exporter.logger.entries
+    attributes = entry["json_payload"]["attributes"]
+    assert "llm_request" not in attributes and attributes["model"] == "gemini"
+    assert attributes["uri_payload"].startswith("gs://")
+    (path, payload) = next(iter(exporter.storage_client.uploads.items()))
+    assert exporter.storage_client.encodings[path] == "gzip"
+    assert json.loads(gzip.decompress(payload))["llm_request"] == request
+    exporter.shutdown()
+
+
+def large_spans(count: int) -> list[ReadableSpan]:
+    tracer = TracerProvider().get_tracer(__name__)
+    spans = []
+    for i in range(count):
+        span = tracer.start_span(f"call_llm {i}", attributes={"request": "x" * 300_000})
+        span.end()
+        spans.append(cast(ReadableSpan, span))
+    return spans
+
+
+def test_bucket_existence_is_checked_once_per_interval() -> None:
+    exporter = make_exporter()
+
+    exporter.export(large_spans(3))
+    exporter.force_flush()
+
+    storage_client = exporter.storage_client
+    assert storage_client.exists_calls == 1
+    assert len(storage_client.uploads) == 3
+    exporter.uploader.bucket_check_interval = 0
+    exporter.export(large_spans(1))
+    exporter.force_flush()
+    assert storage_client.exists_calls == 2
+    exporter.shutdown()
+
+
+def test_payloads_wait_for_the_first_bucket_check() -> None:
+    exporter = make_exporter(
+        storage_client=FakeStorageClient(rpc_latency=0.2),
+    )
+    spans = large_spans(4)
+
+    threads = [
+        threading.Thread(target=exporter.export, args=([span],)) for span in spans
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    exporter.force_flush()
+
+    uris = [
+        e["json_payload"]["attributes"]["uri_payload"] for e in exporter.logger.entries
+    ]
+    assert len(uris) == 4 and all(uri.startswith("gs://") for uri in uris)
+    assert exporter.storage_client.exists_calls == 1
+    assert len(exporter.storage_client.uploads) == 4
+    exporter.shutdown()
+
+
+def test_bucket_is_checked_off_the_export_thread() -> None:
+    exporter = make_exporter(storage_client=FakeStorageClient(rpc_latency=0.3))
+    exporter.uploader.bucket_check_interval = 0
+
+    start = time.perf_counter()
+    exporter.export(large_spans(2))
+    elapsed = time.perf_counter() - start
+    exporter.force_flush()
+
+    assert elapsed < 0.3
+    assert exporter.storage_client.exists_calls == 2
+    assert len(exporter.storage_client.uploads) == 2
+    exporter.shutdown()
+
+
+def test_uploads_are_skipped_once_the_bucket_is_found_missing() -> None:
+    exporter = make_exporter(
+        storage_client=FakeStorageClient(rpc_latency=0.1, bucket_exists=False),
+    )
+
+    exporter.export(large_spans(2))
+    exporter.force_flush()
+
+    assert not exporter.storage_client.uploads
+    assert exporter.metrics()["gcs"]["failed"] == 2
+    exporter.shutdown()
+
+
+def test_slow_gcs_does_not_stall_export() -> None:
+    exporter = make_exporter(
+        storage_client=FakeStorageClient(rpc_latency=0.3),
+        upload_workers=1,
+        max_pending_uploads=2,
+    )
+    exporter.uploader.bucket_exists()
+    exporter.force_flush()
+    spans = large_spans(5)
+
+    start = time.perf_counter()
+    exporter.export(spans)
+    elapsed = time.perf_counter() - start
+    exporter.force_flush()
+
+    assert elapsed < 0.3
+    uris = [
+        e["json_payload"]["attributes"]["uri_payload"] for e in exporter.logger.entries
+    ]
+    assert uris.count("GCS upload queue full") == 3
+    for entry in exporter.logger.entries:
+        attributes = entry["json_payload"]["attributes"]
+        if attributes["uri_payload"] == "GCS upload queue full":
+            assert attributes["request"].endswith(TRUNCATED_SUFFIX)
+        else:
+            assert "request" not in attributes
+    assert exporter.metrics()["gcs"]["uploads"] == 2
+    assert exporter.metrics()["gcs"]["dropped"] == 3
+    exporter.shutdown()
+
+
+def test_payload_stays_inline_truncated_when_the_upload_is_dropped() -> None:
+    exporter = make_exporter(
+        storage_client=FakeStorageClient(bucket_exists=False),
+    )
+    exporter.uploader.bucket_exists()
+    exporter.force_flush()
+
+    exporter.export(large_spans(1))
+    exporter.force_flush()
+
+    (entry,) = exporter.logger.entries
+    attributes = entry["json_payload"]["attributes"]
+    assert attributes["uri_payload"] == "GCS bucket not found"
+    assert "url_payload" not in attributes
+    assert attributes["request"].startswith("x" * 1000)
+    assert attributes["request"].endswith(TRUNCATED_SUFFIX)
+    assert len(json.dumps(entry["json_payload"])) < MAX_ENTRY_BYTES + 1024
+    assert not exporter.storage_client.uploads
+    exporter.shutdown()
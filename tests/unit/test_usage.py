@@ -0,0 +1,155 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+
+from app.agent import instruction, root_agent
+from app.tools.client_pool import (
+    configure_search_client_pool,
+    shutdown_search_client_pool,
+)
+from app.utils.usage import (
+    UsageAccountant,
+    account_model_response,
+    get_usage_accountant,
+    set_usage_accountant,
+)
+from tests.fakes.discovery_engine import FakeSearchService
+from tests.fakes.llm import ScriptedLlm
+
+
+@pytest.fixture
+def reader() -> Iterator[InMemoryMetricReader]:
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(metric_readers=[reader])
+    set_usage_accountant(UsageAccountant(provider.get_meter(__name__)))
+    yield reader
+    set_usage_accountant(None)
+    provider.shutdown()
+
+
+@pytest.fixture
+def service() -> Iterator[FakeSearchService]:
+    with FakeSearchService() as service:
+        configure_search_client_pool(
+            channel_factory=service.channel_factory,
+            async_channel_factory=service.async_channel_factory,
+        )
+        yield service
+    shutdown_search_client_pool()
+
+
+async def run_turn(runner: InMemoryRunner, session_id: str, text: str) -> None:
+    message = types.Content(role="user", parts=[types.Part(text=text)])
+    async for _ in runner.run_async(
+        user_id="mechanic", session_id=session_id, new_message=message
+    ):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_turns_are_accounted_per_session(
+    reader: InMemoryMetricReader, service: FakeSearchService
+) -> None:
+    agent = root_agent.model_copy(
+        update={"model": ScriptedLlm(tool="search_technical_docs")}
+    )
+    runner = InMemoryRunner(agent=agent, app_name="usage-test")
+    session = await runner.session_service.create_session(
+        app_name="usage-test", user_id="mechanic"
+    )
+    await run_turn(runner, session.id, "brake pads")
+    accountant = get_usage_accountant()
+    assert accountant is not None
+    first = accountant.session_usage(session.id)
+    await run_turn(runner, session.id, "chain wear")
+    usage = accountant.session_usage(session.id)
+
+    assert first is not None and usage is not None
+    # A tool call and an answer per turn
+    assert first.llm_calls == 2 and usage.llm_calls == 4
+    assert usage.tool_calls == 2
+    assert usage.prompt_tokens > 2 * first.prompt_tokens > 0
+    assert usage.output_tokens > 0
+    assert usage.instruction_chars >= 4 * len(instruction)
+    assert usage.tool_output_chars.keys() == {"search_technical_docs"}
+    assert usage.tool_output_chars["search_technical_docs"] > 0
+
+    data = reader.get_metrics_data()
+    assert data is not None
+    metrics: dict[str, Any] = {
+        metric.name: metric.data.data_points
+        for resource_metrics in data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+    tokens = {p.attributes["token.type"]: p.value for p in metrics["agent.tokens"]}
+    assert tokens == {
+        "prompt": usage.prompt_tokens,
+        "cached": 0,
+        "output": usage.output_tokens,
+    }
+    (invocations,) = [
+        p
+        for p in metrics["agent.invocation.tokens"]
+        if p.attributes["token.type"] == "prompt"
+    ]
+    assert invocations.count == 2
+    (tool_output,) = metrics["agent.tool.output.size"]
+    assert tool_output.attributes == {"tool": "search_technical_docs"}
+
+
+def test_model_usage_is_set_on_the_current_span(
+    reader: InMemoryMetricReader,
+) -> None:
+    tracer = TracerProvider().get_tracer(__name__)
+    context = cast(
+        CallbackContext,
+        SimpleNamespace(
+            invocation_id="e-1",
+            _invocation_context=SimpleNamespace(session=SimpleNamespace(id="s-1")),
+        ),
+    )
+    response = LlmResponse(
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=1200,
+            cached_content_token_count=1000,
+            candidates_token_count=80,
+            thoughts_token_count=20,
+        )
+    )
+
+    with tracer.start_as_current_span("call_llm") as span:
+        account_model_response(context, response)
+        # Streamed chunks are not counted twice
+        account_model_response(context, response.model_copy(update={"partial": True}))
+
+    assert isinstance(span, ReadableSpan)
+    assert span.attributes == {
+        "agent.usage.prompt_tokens": 1200,
+        "agent.usage.cached_tokens": 1000,
+        "agent.usage.output_tokens": 100,
+        "agent.usage.instruction_chars": 0,
+    }
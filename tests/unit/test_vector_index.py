@@ -0,0 +1,122 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.retrievers import get_local_retriever
+from app.tools.semantic_cache import HashingEmbeddings
+from app.tools.vector_index import VectorIndex
+
+
+def clustered(n: int, dimension: int = 32, clusters: int = 20) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(clusters, dimension))
+    return (
+        centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dimension))
+    ).astype(np.float32)
+
+
+@pytest.mark.parametrize("quantization", ["float32", "int8"])
+def test_ivf_search_recalls_exact_neighbours(tmp_path: Path, quantization: str) -> None:
+    vectors = clustered(2000)
+    documents = [{"id": f"c{i}", "content": f"chunk {i}"} for i in range(2000)]
+    VectorIndex.build(vectors, documents, tmp_path, quantization=quantization)
+    index = VectorIndex.load(tmp_path, nprobe=8)
+
+    recall = []
+    for query in vectors[:50] + 0.05:
+        exact = {h.id for h in index.search_exact(query, k=10)}
+        approximate = index.search(query, k=10)
+        recall.append(len(exact & {h.id for h in approximate}) / 10)
+        assert [h.score for h in approximate] == sorted(
+            (h.score for h in approximate), reverse=True
+        )
+
+    assert len(index) == 2000
+    assert np.mean(recall) >= 0.9
+    assert index.search(vectors[7], k=1)[0].document == {
+        "id": "c7",
+        "content": "chunk 7",
+    }
+
+
+def test_build_from_pipeline_export_drops_vectors(tmp_path: Path) -> None:
+    vectors = clustered(100, dimension=8)
+    export = tmp_path / "export-000.jsonl"
+    export.write_text(
+        "\n".join(
+            json.dumps(
+                {
+                    "id": f"q{i}__0",
+                    "json_data": json.dumps(
+                        {
+                            "id": f"q{i}__0",
+                            "content": f"text {i}",
+                            "embedding": v.tolist(),
+                        }
+                    ),
+                }
+            )
+            for i, v in enumerate(vectors)
+        )
+    )
+
+    VectorIndex.build_from_jsonl(str(export), tmp_path / "index", n_lists=4)
+    index = VectorIndex.load(tmp_path / "index")
+
+    hit = index.search(vectors[3], k=1)[0]
+    assert hit.id == "q3__0"
+    assert "embedding" not in hit.document
+    assert hit.score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_local_retriever_returns_langchain_documents(tmp_path: Path) -> None:
+    embedding = HashingEmbeddings(dimension=64)
+    texts = [
+        "Bleeding Shimano MT200 hydraulic brakes",
+        "Replacing a Bosch Performance Line motor",
+        "Adjusting a rear derailleur",
+    ]
+    VectorIndex.build(
+        np.asarray(embedding.embed_documents(texts)),
+        [{"id": str(i), "content": t, "source": "docs"} for i, t in enumerate(texts)],
+        tmp_path,
+        n_lists=1,
+    )
+
+    retriever = get_local_retriever(str(tmp_path), embedding, max_documents=2)
+    documents = retriever.invoke("how to bleed MT200 brakes")
+
+    assert len(documents) == 2
+    assert documents[0].page_content == texts[0]
+    assert documents[0].metadata["source"] == "docs"
+    assert documents[0].metadata["score"] > documents[1].metadata["score"]
+    assert asyncio.run(retriever.ainvoke("how to bleed MT200 brakes")) == documents
+
+
+def test_local_retriever_rejects_another_embedding_dimension(tmp_path: Path) -> None:
+    VectorIndex.build(
+        clustered(50, dimension=32),
+        [{"id": str(i)} for i in range(50)],
+        tmp_path,
+        n_lists=1,
+    )
+
+    with pytest.raises(ValueError, match=r"32-dimensional.*64 dimensions"):
+        get_local_retriever(str(tmp_path), HashingEmbeddings(dimension=64))